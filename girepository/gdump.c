@@ -73,6 +73,71 @@ goutput_write (GOutputStream *out, const char *str)
     }
 }
 
+/* The compact format writes one record per line; the first field is the
+ * record kind and the remaining ones are tab-separated, C-escaped values.
+ * Records other than top-level types apply to the preceding type (or, for
+ * "param", to the preceding signal).
+ */
+static void
+compact_record (GOutputStream *out, const char *kind, ...) G_GNUC_NULL_TERMINATED;
+
+/* A NULL value would end the compact_record() arguments early */
+static const char *
+compact_field (const char *value)
+{
+  return value ? value : "";
+}
+
+static void
+compact_record (GOutputStream *out, const char *kind, ...)
+{
+  GString *record;
+  const char *value;
+  va_list args;
+
+  record = g_string_new (kind);
+
+  va_start (args, kind);
+  while ((value = va_arg (args, const char *)) != NULL)
+    {
+      char *escaped;
+
+      escaped = g_strescape (value, NULL);
+      g_string_append_c (record, '\t');
+      g_string_append (record, escaped);
+      g_free (escaped);
+    }
+  va_end (args);
+
+  g_string_append_c (record, '\n');
+  goutput_write (out, record->str);
+  g_string_free (record, TRUE);
+}
+
+static char *
+build_parents_string (GType type)
+{
+  GString *parent_str;
+  GType parent;
+  gboolean first = TRUE;
+
+  parent = g_type_parent (type);
+  parent_str = g_string_new ("");
+  while (parent != G_TYPE_INVALID)
+    {
+      if (first)
+        first = FALSE;
+      else
+        g_string_append_c (parent_str, ',');
+      if (!g_type_name (parent))
+        break;
+      g_string_append (parent_str, g_type_name (parent));
+      parent = g_type_parent (parent);
+    }
+
+  return g_string_free (parent_str, FALSE);
+}
+
 typedef GType (*GetTypeFunc)(void);
 typedef GQuark (*ErrorQuarkFunc)(void);
 
@@ -120,7 +185,7 @@ invoke_error_quark (GModule *self, const char *symbol, GError **error)
 }
 
 static void
-dump_properties (GType type, GOutputStream *out)
+dump_properties (GType type, gboolean compact, GOutputStream *out)
 {
   guint i;
   guint n_properties;
@@ -147,14 +212,22 @@ dump_properties (GType type, GOutputStream *out)
       if (prop->owner_type != type)
 	continue;
 
-      escaped_printf (out, "    <property name=\"%s\" type=\"%s\" flags=\"%d\"/>\n",
-		      prop->name, g_type_name (prop->value_type), prop->flags);
+      if (compact)
+        {
+          char *flags = g_strdup_printf ("%d", prop->flags);
+          compact_record (out, "property", prop->name,
+                          compact_field (g_type_name (prop->value_type)), flags, NULL);
+          g_free (flags);
+        }
+      else
+        escaped_printf (out, "    <property name=\"%s\" type=\"%s\" flags=\"%d\"/>\n",
+                        prop->name, g_type_name (prop->value_type), prop->flags);
     }
   g_free (props);
 }
 
 static void
-dump_signals (GType type, GOutputStream *out)
+dump_signals (GType type, gboolean compact, GOutputStream *out)
 {
   guint i;
   guint n_sigs;
@@ -165,24 +238,46 @@ dump_signals (GType type, GOutputStream *out)
     {
       guint sigid;
       GSignalQuery query;
+      const char *when = NULL;
       guint j;
 
       sigid = sig_ids[i];
       g_signal_query (sigid, &query);
 
-      escaped_printf (out, "    <signal name=\"%s\" return=\"%s\"",
-		      query.signal_name, g_type_name (query.return_type));
-
       if (query.signal_flags & G_SIGNAL_RUN_FIRST)
-        escaped_printf (out, " when=\"first\"");
+        when = "first";
       else if (query.signal_flags & G_SIGNAL_RUN_LAST)
-        escaped_printf (out, " when=\"last\"");
+        when = "last";
       else if (query.signal_flags & G_SIGNAL_RUN_CLEANUP)
-        escaped_printf (out, " when=\"cleanup\"");
+        when = "cleanup";
 #if GLIB_CHECK_VERSION(2, 29, 15)
       else if (query.signal_flags & G_SIGNAL_MUST_COLLECT)
-        escaped_printf (out, " when=\"must-collect\"");
+        when = "must-collect";
 #endif
+
+      if (compact)
+        {
+          compact_record (out, "signal",
+                          query.signal_name,
+                          compact_field (g_type_name (query.return_type)),
+                          when ? when : "",
+                          (query.signal_flags & G_SIGNAL_NO_RECURSE) ? "1" : "0",
+                          (query.signal_flags & G_SIGNAL_DETAILED) ? "1" : "0",
+                          (query.signal_flags & G_SIGNAL_ACTION) ? "1" : "0",
+                          (query.signal_flags & G_SIGNAL_NO_HOOKS) ? "1" : "0",
+                          NULL);
+
+          for (j = 0; j < query.n_params; j++)
+            compact_record (out, "param", compact_field (g_type_name (query.param_types[j])), NULL);
+          continue;
+        }
+
+      escaped_printf (out, "    <signal name=\"%s\" return=\"%s\"",
+		      query.signal_name, g_type_name (query.return_type));
+
+      if (when)
+        escaped_printf (out, " when=\"%s\"", when);
+
       if (query.signal_flags & G_SIGNAL_NO_RECURSE)
         escaped_printf (out, " no-recurse=\"1\"");
 
@@ -208,64 +303,65 @@ dump_signals (GType type, GOutputStream *out)
 }
 
 static void
-dump_object_type (GType type, const char *symbol, GOutputStream *out)
+dump_object_type (GType type, const char *symbol, gboolean compact, GOutputStream *out)
 {
   guint n_interfaces;
   guint i;
   GType *interfaces;
+  char *parents = NULL;
 
-  escaped_printf (out, "  <class name=\"%s\" get-type=\"%s\"",
-		  g_type_name (type), symbol);
   if (type != G_TYPE_OBJECT)
-    {
-      GString *parent_str;
-      GType parent;
-      gboolean first = TRUE;
+    parents = build_parents_string (type);
 
-      parent = g_type_parent (type);
-      parent_str = g_string_new ("");
-      while (parent != G_TYPE_INVALID)
-        {
-          if (first)
-            first = FALSE;
-          else
-            g_string_append_c (parent_str, ',');
-          g_string_append (parent_str, g_type_name (parent));
-          parent = g_type_parent (parent);
-        }
-
-      escaped_printf (out, " parents=\"%s\"", parent_str->str);
-
-      g_string_free (parent_str, TRUE);
+  if (compact)
+    {
+      compact_record (out, "class", compact_field (g_type_name (type)), symbol,
+                      parents ? parents : "",
+                      G_TYPE_IS_ABSTRACT (type) ? "1" : "0",
+                      NULL);
     }
-
-  if (G_TYPE_IS_ABSTRACT (type))
-    escaped_printf (out, " abstract=\"1\"");
-  goutput_write (out, ">\n");
+  else
+    {
+      escaped_printf (out, "  <class name=\"%s\" get-type=\"%s\"",
+                      g_type_name (type), symbol);
+      if (parents)
+        escaped_printf (out, " parents=\"%s\"", parents);
+      if (G_TYPE_IS_ABSTRACT (type))
+        escaped_printf (out, " abstract=\"1\"");
+      goutput_write (out, ">\n");
+    }
+  g_free (parents);
 
   interfaces = g_type_interfaces (type, &n_interfaces);
   for (i = 0; i < n_interfaces; i++)
     {
       GType itype = interfaces[i];
-      escaped_printf (out, "    <implements name=\"%s\"/>\n",
-		      g_type_name (itype));
+      if (compact)
+        compact_record (out, "implements", compact_field (g_type_name (itype)), NULL);
+      else
+        escaped_printf (out, "    <implements name=\"%s\"/>\n",
+                        g_type_name (itype));
     }
   g_free (interfaces);
 
-  dump_properties (type, out);
-  dump_signals (type, out);
-  goutput_write (out, "  </class>\n");
+  dump_properties (type, compact, out);
+  dump_signals (type, compact, out);
+  if (!compact)
+    goutput_write (out, "  </class>\n");
 }
 
 static void
-dump_interface_type (GType type, const char *symbol, GOutputStream *out)
+dump_interface_type (GType type, const char *symbol, gboolean compact, GOutputStream *out)
 {
   guint n_interfaces;
   guint i;
   GType *interfaces;
 
-  escaped_printf (out, "  <interface name=\"%s\" get-type=\"%s\">\n",
-		  g_type_name (type), symbol);
+  if (compact)
+    compact_record (out, "interface", compact_field (g_type_name (type)), symbol, NULL);
+  else
+    escaped_printf (out, "  <interface name=\"%s\" get-type=\"%s\">\n",
+                    g_type_name (type), symbol);
 
   interfaces = g_type_interface_prerequisites (type, &n_interfaces);
   for (i = 0; i < n_interfaces; i++)
@@ -280,148 +376,182 @@ dump_interface_type (GType type, const char *symbol, GOutputStream *out)
 	   */
 	  continue;
 	}
-      escaped_printf (out, "    <prerequisite name=\"%s\"/>\n",
-		      g_type_name (itype));
+      if (compact)
+        compact_record (out, "prerequisite", compact_field (g_type_name (itype)), NULL);
+      else
+        escaped_printf (out, "    <prerequisite name=\"%s\"/>\n",
+                        g_type_name (itype));
     }
   g_free (interfaces);
 
-  dump_properties (type, out);
-  dump_signals (type, out);
-  goutput_write (out, "  </interface>\n");
+  dump_properties (type, compact, out);
+  dump_signals (type, compact, out);
+  if (!compact)
+    goutput_write (out, "  </interface>\n");
 }
 
 static void
-dump_boxed_type (GType type, const char *symbol, GOutputStream *out)
+dump_boxed_type (GType type, const char *symbol, gboolean compact, GOutputStream *out)
 {
-  escaped_printf (out, "  <boxed name=\"%s\" get-type=\"%s\"/>\n",
-		  g_type_name (type), symbol);
+  if (compact)
+    compact_record (out, "boxed", compact_field (g_type_name (type)), symbol, NULL);
+  else
+    escaped_printf (out, "  <boxed name=\"%s\" get-type=\"%s\"/>\n",
+                    g_type_name (type), symbol);
 }
 
 static void
-dump_flags_type (GType type, const char *symbol, GOutputStream *out)
+dump_flags_type (GType type, const char *symbol, gboolean compact, GOutputStream *out)
 {
   guint i;
   GFlagsClass *klass;
 
   klass = g_type_class_ref (type);
-  escaped_printf (out, "  <flags name=\"%s\" get-type=\"%s\">\n",
-		  g_type_name (type), symbol);
+  if (compact)
+    compact_record (out, "flags", compact_field (g_type_name (type)), symbol, NULL);
+  else
+    escaped_printf (out, "  <flags name=\"%s\" get-type=\"%s\">\n",
+                    g_type_name (type), symbol);
 
   for (i = 0; i < klass->n_values; i++)
     {
       GFlagsValue *value = &(klass->values[i]);
 
-      escaped_printf (out, "    <member name=\"%s\" nick=\"%s\" value=\"%d\"/>\n",
-		      value->value_name, value->value_nick, value->value);
+      if (compact)
+        {
+          char *number = g_strdup_printf ("%d", value->value);
+          compact_record (out, "member", value->value_name, compact_field (value->value_nick),
+                          number, NULL);
+          g_free (number);
+        }
+      else
+        escaped_printf (out, "    <member name=\"%s\" nick=\"%s\" value=\"%d\"/>\n",
+                        value->value_name, value->value_nick, value->value);
     }
-  goutput_write (out, "  </flags>\n");
+  if (!compact)
+    goutput_write (out, "  </flags>\n");
 }
 
 static void
-dump_enum_type (GType type, const char *symbol, GOutputStream *out)
+dump_enum_type (GType type, const char *symbol, gboolean compact, GOutputStream *out)
 {
   guint i;
   GEnumClass *klass;
 
   klass = g_type_class_ref (type);
-  escaped_printf (out, "  <enum name=\"%s\" get-type=\"%s\">\n",
-		  g_type_name (type), symbol);
+  if (compact)
+    compact_record (out, "enum", compact_field (g_type_name (type)), symbol, NULL);
+  else
+    escaped_printf (out, "  <enum name=\"%s\" get-type=\"%s\">\n",
+                    g_type_name (type), symbol);
 
   for (i = 0; i < klass->n_values; i++)
     {
       GEnumValue *value = &(klass->values[i]);
 
-      escaped_printf (out, "    <member name=\"%s\" nick=\"%s\" value=\"%d\"/>\n",
-		      value->value_name, value->value_nick, value->value);
+      if (compact)
+        {
+          char *number = g_strdup_printf ("%d", value->value);
+          compact_record (out, "member", value->value_name, compact_field (value->value_nick),
+                          number, NULL);
+          g_free (number);
+        }
+      else
+        escaped_printf (out, "    <member name=\"%s\" nick=\"%s\" value=\"%d\"/>\n",
+                        value->value_name, value->value_nick, value->value);
     }
-  goutput_write (out, "  </enum>");
+  if (!compact)
+    goutput_write (out, "  </enum>");
 }
 
 static void
-dump_fundamental_type (GType type, const char *symbol, GOutputStream *out)
+dump_fundamental_type (GType type, const char *symbol, gboolean compact, GOutputStream *out)
 {
   guint n_interfaces;
   guint i;
   GType *interfaces;
-  GString *parent_str;
-  GType parent;
-  gboolean first = TRUE;
-
-
-  escaped_printf (out, "  <fundamental name=\"%s\" get-type=\"%s\"",
-		  g_type_name (type), symbol);
+  char *parents;
 
-  if (G_TYPE_IS_ABSTRACT (type))
-    escaped_printf (out, " abstract=\"1\"");
+  parents = build_parents_string (type);
 
-  if (G_TYPE_IS_INSTANTIATABLE (type))
-    escaped_printf (out, " instantiatable=\"1\"");
-
-  parent = g_type_parent (type);
-  parent_str = g_string_new ("");
-  while (parent != G_TYPE_INVALID)
+  if (compact)
     {
-      if (first)
-        first = FALSE;
-      else
-        g_string_append_c (parent_str, ',');
-      if (!g_type_name (parent))
-        break;
-      g_string_append (parent_str, g_type_name (parent));
-      parent = g_type_parent (parent);
+      compact_record (out, "fundamental", compact_field (g_type_name (type)), symbol,
+                      parents,
+                      G_TYPE_IS_ABSTRACT (type) ? "1" : "0",
+                      G_TYPE_IS_INSTANTIATABLE (type) ? "1" : "0",
+                      NULL);
     }
+  else
+    {
+      escaped_printf (out, "  <fundamental name=\"%s\" get-type=\"%s\"",
+                      g_type_name (type), symbol);
 
-  if (parent_str->len > 0)
-    escaped_printf (out, " parents=\"%s\"", parent_str->str);
-  g_string_free (parent_str, TRUE);
+      if (G_TYPE_IS_ABSTRACT (type))
+        escaped_printf (out, " abstract=\"1\"");
 
-  goutput_write (out, ">\n");
+      if (G_TYPE_IS_INSTANTIATABLE (type))
+        escaped_printf (out, " instantiatable=\"1\"");
+
+      if (*parents != '\0')
+        escaped_printf (out, " parents=\"%s\"", parents);
+
+      goutput_write (out, ">\n");
+    }
+  g_free (parents);
 
   interfaces = g_type_interfaces (type, &n_interfaces);
   for (i = 0; i < n_interfaces; i++)
     {
       GType itype = interfaces[i];
-      escaped_printf (out, "    <implements name=\"%s\"/>\n",
-		      g_type_name (itype));
+      if (compact)
+        compact_record (out, "implements", compact_field (g_type_name (itype)), NULL);
+      else
+        escaped_printf (out, "    <implements name=\"%s\"/>\n",
+                        g_type_name (itype));
     }
   g_free (interfaces);
-  goutput_write (out, "  </fundamental>\n");
+  if (!compact)
+    goutput_write (out, "  </fundamental>\n");
 }
 
 static void
-dump_type (GType type, const char *symbol, GOutputStream *out)
+dump_type (GType type, const char *symbol, gboolean compact, GOutputStream *out)
 {
   switch (g_type_fundamental (type))
     {
     case G_TYPE_OBJECT:
-      dump_object_type (type, symbol, out);
+      dump_object_type (type, symbol, compact, out);
       break;
     case G_TYPE_INTERFACE:
-      dump_interface_type (type, symbol, out);
+      dump_interface_type (type, symbol, compact, out);
       break;
     case G_TYPE_BOXED:
-      dump_boxed_type (type, symbol, out);
+      dump_boxed_type (type, symbol, compact, out);
       break;
     case G_TYPE_FLAGS:
-      dump_flags_type (type, symbol, out);
+      dump_flags_type (type, symbol, compact, out);
       break;
     case G_TYPE_ENUM:
-      dump_enum_type (type, symbol, out);
+      dump_enum_type (type, symbol, compact, out);
       break;
     case G_TYPE_POINTER:
       /* GValue, etc.  Just skip them. */
       break;
     default:
-      dump_fundamental_type (type, symbol, out);
+      dump_fundamental_type (type, symbol, compact, out);
       break;
     }
 }
 
 static void
-dump_error_quark (GQuark quark, const char *symbol, GOutputStream *out)
+dump_error_quark (GQuark quark, const char *symbol, gboolean compact, GOutputStream *out)
 {
-  escaped_printf (out, "  <error-quark function=\"%s\" domain=\"%s\"/>\n",
-		  symbol, g_quark_to_string (quark));
+  if (compact)
+    compact_record (out, "error-quark", symbol, compact_field (g_quark_to_string (quark)), NULL);
+  else
+    escaped_printf (out, "  <error-quark function=\"%s\" domain=\"%s\"/>\n",
+                    symbol, g_quark_to_string (quark));
 }
 
 /**
@@ -436,6 +566,11 @@ dump_error_quark (GQuark quark, const char *symbol, GOutputStream *out)
  * "error-quark:" followed by the name of an error quark function.  No
  * extra whitespace is allowed.
  *
+ * If the first line of the input file is "format:compact", the output is
+ * written as a line-oriented record stream instead of XML.  The stream
+ * starts with a "gdump-compact" header line and then contains one record
+ * per line, made of tab-separated fields escaped with g_strescape().
+ *
  * The output file should already exist, but be empty.  This function will
  * overwrite its contents.
  *
@@ -460,6 +595,8 @@ g_irepository_dump (const char *arg, GError **error)
   GDataInputStream *in;
   GModule *self;
   gboolean caught_error = FALSE;
+  gboolean compact = FALSE;
+  gboolean started = FALSE;
 
   self = g_module_open (NULL, 0);
   if (!self)
@@ -497,9 +634,6 @@ g_irepository_dump (const char *arg, GError **error)
       return FALSE;
     }
 
-  goutput_write (G_OUTPUT_STREAM (output), "<?xml version=\"1.0\"?>\n");
-  goutput_write (G_OUTPUT_STREAM (output), "<dump>\n");
-
   output_types = g_hash_table_new (NULL, NULL);
 
   in = g_data_input_stream_new (G_INPUT_STREAM (input));
@@ -519,6 +653,21 @@ g_irepository_dump (const char *arg, GError **error)
 
       g_strchomp (line);
 
+      if (!started)
+        {
+          if (strcmp (line, "format:compact") == 0)
+            compact = TRUE;
+
+          if (compact)
+            goutput_write (G_OUTPUT_STREAM (output), "gdump-compact\t1\n");
+          else
+            {
+              goutput_write (G_OUTPUT_STREAM (output), "<?xml version=\"1.0\"?>\n");
+              goutput_write (G_OUTPUT_STREAM (output), "<dump>\n");
+            }
+          started = TRUE;
+        }
+
       if (strncmp (line, "get-type:", strlen ("get-type:")) == 0)
         {
           GType type;
@@ -539,7 +688,7 @@ g_irepository_dump (const char *arg, GError **error)
             goto next;
           g_hash_table_insert (output_types, (gpointer) type, (gpointer) type);
 
-          dump_type (type, function, G_OUTPUT_STREAM (output));
+          dump_type (type, function, compact, G_OUTPUT_STREAM (output));
         }
       else if (strncmp (line, "error-quark:", strlen ("error-quark:")) == 0)
         {
@@ -555,7 +704,7 @@ g_irepository_dump (const char *arg, GError **error)
               break;
             }
 
-          dump_error_quark (quark, function, G_OUTPUT_STREAM (output));
+          dump_error_quark (quark, function, compact, G_OUTPUT_STREAM (output));
         }
 
 
@@ -565,7 +714,13 @@ g_irepository_dump (const char *arg, GError **error)
 
   g_hash_table_destroy (output_types);
 
-  goutput_write (G_OUTPUT_STREAM (output), "</dump>\n");
+  if (!started)
+    {
+      goutput_write (G_OUTPUT_STREAM (output), "<?xml version=\"1.0\"?>\n");
+      goutput_write (G_OUTPUT_STREAM (output), "<dump>\n");
+    }
+  if (!compact)
+    goutput_write (G_OUTPUT_STREAM (output), "</dump>\n");
 
   {
     GError **ioerror;
@@ -62,6 +62,10 @@ def annotation_main(args):
                      help="Extract annotations from the input files")
     parser.add_option_group(group)
 
+    parser.add_option("-j", "--jobs",
+                      action="store", dest="jobs", type="int", default=1,
+                      help="number of processes used to parse headers and comment blocks")
+
     group = get_preprocessor_option_group(parser)
     group.add_option("-L", "--library-path",
                      action="append", dest="library_paths", default=[],
@@ -86,7 +90,7 @@ def annotation_main(args):
     if options.extract:
         parser = GtkDocCommentBlockParser()
         writer = GtkDocCommentBlockWriter(indent=False)
-        blocks = parser.parse_comment_blocks(ss.get_comments())
+        blocks = parser.parse_comment_blocks(ss.iter_comments(), options.jobs)
 
         with encode_stdout('utf-8'):
             print('/' + ('*' * 60) + '/')
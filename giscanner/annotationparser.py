@@ -112,6 +112,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import hashlib
+import multiprocessing
 import os
 import re
 import operator
@@ -120,6 +122,8 @@ from collections import namedtuple
 from operator import ne, gt, lt
 
 from .collections import Counter, OrderedDict
+from . import message
+from . import utils
 from .message import Position, warn, error
 
 
@@ -362,6 +366,23 @@ INDENTATION_RE = re.compile(
     ''',
     re.UNICODE | re.VERBOSE)
 
+# Pattern splitting a line inside a comment block in one go into the indentation
+# level of the comment (before the ' * '), invalid comment text, the ' * ' itself
+# (see COMMENT_ASTERISK_RE) and the indentation level of the line (after the ' * ').
+LINE_PREFIX_RE = re.compile(
+    r'''
+    ^                                                    # start
+    (?P<indentation>\s*)                                 # 0 or more whitespace characters
+    (?:                                                  # optional ' * '
+      (?P<comment>.*?)                                   #   invalid comment text
+      \s*                                                #   0 or more whitespace characters
+      \*                                                 #   1 asterisk character
+      \s?                                                #   0 or 1 whitespace characters
+    )?
+    (?P<line_indentation>\s*)                            # 0 or more whitespace characters
+    ''',
+    re.UNICODE | re.VERBOSE)
+
 # Pattern matching an empty line.
 EMPTY_LINE_RE = re.compile(
     r'''
@@ -530,7 +551,7 @@ class GtkDocAnnotations(OrderedDict):
         return GtkDocAnnotations(self.position, self)
 
 
-class GtkDocAnnotatable(object):
+class GtkDocAnnotatable(utils.SlotsObject):
     '''
     Base class for GTK-Doc comment block parts that can be annotated.
     '''
@@ -1140,6 +1161,41 @@ _ParseFieldsResult = namedtuple('Result', ['success', 'annotations', 'annotation
                                            'description'])
 
 
+#: Minimum number of comment blocks for which
+#: :meth:`GtkDocCommentBlockParser.parse_comment_blocks` uses worker processes
+PARALLEL_PARSE_THRESHOLD = 2000
+
+#: Part of the keys of cached :class:`GtkDocCommentBlock` objects, bump it whenever
+#: the parse results change in a way the cache version check would not catch
+PARSER_CACHE_VERSION = 1
+
+
+def _parse_comment_chunk(comments):
+    # Parses the comments with their messages recorded instead of logged, runs
+    # in a worker process of GtkDocCommentBlockParser.parse_comment_blocks().
+    # The messages of each block are sent back to be logged in order.
+    logger = message.MessageLogger._instance
+    recorder = message.MessageRecorder()
+    message.MessageLogger._instance = recorder
+    try:
+        parser = GtkDocCommentBlockParser()
+        results = []
+        for (comment, filename, lineno) in comments:
+            recorder.messages = []
+            comment_block = parser._parse_comment_block_checked(comment, filename, lineno)
+            results.append((comment_block, recorder.messages))
+    finally:
+        message.MessageLogger._instance = logger
+    return results
+
+
+def _comment_cache_key(comment, filename, lineno):
+    hasher = hashlib.sha1()
+    for item in (comment or '', filename or '', str(lineno)):
+        hasher.update(item.encode('utf-8') + b'\0')
+    return hasher.hexdigest()
+
+
 class GtkDocCommentBlockParser(object):
     '''
     Parse GTK-Doc comment blocks into a parse tree built out of :class:`GtkDocCommentBlock`,
@@ -1167,26 +1223,45 @@ class GtkDocCommentBlockParser(object):
            http://git.gnome.org/browse/gtk-doc/tree/gtkdoc-mkdb.in#n3722
     '''
 
-    def parse_comment_blocks(self, comments):
+    def __init__(self, cachestore=None):
+        '''
+        :param cachestore: a :class:`giscanner.cachestore.CacheStore` keeping the parsed
+                           comment blocks and their messages between runs, or ``None``
+        '''
+
+        self._cachestore = cachestore
+
+    def parse_comment_blocks(self, comments, jobs=1, lazy=False, pool=None):
         '''
         Parse multiple GTK-Doc comment blocks.
 
         :param comments: an iterable of ``(comment, filename, lineno)`` tuples
+        :param jobs: number of processes used to parse the comment blocks when there are
+                     at least :data:`PARALLEL_PARSE_THRESHOLD` of them
+        :param lazy: only index the comment blocks by their identifier and parse them when
+                     they are looked up, see :class:`GtkDocCommentBlockIndex`
+        :param pool: a :class:`multiprocessing.Pool` of @jobs processes to parse the comment
+                     blocks in instead of starting one, it is left for the caller to close
         :returns: a dictionary mapping identifier names to :class:`GtkDocCommentBlock` objects
         '''
 
+        if lazy:
+            return GtkDocCommentBlockIndex(self, comments)
+
         comment_blocks = {}
 
-        for (comment, filename, lineno) in comments:
-            try:
-                comment_block = self.parse_comment_block(comment, filename, lineno)
-            except Exception as e:
-                error('unrecoverable parse error, please file a GObject-Introspection bug'
-                      'report including the complete comment block at the indicated location. %s' %
-                      str(e),
-                      Position(filename, lineno))
-                continue
+        if self._cachestore is not None:
+            parsed = self._parse_comment_blocks_cached(comments, jobs, pool)
+        elif jobs > 1:
+            comments = list(comments)
+            if len(comments) >= PARALLEL_PARSE_THRESHOLD:
+                parsed = self._parse_comment_blocks_parallel(comments, jobs, pool)
+            else:
+                parsed = self._parse_comment_blocks_serial(comments)
+        else:
+            parsed = self._parse_comment_blocks_serial(comments)
 
+        for comment_block in parsed:
             if comment_block is not None:
                 # Note: previous versions of this parser did not check if an identifier was
                 #       already stored in comment_blocks, so when different comment blocks where
@@ -1204,6 +1279,136 @@ class GtkDocCommentBlockParser(object):
 
         return comment_blocks
 
+    def _parse_comment_blocks_serial(self, comments):
+        for (comment, filename, lineno) in comments:
+            yield self._parse_comment_block_checked(comment, filename, lineno)
+
+    def _parse_comment_blocks_parallel(self, comments, jobs, pool=None):
+        # The results come back in order, so replaying each block's messages
+        # before yielding it keeps the output identical to a serial run.
+        for comment_block, messages in self._parse_comment_chunks_parallel(comments, jobs,
+                                                                           pool):
+            message.replay(messages)
+            yield comment_block
+
+    def _parse_comment_chunks_parallel(self, comments, jobs, pool=None):
+        # Contiguous chunks, a few per process to even out the load.
+        size = max(len(comments) // (jobs * 4), 1)
+        chunks = [comments[i:i + size] for i in range(0, len(comments), size)]
+
+        if pool is not None:
+            for results in pool.imap(_parse_comment_chunk, chunks):
+                for result in results:
+                    yield result
+            return
+
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for results in pool.imap(_parse_comment_chunk, chunks):
+                for result in results:
+                    yield result
+        finally:
+            pool.close()
+            pool.join()
+
+    def _parse_comment_blocks_cached(self, comments, jobs, pool=None):
+        # Cache entries are kept per source file, mapping the key of each comment
+        # block to the parsed block and the messages emitted while parsing it.
+        comments = list(comments)
+        entries = {}
+        keys = []
+        misses = []
+        for (comment, filename, lineno) in comments:
+            if filename not in entries:
+                entry_key = 'gtkdoc-comments-%d:%s' % (PARSER_CACHE_VERSION, filename)
+                entries[filename] = self._cachestore.load_key(entry_key) or {}
+            key = _comment_cache_key(comment, filename, lineno)
+            keys.append(key)
+            if key not in entries[filename]:
+                misses.append((comment, filename, lineno))
+
+        if jobs > 1 and len(misses) >= PARALLEL_PARSE_THRESHOLD:
+            results = list(self._parse_comment_chunks_parallel(misses, jobs, pool))
+        else:
+            results = _parse_comment_chunk(misses)
+
+        changed = set()
+        for (comment, filename, lineno), result in zip(misses, results):
+            entries[filename][_comment_cache_key(comment, filename, lineno)] = result
+            changed.add(filename)
+
+        # Only keep the comment blocks still present in the sources
+        used = dict((filename, {}) for filename in entries)
+        for (comment, filename, lineno), key in zip(comments, keys):
+            comment_block, messages = entries[filename][key]
+            used[filename][key] = (comment_block, messages)
+            message.replay(messages)
+            yield comment_block
+
+        for filename, entry in used.items():
+            if filename in changed or len(entry) != len(entries[filename]):
+                entry_key = 'gtkdoc-comments-%d:%s' % (PARSER_CACHE_VERSION, filename)
+                self._cachestore.store_key(entry_key, entry)
+
+    def _identify_comment_block(self, comment):
+        # A cheap subset of the checks done by parse_comment_block(). Returns the
+        # identifier name only when parsing is certain to produce a block named
+        # like that, None when the block has to be parsed to find out.
+        comment_lines = re.sub(LINE_BREAK_RE, '\n', comment).split('\n')
+
+        result = COMMENT_BLOCK_START_RE.match(comment_lines[0])
+        if not result or len(comment_lines) == 1:
+            return None
+        if not COMMENT_BLOCK_END_RE.match(comment_lines[-1]):
+            return None
+
+        if result.group('comment'):
+            line = result.group('comment')
+        elif len(comment_lines) > 2:
+            line = comment_lines[1]
+        else:
+            return None
+
+        result = COMMENT_ASTERISK_RE.match(line)
+        if result:
+            line = line[result.end(0):]
+
+        result = SECTION_RE.match(line)
+        if result:
+            return 'SECTION:%s' % (result.group('section_name'), )
+
+        # Annotations on the identifier may turn out to be a description,
+        # in which case the identifier is looked for on the following lines.
+        result = PROPERTY_RE.match(line)
+        if result:
+            if result.group('fields'):
+                return None
+            return '%s:%s' % (result.group('class_name'), result.group('property_name'))
+
+        result = SIGNAL_RE.match(line)
+        if result:
+            if result.group('fields'):
+                return None
+            return '%s::%s' % (result.group('class_name'), result.group('signal_name'))
+
+        result = SYMBOL_RE.match(line)
+        if result:
+            if result.group('fields'):
+                return None
+            return result.group('symbol_name')
+
+        return None
+
+    def _parse_comment_block_checked(self, comment, filename, lineno):
+        try:
+            return self.parse_comment_block(comment, filename, lineno)
+        except Exception as e:
+            error('unrecoverable parse error, please file a GObject-Introspection bug'
+                  'report including the complete comment block at the indicated location. %s' %
+                  str(e),
+                  Position(filename, lineno))
+            return None
+
     def parse_comment_block(self, comment, filename, lineno):
         '''
         Parse a single GTK-Doc comment block.
@@ -1218,7 +1423,9 @@ class GtkDocCommentBlockParser(object):
         code_before = ''
         code_after = ''
         comment_block_pos = Position(filename, lineno)
-        comment_lines = re.sub(LINE_BREAK_RE, '\n', comment).split('\n')
+        if '\r' in comment:
+            comment = re.sub(LINE_BREAK_RE, '\n', comment)
+        comment_lines = comment.split('\n')
         comment_lines_len = len(comment_lines)
 
         # Check for the start of the comment block.
@@ -1296,24 +1503,29 @@ class GtkDocCommentBlockParser(object):
             original_line = line
             column_offset = 0
 
+            # Split the line into its prefix parts with a single match, the first
+            # character after the indentation then tells which kind of line this is.
+            result = LINE_PREFIX_RE.match(line)
+
             # Store indentation level of the comment (before the ' * ')
-            result = INDENTATION_RE.match(line)
             block_indent.append(result.group('indentation'))
 
             # Get rid of the ' * ' at the start of the line.
-            result = COMMENT_ASTERISK_RE.match(line)
-            if result:
-                comment = result.group('comment')
+            comment = result.group('comment')
+            if comment is not None:
                 if comment:
                     error('invalid comment text:',
                           position, None, result.start('comment'), original_line)
 
-                column_offset = result.end(0)
-                line = line[result.end(0):]
+                column_offset = result.start('line_indentation')
+                line = line[column_offset:]
+                indentation = result.group('line_indentation')
+            else:
+                indentation = result.group('indentation')
 
             # Store indentation level of the line (after the ' * ').
-            result = INDENTATION_RE.match(line)
-            line_indent = len(result.group('indentation').replace('\t', '  '))
+            line_indent = len(indentation.replace('\t', '  '))
+            line_start = line[len(indentation):len(indentation) + 1]
 
             ####################################################################
             # Check for GTK-Doc comment block identifier.
@@ -1393,7 +1605,10 @@ class GtkDocCommentBlockParser(object):
             ####################################################################
             # Check for comment block parameters.
             ####################################################################
-            result = PARAMETER_RE.match(line)
+            if line_start == '@':
+                result = PARAMETER_RE.match(line)
+            else:
+                result = None
             if result:
                 part_indent = line_indent
                 param_name = result.group('parameter_name')
@@ -1471,7 +1686,7 @@ class GtkDocCommentBlockParser(object):
             #       at this location as those might be handy describing
             #       parameters from time to time...
             ####################################################################
-            if (EMPTY_LINE_RE.match(line) and in_part in [PART_IDENTIFIER, PART_PARAMETERS]):
+            if not line_start and in_part in [PART_IDENTIFIER, PART_PARAMETERS]:
                 in_part = PART_DESCRIPTION
                 part_indent = line_indent
                 continue
@@ -1479,7 +1694,11 @@ class GtkDocCommentBlockParser(object):
             ####################################################################
             # Check for GTK-Doc comment block tags.
             ####################################################################
-            result = TAG_RE.match(line)
+            # All tag names start with a letter
+            if line_start.isalpha():
+                result = TAG_RE.match(line)
+            else:
+                result = None
             if result and line_indent <= part_indent:
                 part_indent = line_indent
                 tag_name = result.group('tag_name')
@@ -1633,7 +1852,7 @@ class GtkDocCommentBlockParser(object):
             # If we get here, we must be in the middle of a multiline
             # comment block, parameter or tag description.
             ####################################################################
-            if EMPTY_LINE_RE.match(line) is None:
+            if line_start:
                 line = line.rstrip()
 
             if in_part in [PART_IDENTIFIER, PART_DESCRIPTION]:
@@ -1994,6 +2213,103 @@ class GtkDocCommentBlockParser(object):
                                   description_field)
 
 
+class GtkDocCommentBlockIndex(object):
+    '''
+    Read-only mapping of identifier names to :class:`GtkDocCommentBlock` objects, returned
+    by :meth:`GtkDocCommentBlockParser.parse_comment_blocks` in lazy mode.
+
+    The comment blocks are indexed by their identifier line and only parsed the first time
+    they are looked up, so blocks documenting private or foreign symbols are never parsed.
+    Blocks whose identifier can not be determined cheaply are parsed right away. Messages
+    are emitted when a block is parsed, those of blocks never looked up are not emitted.
+    '''
+
+    def __init__(self, parser, comments):
+        self._parser = parser
+        self._blocks = {}
+        self._pending = {}
+
+        positions = {}
+        for (comment, filename, lineno) in comments:
+            name = parser._identify_comment_block(comment)
+            if name is None:
+                comment_block = parser._parse_comment_block_checked(comment, filename, lineno)
+                if comment_block is None:
+                    continue
+                name = comment_block.name
+                position = comment_block.position
+            else:
+                comment_block = None
+                position = Position(filename, lineno)
+
+            # Same "last block wins" behavior as the eager parser.
+            if name in positions:
+                firstseen = positions[name]
+                path = os.path.dirname(firstseen.filename)
+                warn('multiple comment blocks documenting \'%s:\' identifier '
+                     '(already seen at %s).' %
+                     (name, firstseen.format(path)),
+                     position)
+            positions[name] = position
+
+            if comment_block is None:
+                # Keep the blocks seen before as fallbacks, the eager parser keeps the
+                # previous block when the last one fails to parse.
+                pending = self._pending.setdefault(name, [])
+                if name in self._blocks:
+                    pending.append(self._blocks.pop(name))
+                pending.append((comment, filename, lineno))
+            else:
+                self._pending.pop(name, None)
+                self._blocks[name] = comment_block
+
+    def _resolve(self, name):
+        pending = self._pending.pop(name, None)
+        while pending:
+            comment_block = pending.pop()
+            if not isinstance(comment_block, GtkDocCommentBlock):
+                comment_block = self._parser._parse_comment_block_checked(*comment_block)
+            if comment_block is not None:
+                self._blocks[name] = comment_block
+                break
+
+    def _resolve_all(self):
+        for name in list(self._pending):
+            self._resolve(name)
+
+    def __getitem__(self, name):
+        self._resolve(name)
+        return self._blocks[name]
+
+    def __contains__(self, name):
+        self._resolve(name)
+        return name in self._blocks
+
+    def __iter__(self):
+        self._resolve_all()
+        return iter(self._blocks)
+
+    def __len__(self):
+        self._resolve_all()
+        return len(self._blocks)
+
+    def get(self, name, default=None):
+        self._resolve(name)
+        return self._blocks.get(name, default)
+
+    def keys(self):
+        self._resolve_all()
+        return self._blocks.keys()
+
+    def values(self):
+        self._resolve_all()
+        return self._blocks.values()
+
+    def items(self):
+        self._resolve_all()
+        return self._blocks.items()
+
+
 class GtkDocCommentBlockWriter(object):
     '''
     Serialized :class:`GtkDocCommentBlock` objects into GTK-Doc comment blocks.
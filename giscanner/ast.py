@@ -29,13 +29,14 @@ import operator
 from itertools import chain
 
 from . import message
+from . import utils
 
 from .collections import OrderedDict
 from .message import Position
 from .utils import to_underscores
 
 
-class Type(object):
+class Type(utils.SlotsObject):
     """
     A Type can be either:
     * A reference to a node (target_giname)
@@ -46,6 +47,9 @@ class Type(object):
     from a C type string, or a gtype_name (from g_type_name()).
     """
 
+    __slots__ = ('ctype', 'gtype_name', 'origin_symbol', 'target_fundamental',
+                 'target_giname', 'target_foreign', 'is_const', 'complete_ctype')
+
     def __init__(self,
                  ctype=None,
                  gtype_name=None,
@@ -56,8 +60,8 @@ class Type(object):
                  is_const=False,
                  origin_symbol=None,
                  complete_ctype=None):
-        self.ctype = ctype
-        self.gtype_name = gtype_name
+        self.ctype = utils.intern_string(ctype)
+        self.gtype_name = utils.intern_string(gtype_name)
         self.origin_symbol = origin_symbol
         if _target_unknown:
             assert isinstance(self, TypeUnknown)
@@ -74,11 +78,11 @@ class Type(object):
             assert target_fundamental is None
         else:
             assert (ctype is not None) or (gtype_name is not None)
-        self.target_fundamental = target_fundamental
-        self.target_giname = target_giname
-        self.target_foreign = target_foreign
+        self.target_fundamental = utils.intern_string(target_fundamental)
+        self.target_giname = utils.intern_string(target_giname)
+        self.target_foreign = utils.intern_string(target_foreign)
         self.is_const = is_const
-        self.complete_ctype = complete_ctype
+        self.complete_ctype = utils.intern_string(complete_ctype)
 
     @property
     def resolved(self):
@@ -105,16 +109,14 @@ in contrast to the other create_type() functions."""
         # First, is it a fundamental?
         fundamental = type_names.get(gtype_name)
         if fundamental is not None:
-            return cls(target_fundamental=fundamental.target_fundamental,
-                       ctype=fundamental.ctype)
+            return fundamental_type(fundamental.target_fundamental, fundamental.ctype)
         if gtype_name == 'GHashTable':
             return Map(TYPE_ANY, TYPE_ANY, gtype_name=gtype_name)
         elif gtype_name in ('GArray', 'GPtrArray', 'GByteArray'):
             return Array('GLib.' + gtype_name[1:], TYPE_ANY,
                          gtype_name=gtype_name)
         elif gtype_name == 'GStrv':
-            bare_utf8 = TYPE_STRING.clone()
-            bare_utf8.ctype = None
+            bare_utf8 = fundamental_type(TYPE_STRING.target_fundamental)
             return Array(None, bare_utf8, ctype=None, gtype_name=gtype_name,
                          is_const=False)
 
@@ -147,9 +149,13 @@ in contrast to the other create_type() functions."""
         return self._compare(other, operator.le)
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return self._compare(other, operator.eq)
 
     def __ne__(self, other):
+        if self is other:
+            return False
         return self._compare(other, operator.ne)
 
     def __hash__(self):
@@ -162,6 +168,8 @@ in contrast to the other create_type() functions."""
         A sequence may be given for typeval, in which case
         this function returns True if the type is compatible with
         any."""
+        if typeval is self:
+            return True
         if isinstance(typeval, (list, tuple)):
             for val in typeval:
                 if self.is_equiv(val):
@@ -176,6 +184,11 @@ in contrast to the other create_type() functions."""
                     ctype=self.ctype,
                     is_const=self.is_const)
 
+    def unshare(self):
+        """Return a Type that may be modified in place: this one, or a
+copy of it if it is a shared fundamental type."""
+        return self
+
     def __str__(self):
         if self.target_fundamental:
             return self.target_fundamental
@@ -196,51 +209,101 @@ in contrast to the other create_type() functions."""
         return '%s(%sctype=%s)' % (self.__class__.__name__, data, self.ctype)
 
 
+class FrozenType(Type):
+    """A fundamental type shared by everything referring to it, see
+fundamental_type().  Shared types can't be modified, unshare() returns
+a private copy to modify instead."""
+
+    __slots__ = ()
+
+    def __init__(self, target_fundamental, ctype=None, is_const=False, complete_ctype=None):
+        # Type.__init__() would go through __setattr__()
+        set_slot = object.__setattr__
+        set_slot(self, 'ctype', utils.intern_string(ctype))
+        set_slot(self, 'gtype_name', None)
+        set_slot(self, 'origin_symbol', None)
+        set_slot(self, 'target_fundamental', utils.intern_string(target_fundamental))
+        set_slot(self, 'target_giname', None)
+        set_slot(self, 'target_foreign', None)
+        set_slot(self, 'is_const', is_const)
+        set_slot(self, 'complete_ctype', utils.intern_string(complete_ctype))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("can't set %s on shared %r, use unshare()" % (name, self))
+
+    def __reduce__(self):
+        return (fundamental_type, (self.target_fundamental, self.ctype,
+                                   self.is_const, self.complete_ctype))
+
+    def __repr__(self):
+        # Shared types stand in for plain ones, also in messages
+        return 'Type' + Type.__repr__(self)[len('FrozenType'):]
+
+    def unshare(self):
+        return Type(target_fundamental=self.target_fundamental,
+                    ctype=self.ctype,
+                    is_const=self.is_const,
+                    complete_ctype=self.complete_ctype)
+
+
+_fundamental_types = {}
+
+
+def fundamental_type(target_fundamental, ctype=None, is_const=False, complete_ctype=None):
+    """Return the shared Type for a fundamental type, with the given C type."""
+    key = (target_fundamental, ctype, is_const, complete_ctype)
+    typeval = _fundamental_types.get(key)
+    if typeval is None:
+        typeval = FrozenType(target_fundamental, ctype, is_const, complete_ctype)
+        _fundamental_types[key] = typeval
+    return typeval
+
+
 class TypeUnknown(Type):
+    __slots__ = ()
+
     def __init__(self):
         Type.__init__(self, _target_unknown=True)
 
 # Fundamental types, two special ones
-TYPE_NONE = Type(target_fundamental='none', ctype='void')
-TYPE_ANY = Type(target_fundamental='gpointer', ctype='gpointer')
+TYPE_NONE = fundamental_type('none', 'void')
+TYPE_ANY = fundamental_type('gpointer', 'gpointer')
 # Fundamental types, "Basic" types
-TYPE_BOOLEAN = Type(target_fundamental='gboolean', ctype='gboolean')
-TYPE_INT8 = Type(target_fundamental='gint8', ctype='gint8')
-TYPE_UINT8 = Type(target_fundamental='guint8', ctype='guint8')
-TYPE_INT16 = Type(target_fundamental='gint16', ctype='gint16')
-TYPE_UINT16 = Type(target_fundamental='guint16', ctype='guint16')
-TYPE_INT32 = Type(target_fundamental='gint32', ctype='gint32')
-TYPE_UINT32 = Type(target_fundamental='guint32', ctype='guint32')
-TYPE_INT64 = Type(target_fundamental='gint64', ctype='gint64')
-TYPE_UINT64 = Type(target_fundamental='guint64', ctype='guint64')
-TYPE_CHAR = Type(target_fundamental='gchar', ctype='gchar')
-TYPE_SHORT = Type(target_fundamental='gshort', ctype='gshort')
-TYPE_USHORT = Type(target_fundamental='gushort', ctype='gushort')
-TYPE_INT = Type(target_fundamental='gint', ctype='gint')
-TYPE_UINT = Type(target_fundamental='guint', ctype='guint')
-TYPE_LONG = Type(target_fundamental='glong', ctype='glong')
-TYPE_ULONG = Type(target_fundamental='gulong', ctype='gulong')
-TYPE_SIZE = Type(target_fundamental='gsize', ctype='gsize')
-TYPE_SSIZE = Type(target_fundamental='gssize', ctype='gssize')
-TYPE_INTPTR = Type(target_fundamental='gintptr', ctype='gintptr')
-TYPE_UINTPTR = Type(target_fundamental='guintptr', ctype='guintptr')
+TYPE_BOOLEAN = fundamental_type('gboolean', 'gboolean')
+TYPE_INT8 = fundamental_type('gint8', 'gint8')
+TYPE_UINT8 = fundamental_type('guint8', 'guint8')
+TYPE_INT16 = fundamental_type('gint16', 'gint16')
+TYPE_UINT16 = fundamental_type('guint16', 'guint16')
+TYPE_INT32 = fundamental_type('gint32', 'gint32')
+TYPE_UINT32 = fundamental_type('guint32', 'guint32')
+TYPE_INT64 = fundamental_type('gint64', 'gint64')
+TYPE_UINT64 = fundamental_type('guint64', 'guint64')
+TYPE_CHAR = fundamental_type('gchar', 'gchar')
+TYPE_SHORT = fundamental_type('gshort', 'gshort')
+TYPE_USHORT = fundamental_type('gushort', 'gushort')
+TYPE_INT = fundamental_type('gint', 'gint')
+TYPE_UINT = fundamental_type('guint', 'guint')
+TYPE_LONG = fundamental_type('glong', 'glong')
+TYPE_ULONG = fundamental_type('gulong', 'gulong')
+TYPE_SIZE = fundamental_type('gsize', 'gsize')
+TYPE_SSIZE = fundamental_type('gssize', 'gssize')
+TYPE_INTPTR = fundamental_type('gintptr', 'gintptr')
+TYPE_UINTPTR = fundamental_type('guintptr', 'guintptr')
 # C99 types
-TYPE_LONG_LONG = Type(target_fundamental='long long', ctype='long long')
-TYPE_LONG_ULONG = Type(target_fundamental='unsigned long long',
-                       ctype='unsigned long long')
-TYPE_FLOAT = Type(target_fundamental='gfloat', ctype='gfloat')
-TYPE_DOUBLE = Type(target_fundamental='gdouble', ctype='gdouble')
+TYPE_LONG_LONG = fundamental_type('long long', 'long long')
+TYPE_LONG_ULONG = fundamental_type('unsigned long long', 'unsigned long long')
+TYPE_FLOAT = fundamental_type('gfloat', 'gfloat')
+TYPE_DOUBLE = fundamental_type('gdouble', 'gdouble')
 # ?
-TYPE_LONG_DOUBLE = Type(target_fundamental='long double',
-                        ctype='long double')
-TYPE_UNICHAR = Type(target_fundamental='gunichar', ctype='gunichar')
+TYPE_LONG_DOUBLE = fundamental_type('long double', 'long double')
+TYPE_UNICHAR = fundamental_type('gunichar', 'gunichar')
 
 # C types with semantics overlaid
-TYPE_GTYPE = Type(target_fundamental='GType', ctype='GType')
-TYPE_STRING = Type(target_fundamental='utf8', ctype='gchar*')
-TYPE_FILENAME = Type(target_fundamental='filename', ctype='gchar*')
+TYPE_GTYPE = fundamental_type('GType', 'GType')
+TYPE_STRING = fundamental_type('utf8', 'gchar*')
+TYPE_FILENAME = fundamental_type('filename', 'gchar*')
 
-TYPE_VALIST = Type(target_fundamental='va_list', ctype='va_list')
+TYPE_VALIST = fundamental_type('va_list', 'va_list')
 
 BASIC_TYPES = [TYPE_BOOLEAN, TYPE_INT8, TYPE_UINT8, TYPE_INT16,
                TYPE_UINT16, TYPE_INT32, TYPE_UINT32, TYPE_INT64,
@@ -395,6 +458,12 @@ class Namespace(object):
         self.type_names = {}         # Maps from GTName -> node
         self.ctypes = {}             # Maps from CType -> node
         self.symbols = {}            # Maps from function symbols -> Function
+        # Secondary indexes of self.names, see get_nodes_of_kind()
+        self._kind_indexes = {}      # Maps from node kind -> OrderedDict
+        self._registered_types = OrderedDict()  # Nodes with a get_type function
+        self._serials = {}           # Maps from GIName -> insertion serial
+        self._next_serial = 0
+        self._check_indexes = utils.have_debug_flag('namespace-indexes')
         # Immediate includes only, not their transitive closure:
         self.includes = set()        # Include
         self.shared_libraries = []   # str
@@ -409,7 +478,7 @@ fully-qualified GIName like 'Foo.Bar', returns a Type targeting it .
 Otherwise a Type targeting name qualififed with the namespace name is
 returned."""
         if name in type_names:
-            return Type(target_fundamental=name, ctype=ctype)
+            return fundamental_type(name, ctype)
         if '.' in name:
             target = name
         else:
@@ -455,6 +524,28 @@ but adds it to things like ctypes, symbols, and type_names.
         if hasattr(node, 'ctype'):
             self.ctypes[node.ctype] = node
 
+    def _get_kind(self, node):
+        for kind in self.INDEXED_KINDS:
+            if isinstance(node, kind):
+                return kind
+        return None
+
+    def _index(self, node):
+        kind = self._get_kind(node)
+        if kind is not None:
+            self._kind_indexes.setdefault(kind, OrderedDict())[node.name] = node
+        if isinstance(node, Registered) and node.get_type is not None:
+            self._registered_types[node.name] = node
+        self._serials[node.name] = self._next_serial
+        self._next_serial += 1
+
+    def _unindex(self, node):
+        kind = self._get_kind(node)
+        if kind is not None:
+            del self._kind_indexes[kind][node.name]
+        self._registered_types.pop(node.name, None)
+        del self._serials[node.name]
+
     def append(self, node, replace=False):
         previous = self.names.get(node.name)
         if previous is not None:
@@ -464,6 +555,9 @@ but adds it to things like ctypes, symbols, and type_names.
 
         self.track(node)
         self.names[node.name] = node
+        self._index(node)
+        if self._check_indexes:
+            self.check_indexes()
 
     def remove(self, node):
         if isinstance(node, Alias):
@@ -475,7 +569,11 @@ but adds it to things like ctypes, symbols, and type_names.
         if isinstance(node, Function):
             del self.symbols[node.symbol]
         node.namespace = None
-        self.names.pop(node.name, None)
+        previous = self.names.pop(node.name, None)
+        if previous is not None:
+            self._unindex(previous)
+        if self._check_indexes:
+            self.check_indexes()
 
     def float(self, node):
         """Like remove(), but doesn't unset the node's namespace
@@ -505,6 +603,40 @@ functions via get_by_symbol()."""
     def get_by_symbol(self, symbol):
         return self.symbols.get(symbol)
 
+    def get_nodes_of_kind(self, *kinds):
+        """Returns a list of the toplevel nodes which are instances of
+one of kinds, in the order of values().  Each kind must be one of
+INDEXED_KINDS; subclasses are included, so Function also returns the
+ErrorQuarkFunction nodes."""
+        nodes = []
+        for kind in kinds:
+            assert kind in self.INDEXED_KINDS, kind
+            index = self._kind_indexes.get(kind)
+            if index:
+                nodes.extend(index.values())
+        if len(kinds) > 1:
+            nodes.sort(key=lambda node: self._serials[node.name])
+        return nodes
+
+    def get_registered_types(self):
+        """Returns a list of the toplevel Registered nodes which have a
+get_type function, in the order of values()."""
+        return list(self._registered_types.values())
+
+    def check_indexes(self):
+        """Asserts that the secondary indexes used by get_nodes_of_kind()
+and get_registered_types() agree with values().  Called after every
+change when GI_SCANNER_DEBUG contains namespace-indexes."""
+        for kind in self.INDEXED_KINDS:
+            expected = [node for node in self.values() if self._get_kind(node) is kind]
+            assert self.get_nodes_of_kind(kind) == expected, kind
+        expected = [node for node in self.values()
+                    if isinstance(node, Registered) and node.get_type is not None]
+        assert self.get_registered_types() == expected
+        serials = [self._serials[name] for name in self.names]
+        assert sorted(serials) == serials
+        assert len(self._serials) == len(self.names)
+
     def walk(self, callback):
         for node in self.values():
             node.walk(callback, [])
@@ -548,9 +680,13 @@ class Include(object):
         return '%s-%s' % (self.name, self.version)
 
 
-class Annotated(object):
+class Annotated(utils.SlotsObject):
     """An object which has a few generic metadata
 properties."""
+
+    __slots__ = ('version', 'version_doc', 'skip', 'introspectable', 'attributes',
+                 'stability', 'stability_doc', 'deprecated', 'deprecated_doc', 'doc')
+
     def __init__(self):
         self.version = None
         self.version_doc = None
@@ -775,6 +911,8 @@ class VFunction(Callable):
 
 class Varargs(Type):
 
+    __slots__ = ()
+
     def __init__(self):
         Type.__init__(self, '<varargs>', target_fundamental='<varargs>')
 
@@ -785,6 +923,8 @@ class Array(Type):
     GLIB_BYTEARRAY = 'GLib.ByteArray'
     GLIB_PTRARRAY = 'GLib.PtrArray'
 
+    __slots__ = ('array_type', 'element_type', 'zeroterminated', 'length_param_name', 'size')
+
     def __init__(self, array_type, element_type, **kwargs):
         Type.__init__(self, target_fundamental='<array>',
                       **kwargs)
@@ -811,6 +951,8 @@ class Array(Type):
 
 class List(Type):
 
+    __slots__ = ('name', 'element_type')
+
     def __init__(self, name, element_type, **kwargs):
         Type.__init__(self, target_fundamental='<list>',
                       **kwargs)
@@ -824,6 +966,8 @@ class List(Type):
 
 class Map(Type):
 
+    __slots__ = ('key_type', 'value_type')
+
     def __init__(self, key_type, value_type, **kwargs):
         Type.__init__(self, target_fundamental='<map>', **kwargs)
         assert isinstance(key_type, Type)
@@ -846,6 +990,8 @@ class Alias(Node):
 class TypeContainer(Annotated):
     """A fundamental base class for Return and Parameter."""
 
+    __slots__ = ('type', 'nullable', 'not_nullable', 'direction', 'transfer')
+
     def __init__(self, typenode, nullable, not_nullable, transfer, direction):
         Annotated.__init__(self)
         self.type = typenode
@@ -863,13 +1009,16 @@ class TypeContainer(Annotated):
 class Parameter(TypeContainer):
     """An argument to a function."""
 
+    __slots__ = ('argname', 'optional', 'parent', 'scope', 'caller_allocates',
+                 'closure_name', 'destroy_name')
+
     def __init__(self, argname, typenode, direction=None,
                  transfer=None, nullable=False, optional=False,
                  allow_none=False, scope=None,
                  caller_allocates=False, not_nullable=False):
         TypeContainer.__init__(self, typenode, nullable, not_nullable,
                                transfer, direction)
-        self.argname = argname
+        self.argname = utils.intern_string(argname)
         self.optional = optional
         self.parent = None  # A Callable
 
@@ -892,6 +1041,8 @@ class Parameter(TypeContainer):
 class Return(TypeContainer):
     """A return value from a function."""
 
+    __slots__ = ('parent', )
+
     def __init__(self, rtype, nullable=False, not_nullable=False,
                  transfer=None):
         TypeContainer.__init__(self, rtype, nullable, not_nullable, transfer,
@@ -945,6 +1096,8 @@ class Bitfield(Node, Registered):
 
 class Member(Annotated):
 
+    __slots__ = ('name', 'value', 'symbol', 'nick', 'parent', 'namespace')
+
     def __init__(self, name, value, symbol, nick):
         Annotated.__init__(self)
         self.name = name
@@ -1033,11 +1186,15 @@ class Compound(Node, Registered):
 
 class Field(Annotated):
 
+    # _chain is set by the DocWriter, fields are rendered like nodes there
+    __slots__ = ('name', 'type', 'readable', 'writable', 'bits', 'anonymous_node',
+                 'private', 'namespace', 'parent', '_chain')
+
     def __init__(self, name, typenode, readable, writable, bits=None,
                  anonymous_node=None):
         Annotated.__init__(self)
         assert (typenode or anonymous_node)
-        self.name = name
+        self.name = utils.intern_string(name)
         self.type = typenode
         self.readable = readable
         self.writable = writable
@@ -1274,3 +1431,9 @@ class Callback(Callable):
     def __init__(self, name, retval, parameters, throws, ctype=None):
         Callable.__init__(self, name, retval, parameters, throws)
         self.ctype = ctype
+
+
+# The toplevel node kinds Namespace keeps a secondary index of; defined
+# here since the classes are only available at the end of the module.
+Namespace.INDEXED_KINDS = (Function, Callback, Class, Interface, Record, Union,
+                           Boxed, Enum, Bitfield, Alias, Constant)
@@ -47,6 +47,8 @@ _CACHE_VERSION_FILENAME = '.cache-version'
 def _get_versionhash():
     toplevel = os.path.dirname(giscanner.__file__)
     sources = glob.glob(os.path.join(toplevel, '*.py'))
+    # The C source scanner output is cached as well
+    sources.extend(glob.glob(os.path.join(toplevel, '_giscanner*')))
     sources.append(sys.argv[0])
     # Using mtimes is a bit (5x) faster than hashing the file contents
     mtimes = (str(os.stat(source).st_mtime) for source in sources)
@@ -142,6 +144,18 @@ class CacheStore(object):
         if (os.path.exists(store_filename) and self._cache_is_valid(store_filename, filename)):
             return None
 
+        self._store(store_filename, data)
+
+    def store_key(self, key, data):
+        """Store data under an arbitrary key, typically a hash of the
+        contents it was computed from, rather than a filename."""
+        store_filename = self._get_filename(key)
+        if store_filename is None:
+            return
+
+        self._store(store_filename, data)
+
+    def _store(self, store_filename, data):
         tmp_fd, tmp_filename = tempfile.mkstemp(prefix='g-ir-scanner-cache-')
         try:
             with os.fdopen(tmp_fd, 'wb') as tmp_file:
@@ -167,6 +181,19 @@ class CacheStore(object):
         store_filename = self._get_filename(filename)
         if store_filename is None:
             return
+        if not os.path.exists(store_filename):
+            return None
+        if not self._cache_is_valid(store_filename, filename):
+            return None
+        return self._load(store_filename)
+
+    def load_key(self, key):
+        store_filename = self._get_filename(key)
+        if store_filename is None:
+            return
+        return self._load(store_filename)
+
+    def _load(self, store_filename):
         try:
             fd = open(store_filename, 'rb')
         except (IOError, OSError) as e:
@@ -174,12 +201,11 @@ class CacheStore(object):
                 return None
             else:
                 raise
-        if not self._cache_is_valid(store_filename, filename):
-            return None
-        try:
-            data = pickle.load(fd)
-        except (AttributeError, EOFError, ValueError, pickle.BadPickleGet):
-            # Broken cache entry, remove it
-            self._remove_filename(store_filename)
-            data = None
+        with fd:
+            try:
+                data = pickle.load(fd)
+            except (AttributeError, EOFError, ValueError, pickle.BadPickleGet):
+                # Broken cache entry, remove it
+                self._remove_filename(store_filename)
+                data = None
         return data
@@ -184,7 +184,9 @@ class CCompiler(object):
                 else:
                     args.append('-l' + library)
 
-    def preprocess(self, source, output, cpp_options):
+    def _get_preprocess_args(self, cpp_options):
+        # The macros, include directories and extra arguments both
+        # preprocess() and preprocess_pipe() pass to the preprocessor
         extra_postargs = ['-C']
         (include_paths, macros, postargs) = self._set_cpp_options(cpp_options)
 
@@ -203,12 +205,37 @@ class CCompiler(object):
             macros.append(('_CRT_NONSTDC_NO_WARNINGS', None))
             macros.append(('SAL_NO_ATTRIBUTE_DECLARATIONS', None))
 
+        return (macros, include_dirs, extra_postargs)
+
+    def preprocess(self, source, output, cpp_options):
+        (macros, include_dirs, extra_postargs) = self._get_preprocess_args(cpp_options)
+
         self.compiler.preprocess(source=source,
                                  output_file=output,
                                  macros=macros,
                                  include_dirs=include_dirs,
                                  extra_postargs=extra_postargs)
 
+    def can_preprocess_pipe(self):
+        # cl.exe cannot read its source from stdin
+        return not self.check_is_msvc() and self.compiler.preprocessor is not None
+
+    def preprocess_pipe(self, cpp_options):
+        """Start the preprocessor on the source written to its stdin.
+
+        Returns the subprocess.Popen object, the preprocessed output can be
+        read from its stdout.  Arguments are the same preprocess() passes to
+        distutils, with the source file replaced by '-'.
+        """
+        (macros, include_dirs, extra_postargs) = self._get_preprocess_args(cpp_options)
+
+        args = list(self.compiler.preprocessor)
+        args.extend(distutils.ccompiler.gen_preprocess_options(macros, include_dirs))
+        args.append('-')
+        args.extend(extra_postargs)
+
+        return subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
     def compile(self, pkg_config_cflags, cpp_includes, source, init_sections):
         extra_postargs = []
         includes = []
@@ -26,7 +26,7 @@ from __future__ import unicode_literals
 import os
 import argparse
 
-from .docwriter import DocWriter
+from .docwriter import DocWriter, clean_leaked_module_directories
 from .sectionparser import generate_sections_file, write_sections_file
 from .transformer import Transformer
 
@@ -41,13 +41,17 @@ def doc_main(args):
     parser.add_argument("-l", "--language",
                       action="store", dest="language",
                       default="c",
-                      help="Output language")
+                      help="Output language, or a comma-separated list of output "
+                           "languages written to subdirectories of the output directory")
     parser.add_argument("-I", "--add-include-path",
                       action="append", dest="include_paths", default=[],
                       help="include paths for other GIR files")
     parser.add_argument("-s", "--write-sections-file",
                       action="store_true", dest="write_sections",
                       help="Generate and write out a sections file")
+    parser.add_argument("-j", "--jobs",
+                      action="store", dest="jobs", type=int, default=1,
+                      help="number of processes used to render the pages")
 
     args = parser.parse_args(args[1:])
     if not args.output:
@@ -68,7 +72,21 @@ def doc_main(args):
         with open(args.output, 'w') as fp:
             write_sections_file(fp, sections_file)
     else:
-        writer = DocWriter(transformer, args.language)
-        writer.write(args.output)
+        # Earlier versions left the compiled templates in the temporary directory
+        clean_leaked_module_directories()
+
+        # All languages share the parsed GIR files and the templates
+        languages = []
+        for language in args.language.split(','):
+            language = language.strip()
+            if language not in languages:
+                languages.append(language)
+        writers = [DocWriter(transformer, language) for language in languages]
+        for writer in writers:
+            if len(writers) > 1:
+                output = os.path.join(args.output, writer.language)
+            else:
+                output = args.output
+            writer.write(output, args.jobs)
 
     return 0
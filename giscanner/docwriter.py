@@ -26,16 +26,33 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import atexit
+import errno
+import hashlib
+import json
+import multiprocessing
 import os
 import re
+import shutil
+import sys
 import tempfile
 
 from xml.sax import saxutils
+import mako
 from mako.lookup import TemplateLookup
 
-from . import ast, xmlwriter
+from . import ast, utils, xmlwriter
+from .collections import OrderedDict
+from .message import Position
 from .utils import to_underscores
 
+# Maps the id of every page written to an output directory to the
+# fingerprint of the node it was rendered from and a hash of its contents
+MANIFEST_FILENAME = '.page-manifest'
+
+# Bump this when the manifest format changes
+MANIFEST_VERSION = 1
+
 
 def make_page_id(node, recursive=False):
     if isinstance(node, ast.Namespace):
@@ -440,9 +457,7 @@ class DocFormatter(object):
         node_name = node.namespace.name + '.' + node.name
         impl = []
 
-        for c in node.namespace.values():
-            if not isinstance(c, ast.Class):
-                continue
+        for c in node.namespace.get_nodes_of_kind(ast.Class):
             for implemented in c.interfaces:
                 if implemented.target_giname == node_name:
                     impl.append(c)
@@ -884,6 +899,170 @@ LANGUAGES = {
 }
 
 
+_TEMPLATE_MODULES_PREFIX = 'templates-'
+_LEAKED_MODULES_STAMP = 'leaked-templates-removed'
+
+# Maps from template directory -> TemplateLookup, shared by all the
+# DocWriters of a process so each template is only loaded once
+_template_lookups = {}
+
+
+def _is_leaked_module_directory(path):
+    # Before compiled templates were cached, every run left a directory made
+    # by tempfile.mkdtemp() behind, holding nothing but the modules compiled
+    # from doctemplates/, i.e. <language>/<kind>.tmpl.py and base.tmpl.py
+    languages = set(formatter.language for formatter in LANGUAGES.values())
+    n_modules = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        if dirpath == path:
+            if any(dirname not in languages for dirname in dirnames):
+                return False
+        elif os.path.basename(dirpath) != '__pycache__':
+            if any(dirname != '__pycache__' for dirname in dirnames):
+                return False
+        if not all('.tmpl.' in filename for filename in filenames):
+            return False
+        n_modules += len(filenames)
+    return n_modules > 0
+
+
+def clean_leaked_module_directories():
+    """Removes the directories of compiled templates which earlier versions
+left behind in the temporary directory.  This is only done once per user,
+a stamp file in the cache directory records that it has been done.  Without
+the cache directory nothing is removed, as the cleanup could not be limited
+to a single run."""
+    if 'GI_SCANNER_DISABLE_CACHE' in os.environ:
+        return
+    cachedir = utils.get_user_cache_dir('g-ir-doc-tool')
+    if cachedir is None:
+        return
+    stamp = os.path.join(cachedir, _LEAKED_MODULES_STAMP)
+    if os.path.exists(stamp):
+        return
+
+    tmpdir = tempfile.gettempdir()
+    getuid = getattr(os, 'getuid', None)
+    for filename in os.listdir(tmpdir):
+        path = os.path.join(tmpdir, filename)
+        if not filename.startswith(tempfile.gettempprefix()) or not os.path.isdir(path):
+            continue
+        try:
+            if getuid is not None and os.stat(path).st_uid != getuid():
+                continue
+            if not _is_leaked_module_directory(path):
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+    try:
+        open(stamp, 'w').close()
+    except (IOError, OSError):
+        pass
+
+
+def _get_module_directory(template_dir):
+    # Compiled templates depend on the mako and Python versions, mako itself
+    # recompiles templates that changed.  Every template directory gets its
+    # own modules, so installed and uninstalled runs don't share them.
+    if 'GI_SCANNER_DISABLE_CACHE' not in os.environ:
+        cachedir = utils.get_user_cache_dir('g-ir-doc-tool')
+        if cachedir is not None:
+            versions = '%s:%d.%d' % (mako.__version__, sys.version_info[0],
+                                     sys.version_info[1])
+            prefix = '%s%s-' % (_TEMPLATE_MODULES_PREFIX,
+                                hashlib.sha1(versions.encode('utf-8')).hexdigest())
+            dirname = prefix + hashlib.sha1(template_dir.encode('utf-8')).hexdigest()
+            directory = os.path.join(cachedir, dirname)
+            if os.path.isdir(directory):
+                return directory
+            try:
+                os.mkdir(directory)
+            except OSError:
+                pass
+            else:
+                # Modules compiled for other mako or Python versions are
+                # never loaded again
+                for filename in os.listdir(cachedir):
+                    if (filename.startswith(_TEMPLATE_MODULES_PREFIX)
+                            and not filename.startswith(prefix)):
+                        shutil.rmtree(os.path.join(cachedir, filename), ignore_errors=True)
+                return directory
+
+    directory = tempfile.mkdtemp(prefix='g-ir-doc-tool-')
+    atexit.register(shutil.rmtree, directory, True)
+    return directory
+
+
+# The DocWriter and pages of a parallel DocWriter.write(), inherited
+# by the worker processes when they are forked
+_worker_writer = None
+_worker_pages = None
+_worker_output = None
+
+
+def _get_fork_context():
+    # Workers get the transformer and loaded templates by forking, so
+    # pages are only rendered in parallel where fork() is available.
+    if not hasattr(os, 'fork'):
+        return None
+    get_context = getattr(multiprocessing, 'get_context', None)
+    if get_context is None:
+        # Python 2 always forks
+        return multiprocessing
+    return get_context('fork')
+
+
+def _render_pages_in_worker(indices):
+    return [_worker_writer._render_node(_worker_pages[index][0], _worker_output,
+                                        _worker_pages[index][1])
+            for index in indices]
+
+
+_renderer_hash = None
+
+
+def _get_renderer_hash():
+    # Pages change with the templates and the formatters, which live in
+    # this file, so those are part of every page fingerprint.
+    global _renderer_hash
+    if _renderer_hash is None:
+        lookup = get_template_lookup()
+        digest = hashlib.sha1()
+        digest.update(mako.__version__.encode('utf-8'))
+        filenames = []
+        for template_dir in lookup.directories:
+            for dirpath, dirnames, dirfilenames in os.walk(template_dir):
+                filenames.extend(os.path.join(dirpath, filename)
+                                 for filename in dirfilenames if filename.endswith('.tmpl'))
+        filenames.sort()
+        filenames.append(__file__)
+        for filename in filenames:
+            with open(filename, 'rb') as fp:
+                digest.update(fp.read())
+        _renderer_hash = digest.hexdigest()
+    return _renderer_hash
+
+
+def get_template_lookup():
+    if 'UNINSTALLED_INTROSPECTION_SRCDIR' in os.environ:
+        top_srcdir = os.environ['UNINSTALLED_INTROSPECTION_SRCDIR']
+        srcdir = os.path.join(top_srcdir, 'giscanner')
+    else:
+        srcdir = os.path.dirname(__file__)
+
+    template_dir = os.path.join(srcdir, 'doctemplates')
+
+    lookup = _template_lookups.get(template_dir)
+    if lookup is None:
+        lookup = TemplateLookup(directories=[template_dir],
+                                module_directory=_get_module_directory(template_dir),
+                                output_encoding='utf-8')
+        _template_lookups[template_dir] = lookup
+    return lookup
+
+
 class DocWriter(object):
     def __init__(self, transformer, language):
         self._transformer = transformer
@@ -896,55 +1075,197 @@ class DocWriter(object):
         self._formatter = formatter_class(self._transformer)
         self._language = self._formatter.language
 
-        self._lookup = self._get_template_lookup()
-
-    def _get_template_lookup(self):
-        if 'UNINSTALLED_INTROSPECTION_SRCDIR' in os.environ:
-            top_srcdir = os.environ['UNINSTALLED_INTROSPECTION_SRCDIR']
-            srcdir = os.path.join(top_srcdir, 'giscanner')
-        else:
-            srcdir = os.path.dirname(__file__)
+        self._lookup = get_template_lookup()
 
-        template_dir = os.path.join(srcdir, 'doctemplates')
+    @property
+    def language(self):
+        return self._language
 
-        return TemplateLookup(directories=[template_dir],
-                              module_directory=tempfile.mkdtemp(),
-                              output_encoding='utf-8')
-
-    def write(self, output):
+    def write(self, output, jobs=1):
         try:
             os.makedirs(output)
         except OSError:
             # directory already made
             pass
 
-        self._walk_node(output, self._transformer.namespace, [])
-        self._transformer.namespace.walk(lambda node, chain: self._walk_node(output, node, chain))
+        # All the pages are collected before any is rendered, so every
+        # page sees the same node chains in serial and parallel mode
+        nodes = []
+        self._walk_node(nodes, self._transformer.namespace, [])
+        self._transformer.namespace.walk(lambda node, chain: self._walk_node(nodes, node, chain))
+
+        # Nodes can share a page id, e.g. a property and a field of the
+        # same name; the page of the last one is the one that is kept
+        pages = OrderedDict()
+        for node in nodes:
+            page_id = make_page_id(node)
+            pages.pop(page_id, None)
+            pages[page_id] = node
+
+        # Only render the pages whose node changed since the last run, and
+        # only write out the ones whose contents changed
+        manifest = self._read_manifest(output)
+        structure_hash = self._get_structure_hash()
+        fingerprints = {}
+        to_render = []
+        for page_id, node in pages.items():
+            fingerprints[page_id] = fingerprint = self._get_fingerprint(node, structure_hash)
+            entry = manifest.get(page_id)
+            if entry is not None and entry['fingerprint'] == fingerprint and \
+                    os.path.exists(self._get_page_filename(output, page_id)):
+                continue
+            to_render.append((node, entry['hash'] if entry is not None else None))
 
-    def _walk_node(self, output, node, chain):
+        context = _get_fork_context()
+        if jobs > 1 and len(to_render) > 1 and context is not None:
+            hashes = self._render_pages_parallel(context, to_render, output, jobs)
+        else:
+            hashes = [self._render_node(node, output, old_hash) for node, old_hash in to_render]
+
+        new_manifest = {}
+        for page_id in pages:
+            if page_id in manifest:
+                new_manifest[page_id] = manifest[page_id]
+        for (node, old_hash), content_hash in zip(to_render, hashes):
+            page_id = make_page_id(node)
+            new_manifest[page_id] = {'fingerprint': fingerprints[page_id],
+                                     'hash': content_hash}
+
+        # Remove the pages of nodes which went away
+        for page_id in manifest:
+            if page_id not in new_manifest:
+                try:
+                    os.unlink(self._get_page_filename(output, page_id))
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+
+        self._write_manifest(output, new_manifest)
+
+    def _get_page_filename(self, output, page_id):
+        return os.path.join(os.path.abspath(output), page_id + '.page')
+
+    def _read_manifest(self, output):
+        try:
+            with open(os.path.join(output, MANIFEST_FILENAME), 'r') as fp:
+                manifest = json.load(fp)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest.get('pages', {})
+
+    def _write_manifest(self, output, pages):
+        tmp_fd, tmp_filename = tempfile.mkstemp(prefix=MANIFEST_FILENAME + '-', dir=output)
+        with os.fdopen(tmp_fd, 'w') as fp:
+            json.dump({'version': MANIFEST_VERSION, 'pages': pages}, fp,
+                      indent=1, sort_keys=True)
+        # On Unix, this would just be os.rename() but Windows
+        # doesn't allow that.
+        shutil.move(tmp_filename, os.path.join(output, MANIFEST_FILENAME))
+
+    def _get_structure_hash(self):
+        """Returns a hash of what pages look up in nodes other than their
+own: the names, C types and symbols of all nodes, the type hierarchy and
+the names of their members, which type names and cross-references in the
+documentation resolve to."""
+        namespace = self._transformer.namespace
+        lines = ['%s-%s' % (include.name, include.version)
+                 for include in sorted(namespace.includes)]
+
+        def describe(node, chain):
+            parent_type = getattr(node, 'parent_type', None)
+            lines.append('\t'.join('%s' % (value, ) for value in [
+                node.__class__.__name__, node.name,
+                getattr(node, 'ctype', None), getattr(node, 'symbol', None),
+                parent_type.target_giname if parent_type is not None else None,
+                ' '.join(t.target_giname or '' for t in getattr(node, 'interfaces', [])),
+                ' '.join(p.name for p in getattr(node, 'properties', [])),
+                ' '.join(s.name for s in getattr(node, 'signals', [])),
+                ' '.join(m.name for m in getattr(node, 'members', [])),
+                ' '.join(f.name or '' for f in getattr(node, 'fields', []))]))
+            return True
+
+        namespace.walk(describe)
+        data = '\n'.join(lines).encode('utf-8')
+        return hashlib.sha1(data).hexdigest()
+
+    def _get_fingerprint(self, node, structure_hash):
+        """Returns a hash of everything the page of node is rendered from."""
+        namespace = self._transformer.namespace
+
+        def persistent_id(obj):
+            # Leave out the source positions, which are not documented, and
+            # the other top-level nodes, which are covered by structure_hash
+            if obj is node:
+                return None
+            if isinstance(obj, ast.Namespace):
+                return 'namespace'
+            if isinstance(obj, Position):
+                return 'position'
+            if isinstance(obj, ast.Node) and obj.namespace is namespace and \
+                    namespace.get(obj.name) is obj:
+                return obj.name
+            return None
+
+        digest = hashlib.sha1()
+        for part in [self._language, _get_renderer_hash(), structure_hash]:
+            digest.update(part.encode('utf-8'))
+        if isinstance(node, ast.Namespace):
+            utils.hash_object(digest, (node.name, node.version), persistent_id, {})
+        else:
+            utils.hash_object(digest, node, persistent_id, {})
+        return digest.hexdigest()
+
+    def _walk_node(self, pages, node, chain):
         if isinstance(node, ast.Function) and node.moved_to is not None:
             return False
         if self._formatter.should_render_node(node):
-            self._render_node(node, chain, output)
+            # A bit of a hack...maybe this should be an official API
+            node._chain = list(chain)
+            pages.append(node)
 
             # hack: fields are not Nodes in the ast, so we don't
             # see them in the visit. Handle them manually here
             if isinstance(node, (ast.Compound, ast.Class)):
                 chain.append(node)
                 for f in node.fields:
-                    self._walk_node(output, f, chain)
+                    self._walk_node(pages, f, chain)
                 chain.pop()
             return True
         return False
 
-    def _render_node(self, node, chain, output):
-        namespace = self._transformer.namespace
+    def _get_template_name(self, node):
+        return '%s/%s.tmpl' % (self._language, get_node_kind(node))
 
-        # A bit of a hack...maybe this should be an official API
-        node._chain = list(chain)
+    def _render_pages_parallel(self, context, pages, output, jobs):
+        global _worker_writer, _worker_pages, _worker_output
+
+        # Load the templates before forking, so the workers share them
+        for template_name in set(self._get_template_name(node) for node, old_hash in pages):
+            self._lookup.get_template(template_name)
+
+        chunksize = max(len(pages) // (jobs * 4), 1)
+        chunks = [range(start, min(start + chunksize, len(pages)))
+                  for start in range(0, len(pages), chunksize)]
+
+        _worker_writer, _worker_pages, _worker_output = self, pages, output
+        try:
+            pool = context.Pool(jobs)
+            try:
+                hashes = pool.map(_render_pages_in_worker, chunks, 1)
+            finally:
+                pool.close()
+                pool.join()
+        finally:
+            _worker_writer = _worker_pages = _worker_output = None
+        return [content_hash for chunk in hashes for content_hash in chunk]
+
+    def _render_node(self, node, output, old_hash=None):
+        namespace = self._transformer.namespace
 
         page_kind = get_node_kind(node)
-        template_name = '%s/%s.tmpl' % (self._language, page_kind)
+        template_name = self._get_template_name(node)
         page_id = make_page_id(node)
 
         template = self._lookup.get_template(template_name)
@@ -955,7 +1276,11 @@ class DocWriter(object):
                                  formatter=self._formatter,
                                  ast=ast)
 
-        output_file_name = os.path.join(os.path.abspath(output),
-                                        page_id + '.page')
-        with open(output_file_name, 'wb') as fp:
-            fp.write(result)
+        # Leave pages with unchanged contents alone, so their modification
+        # time doesn't trigger rebuilding what is generated from them
+        content_hash = hashlib.sha1(result).hexdigest()
+        output_file_name = self._get_page_filename(output, page_id)
+        if content_hash != old_hash or not os.path.exists(output_file_name):
+            with open(output_file_name, 'wb') as fp:
+                fp.write(result)
+        return content_hash
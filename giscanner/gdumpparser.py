@@ -23,6 +23,7 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import codecs
 import os
 import sys
 import tempfile
@@ -46,6 +47,30 @@ G_PARAM_STATIC_NAME = 1 << 5
 G_PARAM_STATIC_NICK = 1 << 6
 G_PARAM_STATIC_BLURB = 1 << 7
 
+# Field names of the records in the compact dump format, see
+# g_irepository_dump() in girepository/gdump.c
+_COMPACT_RECORD_FIELDS = {
+    'class': ('name', 'get-type', 'parents', 'abstract'),
+    'interface': ('name', 'get-type'),
+    'fundamental': ('name', 'get-type', 'parents', 'abstract', 'instantiatable'),
+    'boxed': ('name', 'get-type'),
+    'enum': ('name', 'get-type'),
+    'flags': ('name', 'get-type'),
+    'error-quark': ('function', 'domain'),
+    'member': ('name', 'nick', 'value'),
+    'implements': ('name', ),
+    'prerequisite': ('name', ),
+    'property': ('name', 'type', 'flags'),
+    'signal': ('name', 'return', 'when', 'no-recurse', 'detailed', 'action', 'no-hooks'),
+    'param': ('type', ),
+}
+
+_COMPACT_TOPLEVEL_RECORDS = ('class', 'interface', 'fundamental', 'boxed',
+                             'enum', 'flags', 'error-quark')
+
+# Boolean attributes the XML format only writes out when they are set
+_COMPACT_OPTIONAL_FIELDS = ('parents', 'abstract', 'instantiatable', 'when')
+
 
 class IntrospectionBinary(object):
 
@@ -57,6 +82,70 @@ class IntrospectionBinary(object):
             self.tmpdir = tmpdir
 
 
+class DumpNode(object):
+    """A record of the compact dump format.
+
+    Provides the subset of the ElementTree element API used by GDumpParser
+    (tag, attrib and findall()), so both dump formats can share the same
+    introspection code.
+    """
+
+    __slots__ = ('tag', 'attrib', 'children')
+
+    def __init__(self, tag, attrib):
+        self.tag = tag
+        self.attrib = attrib
+        self.children = []
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def findall(self, tag):
+        return [child for child in self.children if child.tag == tag]
+
+
+def _unescape_compact_field(value):
+    if '\\' not in value:
+        return value
+    return codecs.escape_decode(value.encode('ascii'))[0].decode('utf-8')
+
+
+def parse_compact_dump(lines):
+    """Parse the compact line-oriented dump format.
+
+    Returns the list of top-level DumpNode records, mirroring the children
+    of the <dump> element in the XML format.
+    """
+    roots = []
+    toplevel = None
+    signal = None
+    for line in lines:
+        fields = line.rstrip('\n').split('\t')
+        tag = fields[0]
+        if tag == 'gdump-compact' or tag == '':
+            continue
+        names = _COMPACT_RECORD_FIELDS.get(tag)
+        if names is None:
+            raise ValueError("Unhandled compact dump record %r" % (tag, ))
+        attrib = {}
+        for name, value in zip(names, fields[1:]):
+            if name in _COMPACT_OPTIONAL_FIELDS and value in ('', '0'):
+                continue
+            attrib[name] = _unescape_compact_field(value)
+        node = DumpNode(tag, attrib)
+        if tag in _COMPACT_TOPLEVEL_RECORDS:
+            toplevel = node
+            signal = None
+            roots.append(node)
+        elif tag == 'param':
+            signal.children.append(node)
+        else:
+            if tag == 'signal':
+                signal = node
+            toplevel.children.append(node)
+    return roots
+
+
 class Unresolved(object):
 
     def __init__(self, target):
@@ -89,14 +178,12 @@ class GDumpParser(object):
         """
 
         # First pass: parsing
-        for node in self._namespace.values():
-            if isinstance(node, ast.Function):
-                self._initparse_function(node)
+        for node in self._namespace.get_nodes_of_kind(ast.Function):
+            self._initparse_function(node)
 
         if self._namespace.name == 'GObject' or self._namespace.name == 'GLib':
-            for node in self._namespace.values():
-                if isinstance(node, ast.Record):
-                    self._initparse_gobject_record(node)
+            for node in self._namespace.get_nodes_of_kind(ast.Record):
+                self._initparse_gobject_record(node)
 
     def get_get_type_functions(self):
         return self._get_type_functions
@@ -111,9 +198,8 @@ class GDumpParser(object):
         """Do remaining parsing steps requiring introspection binary"""
 
         # Get all the GObject data by passing our list of get_type
-        # functions to the compiled binary, returning an XML blob.
-        tree = self._execute_binary_get_tree()
-        root = tree.getroot()
+        # functions to the compiled binary, returning a list of records.
+        root = self._execute_binary_get_root()
         for child in root:
             if child.tag == 'error-quark':
                 self._introspect_error_quark(child)
@@ -123,34 +209,37 @@ class GDumpParser(object):
         # Pair up boxed types and class records
         for name, boxed in self._boxed_types.items():
             self._pair_boxed_type(boxed)
-        for node in self._namespace.values():
-            if isinstance(node, (ast.Class, ast.Interface)):
-                self._find_class_record(node)
+        for node in self._namespace.get_nodes_of_kind(ast.Class, ast.Interface):
+            self._find_class_record(node)
 
         # Clear the _get_type functions out of the namespace;
         # Anyone who wants them can get them from the ast.Class/Interface/Boxed
         to_remove = []
-        for name, node in self._namespace.items():
-            if isinstance(node, ast.Registered) and node.get_type is not None:
-                get_type_name = node.get_type
-                if get_type_name == 'intern':
-                    continue
-                assert get_type_name, node
-                (ns, name) = self._transformer.split_csymbol(get_type_name)
-                assert ns is self._namespace
-                get_type_func = self._namespace.get(name)
-                assert get_type_func, name
-                to_remove.append(get_type_func)
+        for node in self._namespace.get_registered_types():
+            get_type_name = node.get_type
+            if get_type_name == 'intern':
+                continue
+            assert get_type_name, node
+            (ns, name) = self._transformer.split_csymbol(get_type_name)
+            assert ns is self._namespace
+            get_type_func = self._namespace.get(name)
+            assert get_type_func, name
+            to_remove.append(get_type_func)
         for node in to_remove:
             self._namespace.remove(node)
 
     # Helper functions
 
-    def _execute_binary_get_tree(self):
-        """Load the library (or executable), returning an XML
-blob containing data gleaned from GObject's primitive introspection."""
+    def _execute_binary_get_root(self):
+        """Load the library (or executable), returning the records (either
+XML elements or compact DumpNode records) containing data gleaned from
+GObject's primitive introspection."""
         in_path = os.path.join(self._binary.tmpdir, 'functions.txt')
         with open(in_path, 'w') as f:
+            # Binaries built against an older gdump.c ignore this line and
+            # answer with XML, which _parse_dump() detects.
+            if not utils.have_debug_flag('xml-dump'):
+                f.write('format:compact\n')
             for func in self._get_type_functions:
                 f.write('get-type:')
                 f.write(func)
@@ -159,7 +248,7 @@ blob containing data gleaned from GObject's primitive introspection."""
                 f.write('error-quark:')
                 f.write(func)
                 f.write('\n')
-        out_path = os.path.join(self._binary.tmpdir, 'dump.xml')
+        out_path = os.path.join(self._binary.tmpdir, 'dump.txt')
 
         args = []
 
@@ -178,11 +267,18 @@ blob containing data gleaned from GObject's primitive introspection."""
             except subprocess.CalledProcessError as e:
                 # Clean up temporaries
                 raise SystemExit(e)
-            return parse(out_path)
+            return self._parse_dump(out_path)
         finally:
             if not utils.have_debug_flag('save-temps'):
                 shutil.rmtree(self._binary.tmpdir)
 
+    def _parse_dump(self, path):
+        with open(path, 'r') as f:
+            header = f.readline()
+            if not header.startswith('gdump-compact\t'):
+                return parse(path).getroot()
+            return parse_compact_dump(f)
+
     # Parser
 
     def _initparse_function(self, func):
@@ -434,9 +434,8 @@ class GIRParser(object):
     def _parse_type_simple(self, typenode):
         # ast.Fields can contain inline callbacks
         if typenode.tag == _corens('callback'):
-            typeval = self._namespace.type_from_name(typenode.attrib['name'])
-            typeval.ctype = typenode.attrib.get(_cns('type'))
-            return typeval
+            return self._namespace.type_from_name(typenode.attrib['name'],
+                                                  typenode.attrib.get(_cns('type')))
         # ast.Arrays have their own toplevel XML
         elif typenode.tag == _corens('array'):
             array_type = typenode.attrib.get('name')
@@ -25,18 +25,67 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-from . import ast
+import hashlib
+import multiprocessing
+
+from . import ast, utils
+from .message import Position
 from .xmlwriter import XMLWriter
 
 # Bump this for *incompatible* changes to the .gir.
 # Compatible changes we just make inline
 COMPATIBLE_GIR_VERSION = '1.2'
 
+# Bump this when the cached node fragments can't be reused anymore
+FRAGMENT_CACHE_VERSION = 2
+
+# Below this many nodes to write, starting the worker processes costs
+# more than writing the nodes in parallel saves.
+PARALLEL_WRITE_THRESHOLD = 500
+
+_worker_namespace = None
+
+
+def _persistent_id(obj):
+    # Leave out the namespace a node refers back to, and the source
+    # positions, which are not written to the .gir.
+    if isinstance(obj, ast.Namespace):
+        return 'namespace'
+    if isinstance(obj, Position):
+        return 'position'
+    return None
+
+
+def node_structure_hash(namespace, node, indent):
+    """Returns a hash of the parts of a top-level node written to the .gir."""
+    digest = hashlib.sha1()
+    utils.hash_object(digest, (namespace.name, COMPATIBLE_GIR_VERSION, indent, node),
+                      _persistent_id)
+    return digest.hexdigest()
+
+
+def _write_fragment(namespace, node, indent):
+    writer = GIRFragmentWriter(namespace, indent)
+    writer._write_node(node)
+    return writer.get_encoded_xml()
+
+
+def _init_fragment_worker(namespace):
+    global _worker_namespace
+    _worker_namespace = namespace
+
+
+def _write_fragment_in_worker(args):
+    name, indent = args
+    return _write_fragment(_worker_namespace, _worker_namespace.get(name), indent)
+
 
 class GIRWriter(XMLWriter):
 
-    def __init__(self, namespace):
+    def __init__(self, namespace, jobs=1, cachestore=None):
         super(GIRWriter, self).__init__()
+        self._jobs = jobs
+        self._cachestore = cachestore
         self.write_comment(
             'This file was automatically generated from C sources - DO NOT EDIT!\n'
             'To affect the contents of this file, edit the original C definitions,\n'
@@ -79,16 +128,67 @@ class GIRWriter(XMLWriter):
                  ('c:identifier-prefixes', ','.join(namespace.identifier_prefixes)),
                  ('c:symbol-prefixes', ','.join(namespace.symbol_prefixes))]
         with self.tagcontext('namespace', attrs):
-            # We define a custom sorting function here because
-            # we want aliases to be first.  They're a bit
+            # We want aliases to be first.  They're a bit
             # special because the typelib compiler expands them.
-            def nscmp(val):
-                if isinstance(val, ast.Alias):
-                    return 0, val
-                else:
-                    return 1, val
-            for node in sorted(namespace.values(), key=nscmp):
-                self._write_node(node)
+            def name_key(node):
+                return node.name
+            aliases = namespace.get_nodes_of_kind(ast.Alias)
+            nodes = sorted(aliases, key=name_key)
+            if aliases:
+                nodes.extend(sorted((node for node in namespace.values()
+                                     if not isinstance(node, ast.Alias)), key=name_key))
+            else:
+                nodes.extend(sorted(namespace.values(), key=name_key))
+            if self._jobs > 1 or self._cachestore is not None:
+                self._write_node_fragments(namespace, nodes)
+            else:
+                for node in nodes:
+                    self._write_node(node)
+
+    def _write_node_fragments(self, namespace, nodes):
+        # Top-level nodes are written independently of each other at the
+        # current indentation, then joined in order.
+        indent = self._indent
+        entry_key = 'gir-fragments-%d:%s-%s' % (FRAGMENT_CACHE_VERSION,
+                                                namespace.name, namespace.version)
+        if self._cachestore is not None:
+            hashes = [node_structure_hash(namespace, node, indent) for node in nodes]
+            fragments = self._cachestore.load_key(entry_key) or {}
+        else:
+            hashes = [None] * len(nodes)
+            fragments = {}
+
+        written = [fragments.get(key) for key in hashes]
+        misses = [i for i, fragment in enumerate(written) if fragment is None]
+        if self._jobs > 1 and len(misses) >= PARALLEL_WRITE_THRESHOLD:
+            results = self._write_fragments_parallel(namespace, [nodes[i] for i in misses],
+                                                     indent)
+        else:
+            results = (_write_fragment(namespace, nodes[i], indent) for i in misses)
+
+        for i, fragment in zip(misses, results):
+            written[i] = fragment
+            if hashes[i] is not None:
+                fragments[hashes[i]] = fragment
+
+        for fragment in written:
+            self.write_fragment(fragment)
+
+        if self._cachestore is not None:
+            # Only keep the fragments of the nodes still in the namespace
+            used = dict((key, fragments[key]) for key in hashes)
+            if misses or len(used) != len(fragments):
+                self._cachestore.store_key(entry_key, used)
+
+    def _write_fragments_parallel(self, namespace, nodes, indent):
+        pool = multiprocessing.Pool(self._jobs, _init_fragment_worker, (namespace, ))
+        try:
+            chunksize = max(len(nodes) // (self._jobs * 4), 1)
+            return pool.map(_write_fragment_in_worker,
+                            [(node.name, indent) for node in nodes], chunksize)
+        finally:
+            pool.close()
+            pool.join()
 
     def _write_node(self, node):
         if isinstance(node, ast.Function):
@@ -609,3 +709,13 @@ class GIRWriter(XMLWriter):
             self._write_generic(signal)
             self._write_return_type(signal.retval)
             self._write_parameters(signal)
+
+
+class GIRFragmentWriter(GIRWriter):
+    """Writes single top-level nodes of a namespace, indented as they are
+    within the namespace element of the complete .gir."""
+
+    def __init__(self, namespace, indent):
+        XMLWriter.__init__(self, header=False)
+        self._namespace = namespace
+        self._indent = indent
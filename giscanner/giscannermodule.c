@@ -91,9 +91,26 @@ typedef struct {
   GISourceScanner *scanner;
 } PyGISourceScanner;
 
+typedef struct {
+  PyObject_HEAD
+  PyObject *scanner;
+  GSList *comments;
+  GSList *next;
+  GHashTable *seen;
+} PyGISourceCommentIter;
+
+typedef struct {
+  PyObject_HEAD
+  GString *buffer;
+  gchar *indent_char;
+  gchar *newline_char;
+} PyGIXMLBuffer;
+
 NEW_CLASS (PyGISourceSymbol, "SourceSymbol", GISourceSymbol, 10);
 NEW_CLASS (PyGISourceType, "SourceType", GISourceType, 9);
-NEW_CLASS (PyGISourceScanner, "SourceScanner", GISourceScanner, 8);
+NEW_CLASS (PyGISourceScanner, "SourceScanner", GISourceScanner, 16);
+NEW_CLASS (PyGISourceCommentIter, "CommentIter", GISourceCommentIter, 1);
+NEW_CLASS (PyGIXMLBuffer, "XMLBuffer", GIXMLBuffer, 9);
 
 
 /* Symbol */
@@ -590,6 +607,82 @@ pygi_source_scanner_set_macro_scan (PyGISourceScanner *self,
   return Py_None;
 }
 
+static gchar **
+strv_from_list (PyObject *list)
+{
+  GPtrArray *array;
+  int i;
+
+  if (!PyList_Check (list))
+    {
+      PyErr_SetString (PyExc_TypeError, "expected a list of strings");
+      return NULL;
+    }
+
+  array = g_ptr_array_new ();
+  for (i = 0; i < PyList_Size (list); ++i)
+    {
+      PyObject *obj = PyList_GetItem (list, i);
+
+      if (PyUnicode_Check (obj))
+        {
+          PyObject *s = PyUnicode_AsUTF8String (obj);
+          g_ptr_array_add (array, g_strdup (PyBytes_AsString (s)));
+          Py_DECREF (s);
+        }
+      else if (PyBytes_Check (obj))
+        {
+          g_ptr_array_add (array, g_strdup (PyBytes_AsString (obj)));
+        }
+      else
+        {
+          PyErr_SetString (PyExc_TypeError, "expected a list of strings");
+          g_ptr_array_add (array, NULL);
+          g_strfreev ((gchar **) g_ptr_array_free (array, FALSE));
+          return NULL;
+        }
+    }
+  g_ptr_array_add (array, NULL);
+
+  return (gchar **) g_ptr_array_free (array, FALSE);
+}
+
+static PyObject *
+pygi_source_scanner_set_prefixes (PyGISourceScanner *self,
+				  PyObject          *args)
+{
+  PyObject *identifier_list;
+  PyObject *symbol_list;
+  gchar **identifier_prefixes;
+  gchar **symbol_prefixes;
+
+  if (!PyArg_ParseTuple (args, "OO:SourceScanner.set_prefixes",
+                         &identifier_list, &symbol_list))
+    return NULL;
+
+  identifier_prefixes = strv_from_list (identifier_list);
+  if (!identifier_prefixes)
+    return NULL;
+  symbol_prefixes = strv_from_list (symbol_list);
+  if (!symbol_prefixes)
+    {
+      g_strfreev (identifier_prefixes);
+      return NULL;
+    }
+
+  gi_source_scanner_set_prefixes (self->scanner, identifier_prefixes, symbol_prefixes);
+
+  Py_INCREF (Py_None);
+  return Py_None;
+}
+
+static PyObject *
+pygi_source_scanner_get_symbol_counts (PyGISourceScanner *self)
+{
+  return Py_BuildValue ("(II)", self->scanner->n_symbols_kept,
+                        self->scanner->n_symbols_dropped);
+}
+
 static PyObject *
 pygi_source_scanner_get_symbols (PyGISourceScanner *self)
 {
@@ -611,6 +704,187 @@ pygi_source_scanner_get_symbols (PyGISourceScanner *self)
   return list;
 }
 
+/* Bulk export
+ *
+ * get_symbol_records() converts the whole symbol list in one go into
+ * nested tuples, laid out like the properties of the SourceSymbol and
+ * SourceType wrappers.  Types referenced from several places are
+ * converted once and shared.
+ */
+
+static PyObject *
+string_or_none (const char *str)
+{
+  if (!str)
+    {
+      Py_INCREF (Py_None);
+      return Py_None;
+    }
+
+  return PyUnicode_FromString (str);
+}
+
+static PyObject * type_to_record (GISourceType *type,
+                                  GHashTable   *records);
+
+static PyObject *
+symbol_to_record (GISourceSymbol *symbol,
+                  GHashTable     *records)
+{
+  PyObject *const_int;
+  PyObject *const_double;
+  PyObject *const_boolean;
+
+  if (!symbol->const_int_set)
+    {
+      Py_INCREF (Py_None);
+      const_int = Py_None;
+    }
+  else if (symbol->const_int_is_unsigned)
+    const_int = PyLong_FromUnsignedLongLong ((unsigned long long)symbol->const_int);
+  else
+    const_int = PyLong_FromLongLong ((long long)symbol->const_int);
+
+  if (!symbol->const_double_set)
+    {
+      Py_INCREF (Py_None);
+      const_double = Py_None;
+    }
+  else
+    const_double = PyFloat_FromDouble (symbol->const_double);
+
+  if (!symbol->const_boolean_set)
+    {
+      Py_INCREF (Py_None);
+      const_boolean = Py_None;
+    }
+  else
+    const_boolean = PyBool_FromLong (symbol->const_boolean);
+
+  return Py_BuildValue ("(iNNNNNNNiN)",
+                        symbol->type,
+                        string_or_none (symbol->ident),
+                        type_to_record (symbol->base_type, records),
+                        const_int,
+                        const_double,
+                        string_or_none (symbol->const_string),
+                        const_boolean,
+                        string_or_none (symbol->source_filename),
+                        symbol->line,
+                        PyBool_FromLong (symbol->private));
+}
+
+static PyObject *
+type_to_record (GISourceType *type,
+                GHashTable   *records)
+{
+  PyObject *record;
+  PyObject *child_list;
+  GList *l;
+
+  if (type == NULL)
+    {
+      Py_INCREF (Py_None);
+      return Py_None;
+    }
+
+  record = g_hash_table_lookup (records, type);
+  if (record)
+    {
+      Py_INCREF (record);
+      return record;
+    }
+
+  child_list = PyList_New (0);
+  for (l = type->child_list; l; l = l->next)
+    {
+      PyObject *child;
+
+      if (l->data == NULL)
+        continue;
+
+      child = symbol_to_record (l->data, records);
+      PyList_Append (child_list, child);
+      Py_DECREF (child);
+    }
+
+  record = Py_BuildValue ("(iiiiNNNi)",
+                          type->type,
+                          type->storage_class_specifier,
+                          type->type_qualifier,
+                          type->function_specifier,
+                          string_or_none (type->name),
+                          type_to_record (type->base_type, records),
+                          child_list,
+                          type->is_bitfield);
+
+  Py_INCREF (record);
+  g_hash_table_insert (records, type, record);
+  return record;
+}
+
+static PyObject *
+pygi_source_scanner_get_symbol_records (PyGISourceScanner *self)
+{
+  GSList *l, *symbols;
+  GHashTable *records;
+  PyObject *list;
+  int i = 0;
+
+  symbols = gi_source_scanner_get_symbols (self->scanner);
+  records = g_hash_table_new_full (NULL, NULL, NULL, (GDestroyNotify) Py_DecRef);
+  list = PyList_New (g_slist_length (symbols));
+
+  for (l = symbols; l; l = l->next)
+    PyList_SetItem (list, i++, symbol_to_record (l->data, records));
+
+  g_hash_table_destroy (records);
+  g_slist_free (symbols);
+  return list;
+}
+
+static PyObject *
+pygi_source_comment_to_tuple (GISourceComment *comment)
+{
+  PyObject *comment_obj;
+  PyObject *filename_obj;
+  PyObject *item;
+
+  if (comment->comment)
+    {
+      comment_obj = PyUnicode_FromString (comment->comment);
+      if (!comment_obj)
+        {
+          g_print ("Comment is not valid Unicode in %s line %d\n", comment->filename, comment->line);
+          PyErr_Clear ();
+          Py_INCREF (Py_None);
+          comment_obj = Py_None;
+        }
+    }
+  else
+    {
+      Py_INCREF (Py_None);
+      comment_obj = Py_None;
+    }
+
+  if (comment->filename)
+    {
+      filename_obj = PyUnicode_FromString (comment->filename);
+    }
+  else
+    {
+      Py_INCREF (Py_None);
+      filename_obj = Py_None;
+    }
+
+  item = Py_BuildValue ("(OOi)", comment_obj, filename_obj, comment->line);
+
+  Py_DECREF (comment_obj);
+  Py_DECREF (filename_obj);
+
+  return item;
+}
+
 static PyObject *
 pygi_source_scanner_get_comments (PyGISourceScanner *self)
 {
@@ -622,53 +896,216 @@ pygi_source_scanner_get_comments (PyGISourceScanner *self)
   list = PyList_New (g_slist_length (comments));
 
   for (l = comments; l; l = l->next)
+    PyList_SetItem (list, i++, pygi_source_comment_to_tuple (l->data));
+
+  g_slist_free (comments);
+  Py_INCREF (list);
+  return list;
+}
+
+/* Comment iterator
+ *
+ * Yields the (comment, filename, line) tuples of the GTK-Doc comment
+ * blocks one at a time, skipping blocks seen before at the same
+ * position, for example a header both lexed and preprocessed.
+ */
+
+static PyObject *
+pygi_source_scanner_iter_comments (PyGISourceScanner *self)
+{
+  PyGISourceCommentIter *iter;
+
+  iter = (PyGISourceCommentIter *)PyObject_New (PyGISourceCommentIter,
+                                                &PyGISourceCommentIter_Type);
+  Py_INCREF (self);
+  iter->scanner = (PyObject *)self;
+  iter->comments = gi_source_scanner_get_comments (self->scanner);
+  iter->next = iter->comments;
+  iter->seen = g_hash_table_new_full (g_str_hash, g_str_equal, g_free, NULL);
+  return (PyObject *)iter;
+}
+
+static PyObject *
+pygi_source_comment_iter_next (PyGISourceCommentIter *self)
+{
+  while (self->next)
     {
-      GISourceComment *comment = l->data;
-      PyObject *comment_obj;
-      PyObject *filename_obj;
-      PyObject *item;
+      GISourceComment *comment = self->next->data;
+      char *position;
+
+      self->next = self->next->next;
+
+      if (comment->comment == NULL ||
+          !g_str_has_prefix (comment->comment, "/**"))
+        continue;
+
+      position = g_strdup_printf ("%d:%s", comment->line,
+                                  comment->filename ? comment->filename : "");
+      if (!g_hash_table_add (self->seen, position))
+        continue;
+
+      return pygi_source_comment_to_tuple (comment);
+    }
+
+  return NULL;
+}
+
+static void
+pygi_source_comment_iter_dealloc (PyGISourceCommentIter *self)
+{
+  g_slist_free (self->comments);
+  if (self->seen)
+    g_hash_table_destroy (self->seen);
+  Py_XDECREF (self->scanner);
+  PyObject_Del (self);
+}
+
+static const PyMethodDef _PyGISourceCommentIter_methods[] = {
+  { NULL, NULL, 0 }
+};
+
+static PyObject *
+pygi_source_scanner_get_source_files (PyGISourceScanner *self)
+{
+  GHashTableIter iter;
+  gpointer key;
+  PyObject *list;
 
-      if (comment->comment)
+  list = PyList_New (0);
+
+  g_hash_table_iter_init (&iter, self->scanner->source_files);
+  while (g_hash_table_iter_next (&iter, &key, NULL))
+    {
+      PyObject *item = PyUnicode_FromString (key);
+      if (!item)
         {
-          comment_obj = PyUnicode_FromString (comment->comment);
-          if (!comment_obj)
-            {
-              g_print ("Comment is not valid Unicode in %s line %d\n", comment->filename, comment->line);
-              Py_INCREF (Py_None);
-              comment_obj = Py_None;
-            }
+          /* Not a valid UTF-8 path, it can't be checked from Python either */
+          PyErr_Clear ();
+          continue;
         }
-      else
+      PyList_Append (list, item);
+      Py_DECREF (item);
+    }
+
+  return list;
+}
+
+static PyObject *
+pygi_source_scanner_get_typedefs (PyGISourceScanner *self)
+{
+  GHashTableIter iter;
+  gpointer key;
+  PyObject *list;
+
+  list = PyList_New (0);
+
+  g_hash_table_iter_init (&iter, self->scanner->typedef_table);
+  while (g_hash_table_iter_next (&iter, &key, NULL))
+    {
+      PyObject *item = PyUnicode_FromString (key);
+      PyList_Append (list, item);
+      Py_DECREF (item);
+    }
+
+  return list;
+}
+
+static PyObject *
+pygi_source_scanner_add_typedefs (PyGISourceScanner *self,
+				  PyObject          *args)
+{
+  PyObject *list;
+  int i;
+
+  if (!PyArg_ParseTuple (args, "O!:SourceScanner.add_typedefs", &PyList_Type, &list))
+    return NULL;
+
+  for (i = 0; i < PyList_Size (list); ++i)
+    {
+      PyObject *obj;
+      PyObject *s;
+
+      obj = PyList_GetItem (list, i);
+      if (PyUnicode_Check (obj))
         {
-          Py_INCREF (Py_None);
-          comment_obj = Py_None;
+          s = PyUnicode_AsUTF8String (obj);
+          gi_source_scanner_add_typedef (self->scanner, PyBytes_AsString (s));
+          Py_DECREF (s);
         }
-
-      if (comment->filename)
+      else if (PyBytes_Check (obj))
         {
-          filename_obj = PyUnicode_FromString (comment->filename);
+          gi_source_scanner_add_typedef (self->scanner, PyBytes_AsString (obj));
         }
       else
         {
-          Py_INCREF (Py_None);
-          filename_obj = Py_None;
+          PyErr_SetString (PyExc_TypeError, "add_typedefs takes a list of strings");
+          return NULL;
         }
+    }
 
-      item = Py_BuildValue ("(OOi)", comment_obj, filename_obj, comment->line);
-      PyList_SetItem (list, i++, item);
+  Py_INCREF (Py_None);
+  return Py_None;
+}
 
-      Py_DECREF (comment_obj);
-      Py_DECREF (filename_obj);
+static char *
+pygi_string_dup (PyObject *obj)
+{
+  if (PyUnicode_Check (obj))
+    {
+      PyObject *s = PyUnicode_AsUTF8String (obj);
+      char *str = g_strdup (PyBytes_AsString (s));
+      Py_DECREF (s);
+      return str;
     }
+  else if (PyBytes_Check (obj))
+    return g_strdup (PyBytes_AsString (obj));
 
-  g_slist_free (comments);
-  Py_INCREF (list);
-  return list;
+  return NULL;
+}
+
+static PyObject *
+pygi_source_scanner_add_comments (PyGISourceScanner *self,
+				  PyObject          *args)
+{
+  PyObject *list;
+  int i;
+
+  if (!PyArg_ParseTuple (args, "O!:SourceScanner.add_comments", &PyList_Type, &list))
+    return NULL;
+
+  for (i = 0; i < PyList_Size (list); ++i)
+    {
+      PyObject *text;
+      PyObject *filename;
+      GISourceComment *comment;
+      int line;
+
+      if (!PyArg_ParseTuple (PyList_GetItem (list, i), "OOi:SourceScanner.add_comments",
+                             &text, &filename, &line))
+        return NULL;
+
+      comment = g_slice_new (GISourceComment);
+      comment->comment = pygi_string_dup (text);
+      comment->filename = pygi_string_dup (filename);
+      comment->line = line;
+      gi_source_scanner_take_comment (self->scanner, comment);
+    }
+
+  Py_INCREF (Py_None);
+  return Py_None;
 }
 
 static const PyMethodDef _PyGISourceScanner_methods[] = {
   { "get_comments", (PyCFunction) pygi_source_scanner_get_comments, METH_NOARGS },
+  { "iter_comments", (PyCFunction) pygi_source_scanner_iter_comments, METH_NOARGS },
+  { "add_comments", (PyCFunction) pygi_source_scanner_add_comments, METH_VARARGS },
+  { "get_source_files", (PyCFunction) pygi_source_scanner_get_source_files, METH_NOARGS },
+  { "get_typedefs", (PyCFunction) pygi_source_scanner_get_typedefs, METH_NOARGS },
+  { "add_typedefs", (PyCFunction) pygi_source_scanner_add_typedefs, METH_VARARGS },
+  { "set_prefixes", (PyCFunction) pygi_source_scanner_set_prefixes, METH_VARARGS },
+  { "get_symbol_counts", (PyCFunction) pygi_source_scanner_get_symbol_counts, METH_NOARGS },
   { "get_symbols", (PyCFunction) pygi_source_scanner_get_symbols, METH_NOARGS },
+  { "get_symbol_records", (PyCFunction) pygi_source_scanner_get_symbol_records, METH_NOARGS },
   { "append_filename", (PyCFunction) pygi_source_scanner_append_filename, METH_VARARGS },
   { "parse_file", (PyCFunction) pygi_source_scanner_parse_file, METH_VARARGS },
   { "parse_macros", (PyCFunction) pygi_source_scanner_parse_macros, METH_VARARGS },
@@ -678,50 +1115,171 @@ static const PyMethodDef _PyGISourceScanner_methods[] = {
 };
 
 
-static int calc_attrs_length(PyObject *attributes, int indent,
-			     int self_indent)
+/* XML writing */
+
+static const char *
+pygi_string_as_utf8 (PyObject  *pyvalue,
+                     PyObject **s)
 {
-  int attr_length = 0;
-  int i;
+  *s = NULL;
 
-  if (indent == -1)
-    return -1;
+  if (PyUnicode_Check (pyvalue))
+    {
+      *s = PyUnicode_AsUTF8String (pyvalue);
+      if (!*s)
+        return NULL;
+      return PyBytes_AsString (*s);
+    }
+  else if (PyBytes_Check (pyvalue))
+    return PyBytes_AsString (pyvalue);
+
+  PyErr_SetString (PyExc_TypeError, "value must be string or unicode");
+  return NULL;
+}
+
+/*
+ * Escapes the attribute values in a single walk over the list. Returns
+ * the names and escaped values as alternating items and stores the
+ * length they take on a line in @length.
+ */
+static GPtrArray *
+escape_attributes (PyObject *attributes,
+                   int      *length)
+{
+  GPtrArray *escaped;
+  Py_ssize_t i;
+
+  escaped = g_ptr_array_new_with_free_func (g_free);
+  *length = 0;
 
   for (i = 0; i < PyList_Size (attributes); ++i)
     {
-      PyObject *tuple, *pyvalue;
-      PyObject *s = NULL;
-      char *attr, *value;
-      char *escaped;
+      PyObject *tuple, *pyvalue, *s;
+      const char *value;
+      char *attr, *escaped_value;
 
       tuple = PyList_GetItem (attributes, i);
-      if (PyTuple_GetItem(tuple, 1) == Py_None)
-	continue;
 
-      if (!PyArg_ParseTuple(tuple, "sO", &attr, &pyvalue))
-        return -1;
+      if (!PyTuple_Check (tuple))
+        {
+          PyErr_SetString (PyExc_TypeError,
+                           "attribute item must be a tuple");
+          goto error;
+        }
 
-      if (PyUnicode_Check(pyvalue)) {
-        s = PyUnicode_AsUTF8String(pyvalue);
-        if (!s) {
-          return -1;
+      if (PyTuple_Size (tuple) != 2)
+        {
+          PyErr_SetString (PyExc_IndexError,
+                           "attribute item must be a tuple of length 2");
+          goto error;
         }
-        value = PyBytes_AsString(s);
-      } else if (PyBytes_Check(pyvalue)) {
-        value = PyBytes_AsString(pyvalue);
-      } else {
-        PyErr_SetString(PyExc_TypeError,
-                        "value must be string or unicode");
-        return -1;
-      }
 
-      escaped = g_markup_escape_text (value, -1);
-      attr_length += 2 + strlen(attr) + strlen(escaped) + 2;
-      g_free(escaped);
-      Py_XDECREF(s);
+      if (PyTuple_GetItem (tuple, 1) == Py_None)
+        continue;
+
+      if (!PyArg_ParseTuple (tuple, "sO", &attr, &pyvalue))
+        goto error;
+
+      value = pygi_string_as_utf8 (pyvalue, &s);
+      if (value == NULL)
+        goto error;
+
+      escaped_value = g_markup_escape_text (value, -1);
+      Py_XDECREF (s);
+
+      *length += 2 + strlen (attr) + strlen (escaped_value) + 2;
+      g_ptr_array_add (escaped, g_strdup (attr));
+      g_ptr_array_add (escaped, escaped_value);
+    }
+
+  return escaped;
+
+ error:
+  g_ptr_array_unref (escaped);
+  return NULL;
+}
+
+static void
+append_repeated (GString    *out,
+                 const char *s,
+                 int         count)
+{
+  int i;
+
+  for (i = 0; i < count; i++)
+    g_string_append (out, s);
+}
+
+/*
+ * Appends the attributes of a tag indented by @self_indent, putting
+ * each of them on its own line when the tag would be longer than 79
+ * columns. @extra_length is the length of the rest of the tag.
+ */
+static gboolean
+append_attributes (GString    *out,
+                   const char *tag_name,
+                   PyObject   *attributes,
+                   int         self_indent,
+                   int         extra_length)
+{
+  GPtrArray *escaped;
+  int length, wrap_indent;
+  guint i;
+
+  if (!PyList_Size (attributes))
+    return TRUE;
+
+  escaped = escape_attributes (attributes, &length);
+  if (escaped == NULL)
+    return FALSE;
+
+  if (length + extra_length + self_indent > 79)
+    wrap_indent = self_indent + strlen (tag_name) + 1;
+  else
+    wrap_indent = 0;
+
+  for (i = 0; i < escaped->len; i += 2)
+    {
+      if (wrap_indent && i > 0)
+        {
+          g_string_append_c (out, '\n');
+          append_repeated (out, " ", wrap_indent);
+        }
+      g_string_append_c (out, ' ');
+      g_string_append (out, g_ptr_array_index (escaped, i));
+      g_string_append (out, "=\"");
+      g_string_append (out, g_ptr_array_index (escaped, i + 1));
+      g_string_append_c (out, '\"');
     }
 
-  return attr_length + indent + self_indent;
+  g_ptr_array_unref (escaped);
+  return TRUE;
+}
+
+/* Escapes element data the way xml.sax.saxutils.escape() does */
+static void
+append_escaped_data (GString    *out,
+                     const char *data)
+{
+  const char *p;
+
+  for (p = data; *p; p++)
+    {
+      switch (*p)
+        {
+        case '&':
+          g_string_append (out, "&amp;");
+          break;
+        case '<':
+          g_string_append (out, "&lt;");
+          break;
+        case '>':
+          g_string_append (out, "&gt;");
+          break;
+        default:
+          g_string_append_c (out, *p);
+        }
+    }
 }
 
 /* Hall of shame, wasted time debugging the code below
@@ -733,11 +1291,9 @@ pygi_collect_attributes (PyObject *self,
 {
   char *tag_name;
   PyObject *attributes;
-  int indent, indent_len, i, j, self_indent;
+  int indent, self_indent;
   char *indent_char;
-  gboolean first;
-  GString *attr_value = NULL;
-  int len;
+  GString *attr_value;
   PyObject *result = NULL;
 
   if (!PyArg_ParseTuple(args, "sO!isi",
@@ -746,87 +1302,242 @@ pygi_collect_attributes (PyObject *self,
 			&indent))
     return NULL;
 
-  if (attributes == Py_None || !PyList_Size(attributes))
-    return PyUnicode_DecodeUTF8("", 0, "strict");
+  attr_value = g_string_new ("");
+  if (append_attributes (attr_value, tag_name, attributes, self_indent, indent))
+    result = PyUnicode_DecodeUTF8 (attr_value->str, attr_value->len, "strict");
+  g_string_free (attr_value, TRUE);
+
+  return result;
+}
+
+/* XMLBuffer */
+
+static int
+pygi_xml_buffer_init (PyGIXMLBuffer *self,
+                      PyObject      *args,
+                      PyObject      *kwargs)
+{
+  if (!PyArg_ParseTuple (args, ":XMLBuffer.__init__"))
+    return -1;
 
-  len = calc_attrs_length(attributes, indent, self_indent);
-  if (len < 0)
+  if (self->buffer == NULL)
+    self->buffer = g_string_sized_new (64 * 1024);
+  g_free (self->indent_char);
+  self->indent_char = g_strdup (" ");
+  g_free (self->newline_char);
+  self->newline_char = g_strdup ("\n");
+
+  return 0;
+}
+
+static void
+pygi_xml_buffer_dealloc (PyGIXMLBuffer *self)
+{
+  if (self->buffer)
+    g_string_free (self->buffer, TRUE);
+  g_free (self->indent_char);
+  g_free (self->newline_char);
+  Py_TYPE (self)->tp_free ((PyObject *)self);
+}
+
+static PyObject *
+pygi_xml_buffer_set_whitespace (PyGIXMLBuffer *self,
+                                PyObject      *args)
+{
+  char *indent_char, *newline_char;
+
+  if (!PyArg_ParseTuple (args, "ss:XMLBuffer.set_whitespace",
+                         &indent_char, &newline_char))
     return NULL;
-  if (len > 79)
-    indent_len = self_indent + strlen(tag_name) + 1;
-  else
-    indent_len = 0;
 
-  first = TRUE;
-  attr_value = g_string_new ("");
+  g_free (self->indent_char);
+  self->indent_char = g_strdup (indent_char);
+  g_free (self->newline_char);
+  self->newline_char = g_strdup (newline_char);
 
-  for (i = 0; i < PyList_Size (attributes); ++i)
-    {
-      PyObject *tuple, *pyvalue;
-      PyObject *s = NULL;
-      char *attr, *value, *escaped;
+  Py_INCREF (Py_None);
+  return Py_None;
+}
 
-      tuple = PyList_GetItem (attributes, i);
+static PyObject *
+pygi_xml_buffer_write (PyGIXMLBuffer *self,
+                       PyObject      *args)
+{
+  PyObject *pydata, *s;
+  const char *data;
 
-      if (!PyTuple_Check (tuple))
-        {
-          PyErr_SetString(PyExc_TypeError,
-                          "attribute item must be a tuple");
-	  goto out;
-        }
+  if (!PyArg_ParseTuple (args, "O:XMLBuffer.write", &pydata))
+    return NULL;
 
-      if (PyTuple_Size (tuple) != 2)
+  data = pygi_string_as_utf8 (pydata, &s);
+  if (data == NULL)
+    return NULL;
+
+  g_string_append (self->buffer, data);
+  Py_XDECREF (s);
+
+  Py_INCREF (Py_None);
+  return Py_None;
+}
+
+static PyObject *
+pygi_xml_buffer_write_line (PyGIXMLBuffer *self,
+                            PyObject      *args)
+{
+  PyObject *pyline, *s;
+  const char *line;
+  int indent;
+
+  if (!PyArg_ParseTuple (args, "Oi:XMLBuffer.write_line", &pyline, &indent))
+    return NULL;
+
+  line = pygi_string_as_utf8 (pyline, &s);
+  if (line == NULL)
+    return NULL;
+
+  append_repeated (self->buffer, self->indent_char, indent);
+  g_string_append (self->buffer, line);
+  g_string_append (self->buffer, self->newline_char);
+  Py_XDECREF (s);
+
+  Py_INCREF (Py_None);
+  return Py_None;
+}
+
+/*
+ * Writes a whole <tag_name attributes/> or <tag_name attributes>data</tag_name>
+ * line, with the same wrapping as build_xml_tag() in xmlwriter.py.
+ */
+static PyObject *
+pygi_xml_buffer_write_tag (PyGIXMLBuffer *self,
+                           PyObject      *args)
+{
+  char *tag_name;
+  PyObject *attributes, *pydata, *s = NULL;
+  GString *suffix;
+  int indent, suffix_length;
+  gsize start;
+
+  if (!PyArg_ParseTuple (args, "sO!Oi:XMLBuffer.write_tag",
+                         &tag_name, &PyList_Type, &attributes, &pydata, &indent))
+    return NULL;
+
+  suffix = g_string_new ("");
+  if (pydata != Py_None)
+    {
+      const char *data = pygi_string_as_utf8 (pydata, &s);
+
+      if (data == NULL)
         {
-          PyErr_SetString(PyExc_IndexError,
-                          "attribute item must be a tuple of length 2");
-	  goto out;
+          g_string_free (suffix, TRUE);
+          return NULL;
         }
+      g_string_append_c (suffix, '>');
+      append_escaped_data (suffix, data);
+      g_string_append (suffix, "</");
+      g_string_append (suffix, tag_name);
+      g_string_append_c (suffix, '>');
+      Py_XDECREF (s);
+    }
+  else
+    g_string_append (suffix, "/>");
 
-      if (PyTuple_GetItem(tuple, 1) == Py_None)
-	continue;
-
-      /* this leaks, but we exit after, so */
-      if (!PyArg_ParseTuple(tuple, "sO", &attr, &pyvalue))
-	goto out;
-
-      if (PyUnicode_Check(pyvalue)) {
-        s = PyUnicode_AsUTF8String(pyvalue);
-        if (!s)
-	  goto out;
-        value = PyBytes_AsString(s);
-      } else if (PyBytes_Check(pyvalue)) {
-        value = PyBytes_AsString(pyvalue);
-      } else {
-        PyErr_SetString(PyExc_TypeError,
-                        "value must be string or unicode");
-	goto out;
-      }
-
-      if (indent_len && !first)
-	{
-	  g_string_append_c (attr_value, '\n');
-	  for (j = 0; j < indent_len; j++)
-	    g_string_append_c (attr_value, ' ');
-	}
-      g_string_append_c (attr_value, ' ');
-      g_string_append (attr_value, attr);
-      g_string_append_c (attr_value, '=');
-      g_string_append_c (attr_value, '\"');
-      escaped = g_markup_escape_text (value, -1);
-      g_string_append (attr_value, escaped);
-      g_string_append_c (attr_value, '\"');
-      if (first)
-	first = FALSE;
-      Py_XDECREF(s);
-  }
+  /* build_xml_tag() measured the data in characters, not bytes */
+  suffix_length = g_utf8_strlen (suffix->str, suffix->len);
 
-  result = PyUnicode_DecodeUTF8 (attr_value->str, attr_value->len, "strict");
- out:
-  if (attr_value != NULL)
-    g_string_free (attr_value, TRUE);
-  return result;
+  start = self->buffer->len;
+  append_repeated (self->buffer, self->indent_char, indent);
+  g_string_append_c (self->buffer, '<');
+  g_string_append (self->buffer, tag_name);
+  if (!append_attributes (self->buffer, tag_name, attributes, indent,
+                          1 + strlen (tag_name) + suffix_length))
+    {
+      g_string_truncate (self->buffer, start);
+      g_string_free (suffix, TRUE);
+      return NULL;
+    }
+  g_string_append_len (self->buffer, suffix->str, suffix->len);
+  g_string_append (self->buffer, self->newline_char);
+  g_string_free (suffix, TRUE);
+
+  Py_INCREF (Py_None);
+  return Py_None;
+}
+
+static PyObject *
+pygi_xml_buffer_open_tag (PyGIXMLBuffer *self,
+                          PyObject      *args)
+{
+  char *tag_name;
+  PyObject *attributes;
+  int indent;
+  gsize start;
+
+  if (!PyArg_ParseTuple (args, "sO!i:XMLBuffer.open_tag",
+                         &tag_name, &PyList_Type, &attributes, &indent))
+    return NULL;
+
+  start = self->buffer->len;
+  append_repeated (self->buffer, self->indent_char, indent);
+  g_string_append_c (self->buffer, '<');
+  g_string_append (self->buffer, tag_name);
+  if (!append_attributes (self->buffer, tag_name, attributes, indent,
+                          strlen (tag_name) + 2))
+    {
+      g_string_truncate (self->buffer, start);
+      return NULL;
+    }
+  g_string_append_c (self->buffer, '>');
+  g_string_append (self->buffer, self->newline_char);
+
+  Py_INCREF (Py_None);
+  return Py_None;
 }
 
+static PyObject *
+pygi_xml_buffer_close_tag (PyGIXMLBuffer *self,
+                           PyObject      *args)
+{
+  char *tag_name;
+  int indent;
+
+  if (!PyArg_ParseTuple (args, "si:XMLBuffer.close_tag", &tag_name, &indent))
+    return NULL;
+
+  append_repeated (self->buffer, self->indent_char, indent);
+  g_string_append (self->buffer, "</");
+  g_string_append (self->buffer, tag_name);
+  g_string_append_c (self->buffer, '>');
+  g_string_append (self->buffer, self->newline_char);
+
+  Py_INCREF (Py_None);
+  return Py_None;
+}
+
+static PyObject *
+pygi_xml_buffer_get_xml (PyGIXMLBuffer *self)
+{
+  return PyUnicode_DecodeUTF8 (self->buffer->str, self->buffer->len, "strict");
+}
+
+static PyObject *
+pygi_xml_buffer_get_encoded_xml (PyGIXMLBuffer *self)
+{
+  return PyBytes_FromStringAndSize (self->buffer->str, self->buffer->len);
+}
+
+static const PyMethodDef _PyGIXMLBuffer_methods[] = {
+  { "set_whitespace", (PyCFunction) pygi_xml_buffer_set_whitespace, METH_VARARGS },
+  { "write", (PyCFunction) pygi_xml_buffer_write, METH_VARARGS },
+  { "write_line", (PyCFunction) pygi_xml_buffer_write_line, METH_VARARGS },
+  { "write_tag", (PyCFunction) pygi_xml_buffer_write_tag, METH_VARARGS },
+  { "open_tag", (PyCFunction) pygi_xml_buffer_open_tag, METH_VARARGS },
+  { "close_tag", (PyCFunction) pygi_xml_buffer_close_tag, METH_VARARGS },
+  { "get_xml", (PyCFunction) pygi_xml_buffer_get_xml, METH_NOARGS },
+  { "get_encoded_xml", (PyCFunction) pygi_xml_buffer_get_encoded_xml, METH_NOARGS },
+  { NULL, NULL, 0 }
+};
+
 /* Module */
 
 static PyMethodDef pyscanner_functions[] = {
@@ -878,6 +1589,17 @@ MOD_INIT(_giscanner)
     PyGISourceType_Type.tp_getset = (PyGetSetDef*)_PyGISourceType_getsets;
     REGISTER_TYPE (d, "SourceType", PyGISourceType_Type);
 
+    PyGISourceCommentIter_Type.tp_methods = (PyMethodDef*)_PyGISourceCommentIter_methods;
+    PyGISourceCommentIter_Type.tp_iter = PyObject_SelfIter;
+    PyGISourceCommentIter_Type.tp_iternext = (iternextfunc)pygi_source_comment_iter_next;
+    PyGISourceCommentIter_Type.tp_dealloc = (destructor)pygi_source_comment_iter_dealloc;
+    REGISTER_TYPE (d, "CommentIter", PyGISourceCommentIter_Type);
+
+    PyGIXMLBuffer_Type.tp_init = (initproc)pygi_xml_buffer_init;
+    PyGIXMLBuffer_Type.tp_methods = (PyMethodDef*)_PyGIXMLBuffer_methods;
+    PyGIXMLBuffer_Type.tp_dealloc = (destructor)pygi_xml_buffer_dealloc;
+    REGISTER_TYPE (d, "XMLBuffer", PyGIXMLBuffer_Type);
+
 #if PY_MAJOR_VERSION >= 3
     return m;
 #endif
@@ -80,14 +80,16 @@ class MainTransformer(object):
         self._namespace.walk(self._pass_type_resolution)
 
         # Generate a reverse mapping "bar_baz" -> BarBaz
-        for node in self._namespace.values():
-            if isinstance(node, ast.Registered) and node.get_type is not None:
+        registered_kinds = (ast.Class, ast.Interface, ast.Record, ast.Union,
+                            ast.Boxed, ast.Enum, ast.Bitfield)
+        for node in self._namespace.get_nodes_of_kind(*registered_kinds):
+            if node.get_type is not None:
                 self._uscore_type_names[node.c_symbol_prefix] = node
             elif isinstance(node, (ast.Record, ast.Union)):
                 uscored = to_underscores_noprefix(node.name).lower()
                 self._uscore_type_names[uscored] = node
 
-        for node in list(self._namespace.values()):
+        for node in self._namespace.get_nodes_of_kind(ast.Function, ast.Class, ast.Interface):
             if isinstance(node, ast.Function):
                 # Discover which toplevel functions are actually methods
                 self._pair_function(node)
@@ -304,6 +306,7 @@ class MainTransformer(object):
 
         def top_combiner(base, *rest):
             if type_node is not None and isinstance(type_node, ast.Type):
+                base = base.unshare()
                 base.is_const = type_node.is_const
             return combiner(base, *rest)
 
@@ -329,6 +332,7 @@ class MainTransformer(object):
         # If we replace a node with a new type (such as an annotated) we
         # might lose the ctype from the original node.
         if type_node is not None:
+            result = result.unshare()
             result.ctype = type_node.ctype
         return result
 
@@ -1021,14 +1025,12 @@ the ones that failed to resolve removed."""
         # but only covers enums that are registered as GObject enums.
         # Create a fallback mapping based on all known enums in this module.
         uscore_enums = {}
-        for enum in self._namespace.values():
-            if not isinstance(enum, ast.Enum):
-                continue
+        for enum in self._namespace.get_nodes_of_kind(ast.Enum):
             uscored = to_underscores_noprefix(enum.name).lower()
             uscore_enums[uscored] = enum
             uscore_enums[enum.name] = enum
 
-        for node in self._namespace.values():
+        for node in self._namespace.get_nodes_of_kind(ast.Function):
             if not isinstance(node, ast.ErrorQuarkFunction):
                 continue
             full = node.symbol[:-len('_quark')]
@@ -25,6 +25,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import atexit
+import json
 import os
 import sys
 import operator
@@ -35,8 +37,27 @@ from . import utils
  ERROR,
  FATAL) = range(3)
 
+_LOG_TYPE_NAMES = {WARNING: 'warning',
+                   ERROR: 'error',
+                   FATAL: 'fatal'}
 
-class Position(object):
+DIAGNOSTICS_FORMATS = ('text', 'json')
+
+# Number of lines kept by a buffering MessageLogger before they are
+# written out
+BUFFER_SIZE = 1000
+
+
+def _relative_filename(filename, cwd):
+    filename = os.path.realpath(filename)
+    cwd = os.path.realpath(cwd)
+    common_prefix = os.path.commonprefix((filename, cwd))
+    if common_prefix:
+        filename = os.path.relpath(filename, common_prefix)
+    return filename
+
+
+class Position(utils.SlotsObject):
     """
     Represents a position in the source file which we
     want to inform about.
@@ -80,11 +101,7 @@ class Position(object):
                                         self.column or -1)
 
     def format(self, cwd):
-        filename = os.path.realpath(self.filename)
-        cwd = os.path.realpath(cwd)
-        common_prefix = os.path.commonprefix((filename, cwd))
-        if common_prefix:
-            filename = os.path.relpath(filename, common_prefix)
+        filename = _relative_filename(self.filename, cwd)
 
         if self.column is not None:
             return '%s:%d:%d' % (filename, self.line, self.column)
@@ -106,6 +123,14 @@ class MessageLogger(object):
         self._enable_warnings = []
         self._warning_count = 0
         self._error_count = 0
+        self._counts = dict((log_type, 0) for log_type in _LOG_TYPE_NAMES)
+        self._duplicate_count = 0
+        self._format = 'text'
+        self._formatted_positions = {}
+        self._relative_filenames = {}
+        self._buffer = None
+        self._buffer_size = 0
+        self._seen = None
 
     @classmethod
     def get(cls, *args, **kwargs):
@@ -122,6 +147,82 @@ class MessageLogger(object):
     def get_error_count(self):
         return self._error_count
 
+    def get_counts(self):
+        """
+        Returns a dict mapping 'warning', 'error' and 'fatal' to the number
+        of messages logged of that type, including the ones which were not
+        written out because their type is not enabled, and 'duplicate' to
+        the number of messages dropped by deduplication.
+        """
+        counts = dict((_LOG_TYPE_NAMES[log_type], count)
+                      for log_type, count in self._counts.items())
+        counts['duplicate'] = self._duplicate_count
+        return counts
+
+    def set_diagnostics_format(self, diagnostics_format):
+        """
+        Selects how messages are written out: 'text' writes them in the
+        usual compiler style, 'json' writes one JSON object per message and
+        line.
+        """
+        assert diagnostics_format in DIAGNOSTICS_FORMATS, diagnostics_format
+        self._format = diagnostics_format
+
+    def enable_buffering(self, size=BUFFER_SIZE):
+        """
+        Keep up to size lines of messages before writing them out
+        together.  The kept lines are written out by flush(), which is
+        also called on fatal errors and at exit.
+        """
+        if self._buffer is None:
+            self._buffer = []
+            atexit.register(self.flush)
+        self._buffer_size = size
+
+    def enable_deduplication(self):
+        """Only write out the first of identical messages."""
+        if self._seen is None:
+            self._seen = set()
+
+    def flush(self):
+        if self._buffer:
+            self._output.write(''.join(self._buffer))
+            del self._buffer[:]
+        if hasattr(self._output, 'flush'):
+            self._output.flush()
+
+    def _write(self, chunks):
+        if self._seen is not None:
+            message = ''.join(chunks)
+            if message in self._seen:
+                self._duplicate_count += 1
+                return
+            self._seen.add(message)
+
+        if self._buffer is None:
+            for chunk in chunks:
+                self._output.write(chunk)
+        else:
+            self._buffer.extend(chunks)
+            if len(self._buffer) >= self._buffer_size:
+                self.flush()
+
+    def _format_position(self, position):
+        formatted = self._formatted_positions.get(position)
+        if formatted is None:
+            formatted = position.format(cwd=self._cwd)
+            self._formatted_positions[position] = formatted
+        return formatted
+
+    def _position_to_json(self, position):
+        filename = self._relative_filenames.get(position.filename)
+        if filename is None:
+            filename = _relative_filename(position.filename, self._cwd)
+            self._relative_filenames[position.filename] = filename
+        return {'filename': filename,
+                'line': position.line,
+                'column': position.column}
+
     def log(self, log_type, text, positions=None, prefix=None, marker_pos=None, marker_line=None):
         """
         Log a warning, using optional file positioning information.
@@ -130,6 +231,7 @@ class MessageLogger(object):
         utils.break_on_debug_flag('warning')
 
         self._warning_count += 1
+        self._counts[log_type] += 1
 
         if log_type not in self._enable_warnings:
             return
@@ -142,15 +244,30 @@ class MessageLogger(object):
         if not positions:
             positions = [Position('<unknown>')]
 
-        for position in positions[:-1]:
-            self._output.write("%s:\n" % (position.format(cwd=self._cwd), ))
-        last_position = positions[-1].format(cwd=self._cwd)
+        if log_type == ERROR:
+            self._error_count += 1
+
+        if self._format == 'json':
+            namespace = self._namespace.name if self._namespace else None
+            record = {'type': _LOG_TYPE_NAMES[log_type],
+                      'namespace': namespace,
+                      'positions': [self._position_to_json(position) for position in positions],
+                      'prefix': prefix,
+                      'text': text,
+                      'marker_pos': marker_pos,
+                      'marker_line': marker_line}
+            self._write([json.dumps(record, sort_keys=True) + '\n'])
+            # Only a fatal message still needs the text, for SystemExit
+            if log_type != FATAL:
+                return
+
+        chunks = ["%s:\n" % (self._format_position(position), ) for position in positions[:-1]]
+        last_position = self._format_position(positions[-1])
 
         if log_type == WARNING:
             error_type = "Warning"
         elif log_type == ERROR:
             error_type = "Error"
-            self._error_count += 1
         elif log_type == FATAL:
             error_type = "Fatal"
 
@@ -171,9 +288,12 @@ class MessageLogger(object):
             else:
                 text = ('%s: %s: %s\n' % (last_position, error_type, text))
 
-        self._output.write(text)
+        if self._format == 'text':
+            chunks.append(text)
+            self._write(chunks)
 
         if log_type == FATAL:
+            self.flush()
             utils.break_on_debug_flag('fatal')
             raise SystemExit(text)
 
@@ -207,6 +327,28 @@ class MessageLogger(object):
                  prefix="symbol='%s'" % (symbol.ident, ))
 
 
+class MessageRecorder(MessageLogger):
+    """
+    Keeps the messages logged through it instead of writing them out, so
+    that they can be replayed later on with replay(), for example after
+    they were sent back from a worker process.
+    """
+
+    def __init__(self):
+        MessageLogger.__init__(self)
+        self.messages = []
+
+    def log(self, log_type, text, positions=None, prefix=None, marker_pos=None, marker_line=None):
+        self.messages.append((log_type, text, positions, prefix, marker_pos, marker_line))
+
+
+def replay(messages):
+    """Log the messages kept by a MessageRecorder, in order."""
+    ml = MessageLogger.get()
+    for args in messages:
+        ml.log(*args)
+
+
 def log_node(log_type, node, text, context=None, positions=None):
     ml = MessageLogger.get()
     ml.log_node(log_type, node, text, context=context, positions=positions)
@@ -26,6 +26,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import errno
+import multiprocessing
 import optparse
 import os
 import shutil
@@ -33,10 +34,12 @@ import stat
 import subprocess
 import sys
 import tempfile
+import threading
 import platform
 
 from giscanner import message
-from giscanner.annotationparser import GtkDocCommentBlockParser
+from giscanner.annotationparser import GtkDocCommentBlockParser, PARALLEL_PARSE_THRESHOLD
+from giscanner.cachestore import CacheStore
 from giscanner.ast import Include, Namespace
 from giscanner.dumper import compile_introspection_binary
 from giscanner.gdumpparser import GDumpParser, IntrospectionBinary
@@ -200,6 +203,10 @@ match the namespace prefix.""")
     parser.add_option('', "--warn-error",
                       action="store_true", dest="warn_fatal",
                       help="Turn warnings into fatal errors")
+    parser.add_option('', "--diagnostics-format",
+                      type="choice", choices=message.DIAGNOSTICS_FORMATS,
+                      action="store", dest="diagnostics_format", default="text",
+                      help="Format of the warnings, 'text' (default) or 'json'")
     parser.add_option("-v", "--verbose",
                       action="store_true", dest="verbose",
                       help="be verbose")
@@ -209,6 +216,22 @@ match the namespace prefix.""")
     parser.add_option("", "--filelist",
                       action="store", dest="filelist", default=[],
                       help="file containing headers and sources to be scanned")
+    parser.add_option("", "--lazy-comment-blocks",
+                      action="store_true", dest="lazy_comment_blocks", default=False,
+                      help="only parse the comment blocks which are looked up, "
+                           "skipping the warnings of unused ones")
+    parser.add_option("", "--cache-gir-fragments",
+                      action="store_true", dest="cache_gir_fragments", default=False,
+                      help="reuse the XML written for unchanged top-level nodes "
+                           "in earlier runs")
+    parser.add_option("", "--cache-header-symbols",
+                      action="store_true", dest="cache_header_symbols", default=False,
+                      help="reuse the symbols parsed from the headers in earlier runs "
+                           "when none of them changed")
+    parser.add_option("-j", "--jobs",
+                      action="store", dest="jobs", type="int", default=1,
+                      help="number of processes used to parse headers and comment blocks "
+                           "and to write the .gir")
 
     group = get_preprocessor_option_group(parser)
     parser.add_option_group(group)
@@ -403,31 +426,77 @@ def create_transformer(namespace, options):
     return transformer
 
 
-def create_binary(transformer, options, args):
-    # Transform the C AST nodes into higher level
-    # GLib/GObject nodes
-    gdump_parser = GDumpParser(transformer)
-
-    # Do enough parsing that we have the get_type() functions to reference
-    # when creating the introspection binary
-    gdump_parser.init_parse()
-
-    if options.program:
-        args = [options.program]
-        args.extend(options.program_args)
-        binary = IntrospectionBinary(args)
-    else:
-        binary = compile_introspection_binary(options,
-                                              gdump_parser.get_get_type_functions(),
-                                              gdump_parser.get_error_quark_functions())
+class BinaryBuilder(object):
+    """Creates the introspection binary and resolves the shared libraries
+    in a background thread.
+
+    Compiling and linking only need the get_type() and error quark
+    functions, so they can run while the main thread is busy with other
+    work, such as parsing the comment blocks.  finish() waits for the
+    binary and then runs it to complete the GObject introspection.
+
+    The thread must not be running when the main thread forks worker
+    processes, the children could inherit locks held by it.  Start any
+    multiprocessing.Pool before start().
+    """
+
+    def __init__(self, transformer, options):
+        self._options = options
+        self._binary = None
+        self._shlibs = None
+        self._exception = None
+
+        # Transform the C AST nodes into higher level
+        # GLib/GObject nodes
+        self._gdump_parser = GDumpParser(transformer)
 
-    shlibs = resolve_shlibs(options, binary, options.libraries)
-    gdump_parser.set_introspection_binary(binary)
-    gdump_parser.parse()
-    return shlibs
+        # Do enough parsing that we have the get_type() functions to reference
+        # when creating the introspection binary
+        self._gdump_parser.init_parse()
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def finish(self):
+        self._thread.join()
+        if self._exception is not None:
+            raise self._exception
+
+        self._gdump_parser.set_introspection_binary(self._binary)
+        self._gdump_parser.parse()
+        return self._shlibs
+
+    def _run(self):
+        options = self._options
+        try:
+            if options.program:
+                args = [options.program]
+                args.extend(options.program_args)
+                binary = IntrospectionBinary(args)
+            else:
+                binary = compile_introspection_binary(
+                    options,
+                    self._gdump_parser.get_get_type_functions(),
+                    self._gdump_parser.get_error_quark_functions())
+
+            self._shlibs = resolve_shlibs(options, binary, options.libraries)
+            self._binary = binary
+        except BaseException as e:
+            # Compiler and linker failures are raised as SystemExit;
+            # hand them over to the main thread
+            self._exception = e
 
 
-def create_source_scanner(options, args):
+def create_binary(transformer, options, args):
+    builder = BinaryBuilder(transformer, options)
+    builder.start()
+    return builder.finish()
+
+
+def create_source_scanner(options, args, namespace=None):
     if hasattr(options, 'filelist') and options.filelist:
         filenames = extract_filelist(options)
     else:
@@ -443,6 +512,25 @@ def create_source_scanner(options, args):
                        options.cpp_defines,
                        options.cpp_undefines,
                        cflags=options.cflags)
+    if hasattr(options, 'jobs'):
+        ss.set_jobs(options.jobs)
+    if hasattr(options, 'cache_header_symbols') and options.cache_header_symbols:
+        ss.enable_cache()
+    # Symbols the transformer would skip as foreign are dropped by the
+    # C scanner already, unless custom prefix handling is requested or
+    # the warnings about them are wanted
+    if namespace is not None:
+        if (namespace.identifier_prefixes
+                and namespace.symbol_prefixes
+                and not options.accept_unprefixed
+                and not options.identifier_filter_cmd
+                and not options.symbol_filter_cmd
+                and not options.warn_all
+                and not options.warn_fatal):
+            ss.set_symbol_prefixes(namespace.identifier_prefixes,
+                                   namespace.symbol_prefixes)
+        else:
+            ss.set_symbol_prefixes([], [])
     ss.parse_files(filenames)
     ss.parse_macros(filenames)
     return ss
@@ -523,6 +611,9 @@ def scanner_main(args):
 
     namespace = create_namespace(options)
     logger = message.MessageLogger.get(namespace=namespace)
+    logger.set_diagnostics_format(options.diagnostics_format)
+    logger.enable_buffering()
+    logger.enable_deduplication()
     if options.warn_all:
         logger.enable_warnings((message.WARNING, message.ERROR, message.FATAL))
 
@@ -535,16 +626,46 @@ def scanner_main(args):
         if exit_code:
             return exit_code
 
-    ss = create_source_scanner(options, args)
-
-    cbp = GtkDocCommentBlockParser()
-    blocks = cbp.parse_comment_blocks(ss.get_comments())
+    ss = create_source_scanner(options, args, namespace)
+    if options.verbose:
+        kept, dropped = ss.get_symbol_counts()
+        if dropped is None:
+            print("g-ir-scanner: %s: kept %d C symbols" % (namespace.name, kept))
+        else:
+            print("g-ir-scanner: %s: kept %d C symbols, dropped %d" %
+                  (namespace.name, kept, dropped))
 
     # Transform the C symbols into AST nodes
     transformer.parse(ss.get_symbols())
 
+    # Worker processes forked while the builder thread runs could
+    # deadlock, so the pool for parsing the comment blocks is started
+    # first, when there are enough of them to be parsed in parallel.
+    comments = ss.iter_comments()
+    pool = None
+    if options.jobs > 1 and not options.lazy_comment_blocks:
+        comments = list(comments)
+        if len(comments) >= PARALLEL_PARSE_THRESHOLD:
+            pool = multiprocessing.Pool(options.jobs)
+
+    # Build the introspection binary in the background while the
+    # comment blocks are parsed, they don't depend on each other
     if not options.header_only:
-        shlibs = create_binary(transformer, options, args)
+        builder = BinaryBuilder(transformer, options)
+        builder.start()
+
+    cbp = GtkDocCommentBlockParser(CacheStore())
+    try:
+        blocks = cbp.parse_comment_blocks(comments, options.jobs,
+                                          lazy=options.lazy_comment_blocks,
+                                          pool=pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if not options.header_only:
+        shlibs = builder.finish()
     else:
         shlibs = []
 
@@ -557,6 +678,7 @@ def scanner_main(args):
 
     final = IntrospectablePass(transformer, blocks)
     final.validate()
+    logger.flush()
 
     warning_count = logger.get_warning_count()
     if options.warn_fatal and warning_count > 0:
@@ -575,7 +697,11 @@ def scanner_main(args):
 
     transformer.namespace.c_includes = options.c_includes
     transformer.namespace.exported_packages = exported_packages
-    writer = Writer(transformer.namespace)
+    if options.cache_gir_fragments:
+        cachestore = CacheStore()
+    else:
+        cachestore = None
+    writer = Writer(transformer.namespace, options.jobs, cachestore)
     data = writer.get_encoded_xml()
 
     write_output(data, options)
@@ -24,9 +24,11 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import mmap
 import os
 import platform
 import re
+import struct
 import subprocess
 
 from .utils import get_libtool_command, extract_libtool_shlib
@@ -64,6 +66,159 @@ def _ldd_library_pattern(library_name):
     return re.compile(pattern % re.escape(library_name))
 
 
+# ELF constants, see elf(5)
+_ELFMAG = b'\x7fELF'
+_ELFCLASS32 = 1
+_ELFCLASS64 = 2
+_ELFDATA2LSB = 1
+_ELFDATA2MSB = 2
+_PT_LOAD = 1
+_PT_DYNAMIC = 2
+_DT_NULL = 0
+_DT_NEEDED = 1
+_DT_STRTAB = 5
+_DT_SONAME = 14
+
+
+class ELFError(Exception):
+    pass
+
+
+def _read_elf_dynamic(data):
+    if data[:4] != _ELFMAG:
+        raise ELFError("not an ELF file")
+
+    elf_class = bytearray(data[4:5])[0]
+    elf_data = bytearray(data[5:6])[0]
+    if elf_data == _ELFDATA2LSB:
+        endian = '<'
+    elif elf_data == _ELFDATA2MSB:
+        endian = '>'
+    else:
+        raise ELFError("unknown ELF data encoding %d" % (elf_data, ))
+
+    # Only the header fields we need: e_phoff, e_phentsize and e_phnum;
+    # program header fields p_type, p_offset, p_vaddr and p_filesz;
+    # and the dynamic entry d_tag/d_val pair.
+    if elf_class == _ELFCLASS64:
+        phoff, = struct.unpack_from(endian + 'Q', data, 32)
+        phentsize, phnum = struct.unpack_from(endian + 'HH', data, 54)
+
+        def read_phdr(offset):
+            p_type, = struct.unpack_from(endian + 'I', data, offset)
+            p_offset, p_vaddr = struct.unpack_from(endian + 'QQ', data, offset + 8)
+            p_filesz, = struct.unpack_from(endian + 'Q', data, offset + 32)
+            return p_type, p_offset, p_vaddr, p_filesz
+        dyn_format = endian + 'qQ'
+    elif elf_class == _ELFCLASS32:
+        phoff, = struct.unpack_from(endian + 'I', data, 28)
+        phentsize, phnum = struct.unpack_from(endian + 'HH', data, 42)
+
+        def read_phdr(offset):
+            return struct.unpack_from(endian + 'IIII', data, offset)[:3] + \
+                struct.unpack_from(endian + 'I', data, offset + 16)
+        dyn_format = endian + 'iI'
+    else:
+        raise ELFError("unknown ELF class %d" % (elf_class, ))
+
+    loads = []
+    dynamic = None
+    for i in range(phnum):
+        p_type, p_offset, p_vaddr, p_filesz = read_phdr(phoff + i * phentsize)
+        if p_type == _PT_LOAD:
+            loads.append((p_vaddr, p_offset, p_filesz))
+        elif p_type == _PT_DYNAMIC:
+            dynamic = (p_offset, p_filesz)
+    if dynamic is None:
+        raise ELFError("no dynamic section")
+
+    entries = []
+    strtab = None
+    dyn_size = struct.calcsize(dyn_format)
+    offset, size = dynamic
+    for offset in range(offset, offset + size, dyn_size):
+        d_tag, d_val = struct.unpack_from(dyn_format, data, offset)
+        if d_tag == _DT_NULL:
+            break
+        elif d_tag == _DT_STRTAB:
+            strtab = d_val
+        elif d_tag in (_DT_NEEDED, _DT_SONAME):
+            entries.append((d_tag, d_val))
+    if strtab is None:
+        raise ELFError("no dynamic string table")
+
+    # DT_STRTAB holds a virtual address, translate it into a file offset
+    for vaddr, file_offset, filesz in loads:
+        if vaddr <= strtab < vaddr + filesz:
+            strtab = strtab - vaddr + file_offset
+            break
+    else:
+        raise ELFError("dynamic string table outside of loadable segments")
+
+    def read_string(index):
+        start = strtab + index
+        end = data.find(b'\0', start)
+        try:
+            return data[start:end].decode('ascii')
+        except UnicodeDecodeError as e:
+            raise ELFError("invalid dynamic string: %s" % (e, ))
+
+    soname = None
+    needed = []
+    for d_tag, d_val in entries:
+        if d_tag == _DT_NEEDED:
+            needed.append(read_string(d_val))
+        else:
+            soname = read_string(d_val)
+    return soname, needed
+
+
+def read_elf_dependencies(filename):
+    """Return the DT_SONAME (or None) and the list of DT_NEEDED entries of
+    the ELF file @filename.  Raises ELFError if @filename is not a dynamically
+    linked ELF file."""
+    with open(filename, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError) as e:
+            # Empty files can not be mapped
+            raise ELFError(str(e))
+        try:
+            return _read_elf_dynamic(data)
+        except struct.error as e:
+            raise ELFError("truncated ELF file: %s" % (e, ))
+        finally:
+            data.close()
+
+
+def _resolve_from_elf(binary, patterns):
+    """Resolve libraries by reading the DT_NEEDED entries of the binary
+    directly, which avoids spawning (and running) ldd. Resolved libraries
+    are removed from @patterns."""
+    candidates = [binary.args[0]]
+    # With libtool the binary is a wrapper script around .libs/<binary>
+    candidates.append(os.path.join(os.path.dirname(binary.args[0]), '.libs',
+                                   os.path.basename(binary.args[0])))
+    for filename in candidates:
+        try:
+            needed = read_elf_dependencies(filename)[1]
+        except (ELFError, IOError, OSError):
+            continue
+        break
+    else:
+        return []
+
+    shlibs = []
+    for name in needed:
+        for library, pattern in patterns.items():
+            m = pattern.search(name)
+            if m:
+                del patterns[library]
+                shlibs.append(m.group(1))
+                break
+    return shlibs
+
+
 # This is a what we do for non-la files. We assume that we are on an
 # ELF-like system where ldd exists and the soname extracted with ldd is
 # a filename that can be opened with dlopen().
@@ -99,30 +254,38 @@ def _resolve_non_libtool(options, binary, libraries):
         shlibs = cc.resolve_windows_libs(libraries, options)
 
     else:
-        args = []
-        libtool = get_libtool_command(options)
-        if libtool:
-            args.extend(libtool)
-            args.append('--mode=execute')
-        platform_system = platform.system()
-        if platform_system == 'Darwin':
-            args.extend(['otool', '-L', binary.args[0]])
-        else:
-            args.extend(['ldd', binary.args[0]])
-        proc = subprocess.Popen(args, stdout=subprocess.PIPE)
         patterns = {}
         for library in libraries:
             patterns[library] = _ldd_library_pattern(library)
 
-        shlibs = []
-        for line in proc.stdout:
-            line = line.decode('ascii')
-            for library, pattern in patterns.items():
-                m = pattern.search(line)
-                if m:
-                    del patterns[library]
-                    shlibs.append(m.group(1))
-                    break
+        platform_system = platform.system()
+        if platform_system == 'Darwin':
+            shlibs = []
+        else:
+            shlibs = _resolve_from_elf(binary, patterns)
+
+        if patterns:
+            # Fall back to ldd for whatever could not be resolved from
+            # the direct dependencies of the binary
+            args = []
+            libtool = get_libtool_command(options)
+            if libtool:
+                args.extend(libtool)
+                args.append('--mode=execute')
+            if platform_system == 'Darwin':
+                args.extend(['otool', '-L', binary.args[0]])
+            else:
+                args.extend(['ldd', binary.args[0]])
+            proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+
+            for line in proc.stdout:
+                line = line.decode('ascii')
+                for library, pattern in patterns.items():
+                    m = pattern.search(line)
+                    if m:
+                        del patterns[library]
+                        shlibs.append(m.group(1))
+                        break
 
         if len(patterns) > 0:
             raise SystemExit(
@@ -220,6 +220,8 @@ gi_source_scanner_new (void)
                                                   g_free, NULL);
   scanner->files = g_hash_table_new_full (g_file_hash, (GEqualFunc)g_file_equal,
                                           g_object_unref, NULL);
+  scanner->source_files = g_hash_table_new_full (g_str_hash, g_str_equal,
+                                                 g_free, NULL);
   g_queue_init (&scanner->conditionals);
   return scanner;
 }
@@ -245,6 +247,9 @@ gi_source_scanner_free (GISourceScanner *scanner)
   g_slist_free (scanner->symbols);
 
   g_hash_table_unref (scanner->files);
+  g_hash_table_unref (scanner->source_files);
+  g_strfreev (scanner->identifier_prefixes);
+  g_strfreev (scanner->symbol_prefixes);
 
   g_queue_clear (&scanner->conditionals);
 }
@@ -257,6 +262,23 @@ gi_source_scanner_is_typedef (GISourceScanner *scanner,
   return b;
 }
 
+void
+gi_source_scanner_add_typedef (GISourceScanner *scanner,
+			       const char      *name)
+{
+  g_hash_table_insert (scanner->typedef_table,
+		       g_strdup (name),
+		       GINT_TO_POINTER (TRUE));
+}
+
+void
+gi_source_scanner_add_source_file (GISourceScanner *scanner,
+				   const char      *filename)
+{
+  if (!g_hash_table_contains (scanner->source_files, filename))
+    g_hash_table_add (scanner->source_files, g_strdup (filename));
+}
+
 void
 gi_source_scanner_set_macro_scan (GISourceScanner  *scanner,
 				  gboolean          macro_scan)
@@ -264,6 +286,74 @@ gi_source_scanner_set_macro_scan (GISourceScanner  *scanner,
   scanner->macro_scan = macro_scan;
 }
 
+/**
+ * gi_source_scanner_set_prefixes:
+ * @scanner: scanner instance
+ * @identifier_prefixes: (transfer full): prefixes of the type names to keep
+ * @symbol_prefixes: (transfer full): prefixes of the function and constant
+ *   names to keep, including the trailing underscore
+ *
+ * Drops symbols which can not belong to the namespace being scanned, before
+ * they are handed to the transformer.  Structs, unions and enums are always
+ * kept as they populate the tag namespace.  Passing empty arrays only drops
+ * the symbols which the transformer ignores anyway.
+ */
+void
+gi_source_scanner_set_prefixes (GISourceScanner  *scanner,
+				gchar           **identifier_prefixes,
+				gchar           **symbol_prefixes)
+{
+  g_strfreev (scanner->identifier_prefixes);
+  g_strfreev (scanner->symbol_prefixes);
+  scanner->identifier_prefixes = identifier_prefixes;
+  scanner->symbol_prefixes = symbol_prefixes;
+}
+
+static gboolean
+has_prefix_in (const char  *name,
+	       gchar      **prefixes)
+{
+  for (; *prefixes; prefixes++)
+    if (g_str_has_prefix (name, *prefixes))
+      return TRUE;
+  return FALSE;
+}
+
+static gboolean
+symbol_has_namespace_prefix (GISourceScanner *scanner,
+			     GISourceSymbol  *symbol)
+{
+  const char *ident = symbol->ident;
+
+  if (scanner->symbol_prefixes == NULL || ident == NULL)
+    return TRUE;
+
+  switch (symbol->type)
+    {
+    case CSYMBOL_TYPE_OBJECT:
+      /* Variable declarations are ignored by the transformer */
+      return FALSE;
+    case CSYMBOL_TYPE_FUNCTION:
+    case CSYMBOL_TYPE_CONST:
+      /* As are private functions and constants */
+      if (*ident == '_')
+	return FALSE;
+      if (*scanner->symbol_prefixes == NULL)
+	return TRUE;
+      return has_prefix_in (ident, scanner->symbol_prefixes);
+    case CSYMBOL_TYPE_TYPEDEF:
+      if (*scanner->identifier_prefixes == NULL)
+	return TRUE;
+      /* Callback typedefs may be named like symbols */
+      if (*ident == '_')
+	ident++;
+      return (has_prefix_in (ident, scanner->identifier_prefixes) ||
+	      has_prefix_in (ident, scanner->symbol_prefixes));
+    default:
+      return TRUE;
+    }
+}
+
 void
 gi_source_scanner_add_symbol (GISourceScanner  *scanner,
 			      GISourceSymbol   *symbol)
@@ -277,17 +367,23 @@ gi_source_scanner_add_symbol (GISourceScanner  *scanner,
   g_assert (scanner->current_file);
 
   if (scanner->macro_scan || g_hash_table_contains (scanner->files, scanner->current_file))
-    scanner->symbols = g_slist_prepend (scanner->symbols,
-                                        gi_source_symbol_ref (symbol));
+    {
+      if (symbol_has_namespace_prefix (scanner, symbol))
+	{
+	  scanner->symbols = g_slist_prepend (scanner->symbols,
+					      gi_source_symbol_ref (symbol));
+	  scanner->n_symbols_kept++;
+	}
+      else
+	scanner->n_symbols_dropped++;
+    }
 
   g_assert (symbol->source_filename != NULL);
 
   switch (symbol->type)
     {
     case CSYMBOL_TYPE_TYPEDEF:
-      g_hash_table_insert (scanner->typedef_table,
-			   g_strdup (symbol->ident),
-			   GINT_TO_POINTER (TRUE));
+      gi_source_scanner_add_typedef (scanner, symbol->ident);
       break;
     default:
       break;
@@ -114,6 +114,11 @@ struct _GISourceScanner
   GHashTable *files;
   GSList *comments; /* _GIComment */
   GHashTable *typedef_table;
+  GHashTable *source_files; /* paths seen in preprocessor line markers */
+  gchar **identifier_prefixes; /* NULL unless symbols are filtered */
+  gchar **symbol_prefixes;
+  guint n_symbols_kept;
+  guint n_symbols_dropped;
   gboolean skipping;
   GQueue conditionals;
 };
@@ -158,6 +163,9 @@ void                gi_source_scanner_parse_macros     (GISourceScanner  *scanne
 							GList            *filenames);
 void                gi_source_scanner_set_macro_scan   (GISourceScanner  *scanner,
 							gboolean          macro_scan);
+void                gi_source_scanner_set_prefixes     (GISourceScanner  *scanner,
+							gchar           **identifier_prefixes,
+							gchar           **symbol_prefixes);
 GSList *            gi_source_scanner_get_symbols      (GISourceScanner  *scanner);
 GSList *            gi_source_scanner_get_comments     (GISourceScanner  *scanner);
 void                gi_source_scanner_free             (GISourceScanner  *scanner);
@@ -175,6 +183,10 @@ void                gi_source_scanner_take_comment     (GISourceScanner *scanner
                                                         GISourceComment *comment);
 gboolean            gi_source_scanner_is_typedef       (GISourceScanner  *scanner,
 							const char       *name);
+void                gi_source_scanner_add_typedef      (GISourceScanner  *scanner,
+							const char       *name);
+void                gi_source_scanner_add_source_file  (GISourceScanner  *scanner,
+							const char       *filename);
 void                gi_source_symbol_merge_type        (GISourceSymbol   *symbol,
 							GISourceType     *type);
 GISourceType *      gi_source_type_new                 (GISourceTypeType  type);
@@ -24,6 +24,8 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import hashlib
+import multiprocessing
 import os
 import subprocess
 import tempfile
@@ -31,6 +33,7 @@ import tempfile
 from .libtoolimporter import LibtoolImporter
 from .message import Position
 from .ccompiler import CCompiler
+from .cachestore import CacheStore
 
 with LibtoolImporter(None, None):
     if 'UNINSTALLED_INTROSPECTION_SRCDIR' in os.environ:
@@ -117,12 +120,11 @@ def ctype_name(ctype):
 
 
 class SourceType(object):
-    __members__ = ['type', 'base_type', 'name', 'type_qualifier',
-                   'child_list', 'is_bitfield']
+    """A C type, built from a record of CSourceScanner.get_symbol_records()"""
 
-    def __init__(self, scanner, stype):
-        self._scanner = scanner
-        self._stype = stype
+    __slots__ = ('type', 'storage_class_specifier', 'type_qualifier',
+                 'function_specifier', 'name', 'base_type', 'child_list',
+                 'is_bitfield')
 
     def __repr__(self):
         return "<%s type='%s' name='%s'>" % (
@@ -130,42 +132,31 @@ class SourceType(object):
             ctype_name(self.type),
             self.name)
 
-    @property
-    def type(self):
-        return self._stype.type
-
-    @property
-    def base_type(self):
-        if self._stype.base_type is not None:
-            return SourceType(self._scanner, self._stype.base_type)
-
-    @property
-    def name(self):
-        return self._stype.name
-
-    @property
-    def type_qualifier(self):
-        return self._stype.type_qualifier
-
-    @property
-    def child_list(self):
-        for symbol in self._stype.child_list:
-            if symbol is None:
-                continue
-            yield SourceSymbol(self._scanner, symbol)
-
-    @property
-    def is_bitfield(self):
-        return self._stype.is_bitfield
+    @classmethod
+    def from_record(cls, record, types):
+        if record is None:
+            return None
+        # Records shared in the C type tree stay shared here
+        self = types.get(id(record))
+        if self is not None:
+            return self
+        self = cls()
+        (self.type, self.storage_class_specifier, self.type_qualifier,
+         self.function_specifier, self.name, base_type, child_list,
+         self.is_bitfield) = record
+        self.base_type = cls.from_record(base_type, types)
+        self.child_list = [SourceSymbol.from_record(child, types)
+                           for child in child_list]
+        types[id(record)] = self
+        return self
 
 
 class SourceSymbol(object):
-    __members__ = ['const_int', 'const_double', 'const_string', 'const_boolean',
-                   'ident', 'type', 'base_type']
+    """A C symbol, built from a record of CSourceScanner.get_symbol_records()"""
 
-    def __init__(self, scanner, symbol):
-        self._scanner = scanner
-        self._symbol = symbol
+    __slots__ = ('type', 'ident', 'base_type', 'const_int', 'const_double',
+                 'const_string', 'const_boolean', 'source_filename', 'line',
+                 'private')
 
     def __repr__(self):
         src = self.source_filename
@@ -179,51 +170,56 @@ class SourceSymbol(object):
             self.ident,
             src)
 
-    @property
-    def const_int(self):
-        return self._symbol.const_int
-
-    @property
-    def const_double(self):
-        return self._symbol.const_double
-
-    @property
-    def const_string(self):
-        return self._symbol.const_string
-
-    @property
-    def const_boolean(self):
-        return self._symbol.const_boolean
-
-    @property
-    def ident(self):
-        return self._symbol.ident
-
-    @property
-    def type(self):
-        return self._symbol.type
-
-    @property
-    def base_type(self):
-        if self._symbol.base_type is not None:
-            return SourceType(self._scanner, self._symbol.base_type)
-
-    @property
-    def source_filename(self):
-        return self._symbol.source_filename
-
-    @property
-    def line(self):
-        return self._symbol.line
-
-    @property
-    def private(self):
-        return self._symbol.private
-
     @property
     def position(self):
-        return Position(self._symbol.source_filename,
-                        self._symbol.line)
+        return Position(self.source_filename, self.line)
+
+    @classmethod
+    def from_record(cls, record, types):
+        self = cls()
+        (self.type, self.ident, base_type, self.const_int, self.const_double,
+         self.const_string, self.const_boolean, self.source_filename,
+         self.line, self.private) = record
+        self.base_type = SourceType.from_record(base_type, types)
+        return self
+
+
+def _hash_file(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _splice(items, replayed):
+    """Insert the (index, records) pairs of @replayed into @items"""
+    if not replayed:
+        return items
+    result = []
+    start = 0
+    for index, records in replayed:
+        result.extend(items[start:index])
+        result.extend(records)
+        start = index
+    result.extend(items[start:])
+    return result
+
+
+def _parse_shard(args):
+    # Runs in a worker process of SourceScanner._parse_sharded()
+    cpp_options, prefixes, all_filenames, filenames = args
+    ss = SourceScanner()
+    ss.disable_cache()
+    ss._cpp_options = list(cpp_options)
+    if prefixes is not None:
+        ss.set_symbol_prefixes(*prefixes)
+    for filename in all_filenames:
+        ss._scanner.append_filename(filename)
+    # multiprocessing does not hand a SystemExit raised in a worker back
+    # to the parent, which would then wait for the result forever
+    try:
+        ss._preprocess_and_parse(filenames)
+    except SystemExit as e:
+        return {'error': e.code}
+    return ss._collect_parse_data((0, 0), 0)
 
 
 class SourceScanner(object):
@@ -232,9 +228,53 @@ class SourceScanner(object):
         self._scanner = CSourceScanner()
         self._filenames = []
         self._cpp_options = []
+        self._cachestore = None
+        self._jobs = 1
+        self._prefixes = None
+        self._replayed_counts = (0, 0)
+        self._replayed_symbols = []
 
     # Public API
 
+    def enable_cache(self):
+        """Keep the symbols parsed from the headers between runs.  The
+        headers are preprocessed as a single translation unit, so this only
+        avoids the work when none of them changed."""
+        self._cachestore = CacheStore()
+
+    def disable_cache(self):
+        self._cachestore = None
+
+    def set_jobs(self, jobs):
+        """Preprocess and parse the headers in up to @jobs worker processes"""
+        self._jobs = jobs
+
+    def set_symbol_prefixes(self, identifier_prefixes, symbol_prefixes):
+        """Only keep the typedefs, functions and constants which are named
+        with one of the given prefixes.  The symbol prefixes are matched
+        like Transformer.split_csymbol() does, in lower and upper case."""
+        expanded = []
+        for prefix in symbol_prefixes:
+            if not prefix.endswith('_'):
+                prefix = prefix + '_'
+            for variant in (prefix, prefix.upper()):
+                if variant not in expanded:
+                    expanded.append(variant)
+        self._prefixes = (list(identifier_prefixes), expanded)
+        self._scanner.set_prefixes(list(identifier_prefixes), expanded)
+
+    def get_symbol_counts(self):
+        """Returns the number of symbols kept and dropped by the prefix
+        filter, see set_symbol_prefixes().  The dropped count is None when
+        the headers were parsed in several processes, see set_jobs(), as
+        symbols dropped by more than one of them can not be told apart."""
+        kept, dropped = self._scanner.get_symbol_counts()
+        if self._replayed_counts[1] is None:
+            dropped = None
+        else:
+            dropped += self._replayed_counts[1]
+        return (kept + self._replayed_counts[0], dropped)
+
     def set_cpp_options(self, includes, defines, undefines, cflags=[]):
         self._cpp_options.extend(cflags)
         for prefix, args in [('-I', [os.path.realpath(f) for f in includes]),
@@ -262,18 +302,62 @@ class SourceScanner(object):
         self._parse(headers)
 
     def parse_macros(self, filenames):
-        self._scanner.set_macro_scan(True)
         # self._scanner expects file names to be canonicalized and symlinks to be resolved
-        self._scanner.parse_macros([os.path.realpath(f) for f in filenames])
+        filenames = [os.path.realpath(f) for f in filenames]
+
+        key = None
+        if self._cachestore is not None:
+            # The macro pass only reads the given files, but how the
+            # definitions parse depends on the typedefs seen so far.  Like
+            # in _parse(), the file contents are checked against the hashes
+            # kept in the entry rather than being part of its name.
+            hasher = hashlib.sha1()
+            for item in sorted(self._scanner.get_typedefs()) + ['']:
+                hasher.update(item.encode('utf-8') + b'\0')
+            if self._prefixes is not None:
+                for prefixes in self._prefixes:
+                    for item in prefixes + ['']:
+                        hasher.update(item.encode('utf-8') + b'\0')
+            for filename in filenames:
+                hasher.update(filename.encode('utf-8') + b'\0')
+            key = 'sourcescanner-macros:' + hasher.hexdigest()
+
+            data = self._cachestore.load_key(key)
+            if data is not None and self._parse_data_is_valid(data):
+                self._replay_parse(data)
+                return
+
+            source_files = [(filename, _hash_file(filename))
+                            for filename in filenames]
+            counts = self._scanner.get_symbol_counts()
+            comments = self._scanner.get_comments()
+
+        self._scanner.set_macro_scan(True)
+        self._scanner.parse_macros(filenames)
         self._scanner.set_macro_scan(False)
 
+        if key is not None:
+            data = self._collect_parse_data(counts, len(comments),
+                                            track_sources=False)
+            data['source-files'] = source_files
+            self._cachestore.store_key(key, data)
+
     def get_symbols(self):
-        for symbol in self._scanner.get_symbols():
-            yield SourceSymbol(self._scanner, symbol)
+        # The records hold the whole type tree, so they must be alive
+        # as long as their ids are used as keys
+        records = _splice(self._scanner.get_symbol_records(),
+                          self._replayed_symbols)
+        types = {}
+        for record in records:
+            yield SourceSymbol.from_record(record, types)
 
     def get_comments(self):
         return self._scanner.get_comments()
 
+    def iter_comments(self):
+        """Lazily yields the GTK-Doc comment blocks, each position only once"""
+        return self._scanner.iter_comments()
+
     def dump(self):
         print('-' * 30)
         for symbol in self._scanner.get_symbols():
@@ -285,11 +369,152 @@ class SourceScanner(object):
         if not filenames:
             return
 
+        key = None
+        if self._cachestore is not None:
+            # The headers are preprocessed as a single translation unit, so
+            # there is one cache entry per header set, named after the
+            # preprocessor, the options and the scanned files.  The contents
+            # of every file cpp reported in its line markers are checked
+            # against the hashes kept in the entry, which is overwritten
+            # when they changed.
+            hasher = hashlib.sha1()
+            for item in (self._get_preprocessor_identity() + [''] +
+                         self._cpp_options + [''] + self._filenames + ['']):
+                hasher.update(item.encode('utf-8') + b'\0')
+            if self._prefixes is not None:
+                for prefixes in self._prefixes:
+                    for item in prefixes + ['']:
+                        hasher.update(item.encode('utf-8') + b'\0')
+            key = 'sourcescanner:' + hasher.hexdigest()
+
+            data = self._cachestore.load_key(key)
+            if data is not None and self._parse_data_is_valid(data):
+                self._replay_parse(data)
+                return
+
+        if self._jobs > 1 and len(filenames) > 1:
+            data = self._parse_sharded(filenames)
+            self._replay_parse(data)
+        elif key is not None:
+            counts = self._scanner.get_symbol_counts()
+            comments = self._scanner.get_comments()
+            self._preprocess_and_parse(filenames)
+            data = self._collect_parse_data(counts, len(comments))
+        else:
+            self._preprocess_and_parse(filenames)
+
+        if key is not None:
+            self._cachestore.store_key(key, data)
+
+    def _get_preprocessor_identity(self):
+        # The preprocessor command and the environment it is picked from
+        cc = CCompiler()
+        identity = [cc.compiler_cmd] + list(cc.compiler.preprocessor or [])
+        for var in ('CC', 'CPP', 'CPPFLAGS'):
+            identity.append('%s=%s' % (var, os.environ.get(var, '')))
+        return identity
+
+    def _parse_sharded(self, filenames):
+        # Contiguous shards keep the include order, so keeping the first
+        # occurrence of each symbol yields the same sequence as a single
+        # preprocessor run over all headers.
+        n_shards = min(self._jobs, len(filenames))
+        size = (len(filenames) + n_shards - 1) // n_shards
+        jobs = [(self._cpp_options, self._prefixes, self._filenames,
+                 filenames[i:i + size])
+                for i in range(0, len(filenames), size)]
+
+        pool = multiprocessing.Pool(len(jobs))
+        try:
+            results = pool.map(_parse_shard, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+        for result in results:
+            if 'error' in result:
+                raise SystemExit(result['error'])
+
+        source_files = {}
+        typedefs = set()
+        symbols = []
+        comments = []
+        seen_symbols = set()
+        seen_comments = set()
+        for result in results:
+            source_files.update(result['source-files'])
+            typedefs.update(result['typedefs'])
+            for symbol in result['symbols']:
+                (symbol_type, ident, _, _, _, _, _, source_filename, line,
+                 _) = symbol
+                position = (source_filename, line, symbol_type, ident)
+                if position not in seen_symbols:
+                    seen_symbols.add(position)
+                    symbols.append(symbol)
+            for comment in result['comments']:
+                _, filename, line = comment
+                position = (filename, line)
+                if position not in seen_comments:
+                    seen_comments.add(position)
+                    comments.append(comment)
+
+        return {'source-files': sorted(source_files.items()),
+                'typedefs': sorted(typedefs),
+                'symbols': symbols,
+                'comments': comments,
+                'symbol-counts': (len(symbols), None)}
+
+    def _collect_parse_data(self, counts_start, comments_start, track_sources=True):
+        # Every symbol kept by the C scanner is in its symbol list, so the
+        # kept count is where the symbols added since @counts_start begin
+        source_files = []
+        typedefs = []
+        if track_sources:
+            for filename in self._scanner.get_source_files():
+                if os.path.isfile(filename):
+                    source_files.append((filename, _hash_file(filename)))
+            typedefs = self._scanner.get_typedefs()
+
+        symbols = self._scanner.get_symbol_records()[counts_start[0]:]
+        kept, dropped = self._scanner.get_symbol_counts()
+        return {'source-files': source_files,
+                'typedefs': typedefs,
+                'symbols': symbols,
+                'comments': self._scanner.get_comments()[comments_start:],
+                'symbol-counts': (kept - counts_start[0],
+                                  dropped - counts_start[1])}
+
+    def _parse_data_is_valid(self, data):
+        for filename, digest in data['source-files']:
+            try:
+                if _hash_file(filename) != digest:
+                    return False
+            except (IOError, OSError):
+                return False
+        return True
+
+    def _replay_parse(self, data):
+        self._scanner.add_typedefs(data['typedefs'])
+        kept, dropped = data['symbol-counts']
+        if dropped is not None and self._replayed_counts[1] is not None:
+            dropped += self._replayed_counts[1]
+        else:
+            dropped = None
+        self._replayed_counts = (self._replayed_counts[0] + kept, dropped)
+        self._replayed_symbols.append(
+            (self._scanner.get_symbol_counts()[0], data['symbols']))
+        self._scanner.add_comments(data['comments'])
+
+    def _preprocess_and_parse(self, filenames):
         defines = ['__GI_SCANNER__']
         undefs = []
 
         cc = CCompiler()
 
+        if cc.can_preprocess_pipe():
+            self._parse_pipe(cc, defines, undefs, filenames)
+            return
+
         tmp_fd_cpp, tmp_name_cpp = tempfile.mkstemp(prefix='g-ir-cpp-',
                                                     suffix='.c',
                                                     dir=os.getcwd())
@@ -313,8 +538,27 @@ class SourceScanner(object):
         fp.close()
         os.unlink(tmpfile_output)
 
+    def _parse_pipe(self, cc, defines, undefs, filenames):
+        # Feed the #include lines to the preprocessor's stdin and let the
+        # scanner read its stdout, so that no temporary files are written.
+        # The preprocessor reads its whole input before producing output,
+        # and parse_file() holds the GIL, so the source is written up front.
+        proc = cc.preprocess_pipe(self._cpp_options)
+        try:
+            self._write_preprocess_src(proc.stdin, defines, undefs, filenames)
+        finally:
+            proc.stdin.close()
+        try:
+            self._scanner.parse_file(proc.stdout.fileno())
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+        if returncode != 0:
+            raise SystemExit('preprocessing of headers failed with exit status %d' %
+                             (returncode, ))
+
     def _write_preprocess_src(self, fp, defines, undefs, filenames):
-        # Write to the temp file for feeding into the preprocessor
+        # Write the source for feeding into the preprocessor
         for define in defines:
             fp.write(('#ifndef %s\n' % (define, )).encode())
             fp.write(('# define %s\n' % (define, )).encode())
@@ -690,16 +690,14 @@ raise ValueError."""
 
         # Special default: char ** -> ast.Array, same for GStrv
         if (is_return and canonical == 'utf8*') or base == 'GStrv':
-            bare_utf8 = ast.TYPE_STRING.clone()
-            bare_utf8.ctype = None
+            bare_utf8 = ast.fundamental_type(ast.TYPE_STRING.target_fundamental)
             return ast.Array(None, bare_utf8, ctype=ctype,
                              is_const=is_const, complete_ctype=complete_ctype)
 
         fundamental = ast.type_names.get(base)
         if fundamental is not None:
-            return ast.Type(target_fundamental=fundamental.target_fundamental,
-                        ctype=ctype,
-                        is_const=is_const, complete_ctype=complete_ctype)
+            return ast.fundamental_type(fundamental.target_fundamental, ctype,
+                                        is_const, complete_ctype)
         container = self._create_bare_container_type(base, ctype=ctype, is_const=is_const,
                                                      complete_ctype=complete_ctype)
         if container:
@@ -912,8 +910,11 @@ Note that type resolution may not succeed."""
             typeval = self.create_type_from_ctype_string(typestr)
 
         self.resolve_type(typeval)
-        if typeval.resolved:
-            # Explicitly clear out the c_type; there isn't one in this case.
+        # Explicitly clear out the c_type; there isn't one in this case.
+        if isinstance(typeval, ast.FrozenType):
+            typeval = ast.fundamental_type(typeval.target_fundamental, None,
+                                           typeval.is_const, typeval.complete_ctype)
+        elif typeval.resolved:
             typeval.ctype = None
         return typeval
 
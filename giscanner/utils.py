@@ -23,10 +23,12 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import errno
+import numbers
 import re
 import os
 import subprocess
 import platform
+import sys
 
 
 _debugflags = None
@@ -39,6 +41,7 @@ Well-known flags:
  * exception: Drop into debugger on fatalexception
  * warning: Drop into debugger on warning
  * posttrans: Drop into debugger just before introspectable pass
+ * namespace-indexes: Check the Namespace secondary indexes after each change
 """
     global _debugflags
     if _debugflags is None:
@@ -287,3 +290,89 @@ def get_system_data_dirs():
         xdg_data_dirs.append('/usr/share')
 
     return xdg_data_dirs
+
+
+_interned_strings = {}
+
+
+def intern_string(value):
+    """Return a shared copy of the string value. Type names like gchar* and
+GObject.Object occur many thousand times in the trees of large namespaces."""
+    if value is None:
+        return None
+    return _interned_strings.setdefault(value, value)
+
+
+def _get_attributes(obj):
+    attributes = []
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get('__slots__', ())
+        if isinstance(slots, (type(''), type(b''))):
+            slots = (slots, )
+        attributes.extend(slot for slot in slots if hasattr(obj, slot))
+    attributes.extend(getattr(obj, '__dict__', {}))
+    return sorted(set(attributes))
+
+
+def hash_object(digest, obj, persistent_id, memo=None):
+    """Feed a deterministic serialization of obj into the hashlib object
+digest.  Objects for which persistent_id(obj) returns something other
+than None are represented by that.  Unlike pickling, strings are hashed
+by value only, whether equal strings are shared depends on whether a
+tree was parsed, loaded from a cache or had its strings interned."""
+    if memo is None:
+        memo = {}
+    if obj is None or isinstance(obj, numbers.Number):
+        digest.update(('%r;' % (obj, )).encode('utf-8'))
+        return
+    if isinstance(obj, (type(''), type(b''))):
+        if isinstance(obj, type('')):
+            obj = obj.encode('utf-8')
+        digest.update(b's%d:' % (len(obj), ) + obj)
+        return
+    pid = persistent_id(obj)
+    if pid is not None:
+        digest.update(('p%s;' % (pid, )).encode('utf-8'))
+        return
+    if id(obj) in memo:
+        digest.update(('r%d;' % (memo[id(obj)], )).encode('utf-8'))
+        return
+    memo[id(obj)] = len(memo)
+
+    digest.update(('%s(' % (type(obj).__name__, )).encode('utf-8'))
+    if isinstance(obj, (list, tuple)):
+        for item in obj:
+            hash_object(digest, item, persistent_id, memo)
+    elif isinstance(obj, (set, frozenset)):
+        for item in sorted(obj, key=repr):
+            hash_object(digest, item, persistent_id, memo)
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            hash_object(digest, key, persistent_id, memo)
+            hash_object(digest, value, persistent_id, memo)
+    else:
+        for name in _get_attributes(obj):
+            hash_object(digest, name, persistent_id, memo)
+            hash_object(digest, getattr(obj, name), persistent_id, memo)
+    digest.update(b')')
+
+
+class SlotsObject(object):
+    """Base class for classes with __slots__, which are created in large
+numbers. Python 2 pickles those only with the binary protocols, so their
+state is provided explicitly for CacheStore."""
+
+    __slots__ = ()
+
+    if sys.version_info.major < 3:
+        def __getstate__(self):
+            state = dict(getattr(self, '__dict__', {}))
+            for cls in type(self).__mro__:
+                for name in getattr(cls, '__slots__', ()):
+                    if name not in ('__dict__', '__weakref__') and hasattr(self, name):
+                        state[name] = getattr(self, name)
+            return state
+
+        def __setstate__(self, state):
+            for name, value in state.items():
+                setattr(self, name, value)
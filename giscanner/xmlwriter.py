@@ -32,18 +32,15 @@ from xml.sax.saxutils import escape
 
 from .libtoolimporter import LibtoolImporter
 
-if sys.version_info.major < 3:
-    from StringIO import StringIO
-else:
-    from io import StringIO
+if sys.version_info.major > 2:
     unicode = str
 
 
 with LibtoolImporter(None, None):
     if 'UNINSTALLED_INTROSPECTION_SRCDIR' in os.environ:
-        from _giscanner import collect_attributes
+        from _giscanner import collect_attributes, XMLBuffer
     else:
-        from giscanner._giscanner import collect_attributes
+        from giscanner._giscanner import collect_attributes, XMLBuffer
 
 
 def build_xml_tag(tag_name, attributes=None, data=None, self_indent=0,
@@ -67,13 +64,15 @@ def build_xml_tag(tag_name, attributes=None, data=None, self_indent=0,
 
 class XMLWriter(object):
 
-    def __init__(self):
-        # Build up the XML buffer as unicode strings. When writing to disk,
-        # we can assume the lack of a Byte Order Mark (BOM) and lack
-        # of an "encoding" xml property means utf-8.
+    def __init__(self, header=True):
+        # Build up the XML as utf-8 in a native buffer, which formats whole
+        # tags at once. When writing to disk, we can assume the lack of a
+        # Byte Order Mark (BOM) and lack of an "encoding" xml property
+        # means utf-8.
         # See: http://www.opentag.com/xfaq_enc.htm#enc_default
-        self._data = StringIO()
-        self._data.write('<?xml version="1.0"?>\n')
+        self._data = XMLBuffer()
+        if header:
+            self._data.write_line('<?xml version="1.0"?>', 0)
         self._tag_stack = []
         self._indent = 0
         self._indent_unit = 2
@@ -84,30 +83,30 @@ class XMLWriter(object):
     def _open_tag(self, tag_name, attributes=None):
         if attributes is None:
             attributes = []
-        attrs = collect_attributes(tag_name, attributes,
-                                   self._indent, self._indent_char, len(tag_name) + 2)
-        self.write_line('<%s%s>' % (tag_name, attrs))
+        self._data.open_tag(tag_name, attributes, self._indent)
 
     def _close_tag(self, tag_name):
-        self.write_line('</%s>' % (tag_name, ))
+        self._data.close_tag(tag_name, self._indent)
 
     # Public API
 
     def enable_whitespace(self):
         self._indent_char = ' '
         self._newline_char = '\n'
+        self._data.set_whitespace(self._indent_char, self._newline_char)
 
     def disable_whitespace(self):
         self._indent_char = ''
         self._newline_char = ''
+        self._data.set_whitespace(self._indent_char, self._newline_char)
 
     def get_xml(self):
         """Returns a unicode string containing the XML."""
-        return self._data.getvalue()
+        return self._data.get_xml()
 
     def get_encoded_xml(self):
         """Returns a utf-8 encoded bytes object containing the XML."""
-        return self._data.getvalue().encode('utf-8')
+        return self._data.get_encoded_xml()
 
     def write_line(self, line='', indent=True, do_escape=False):
         if isinstance(line, bytes):
@@ -115,19 +114,19 @@ class XMLWriter(object):
         assert isinstance(line, unicode)
         if do_escape:
             line = escape(line)
-        if indent:
-            self._data.write('%s%s%s' % (self._indent_char * self._indent,
-                                         line,
-                                         self._newline_char))
-        else:
-            self._data.write('%s%s' % (line, self._newline_char))
+        self._data.write_line(line, self._indent if indent else 0)
+
+    def write_fragment(self, fragment):
+        """Appends XML produced by another writer as is."""
+        self._data.write(fragment)
 
     def write_comment(self, text):
         self.write_line('<!-- %s -->' % (text, ))
 
     def write_tag(self, tag_name, attributes, data=None):
-        self.write_line(build_xml_tag(tag_name, attributes, data,
-                                      self._indent, self._indent_char))
+        if attributes is None:
+            attributes = []
+        self._data.write_tag(tag_name, attributes, data, self._indent)
 
     def push_tag(self, tag_name, attributes=None):
         if attributes is None:
@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# -*- Mode: Python -*-
+
+# GObject-Introspection - a framework for introspecting GObject libraries
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.
+#
+
+'''
+Benchmark GtkDocCommentBlockParser and GtkDocCommentBlockWriter.
+
+Runs the parser and the writer over the comment blocks of the annotation parser
+test suite and over a generated corpus of GTK sized comment blocks, then reports
+blocks per second, peak memory and the time spent in each of the parser's regular
+expressions. The results can be written to a JSON file and compared with the
+results of an earlier run, for example:
+
+    python misc/benchmark-annotationparser.py -o before.json
+    (apply changes)
+    python misc/benchmark-annotationparser.py -o after.json --compare before.json
+'''
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import gc
+import json
+import optparse
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as etree
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from giscanner import annotationparser
+from giscanner.annotationparser import GtkDocCommentBlockParser, GtkDocCommentBlockWriter
+from giscanner.message import MessageLogger
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+TESTS_DIR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'scanner', 'annotationparser')
+TESTS_NS = 'http://schemas.gnome.org/gobject-introspection/2013/test'
+
+WORDS = ('the a widget object signal property value pointer returned default used when '
+         'this function is called to set get create new allocated reference owned by '
+         'caller must be freed with free unref list of items array length element '
+         'string buffer size may be %NULL if no such see also emitted handler data '
+         'user notify destroy callback scope async instance class interface type').split()
+ANNOTATIONS = ['(transfer full)', '(transfer none)', '(transfer container)', '(nullable)',
+               '(optional)', '(out)', '(out caller-allocates)', '(inout)',
+               '(array length=n_items)', '(element-type GObject)', '(scope async)',
+               '(closure user_data)', '(allow-none)', '(type GObject.Object)']
+
+
+def load_test_comments():
+    comments = []
+    for dirpath, dirnames, filenames in os.walk(TESTS_DIR):
+        for filename in sorted(filenames):
+            if filename.endswith('.xml'):
+                tests_file = os.path.join(dirpath, filename)
+                tests_tree = etree.parse(tests_file).getroot()
+                inputs = tests_tree.findall('{%s}test/{%s}input' % (TESTS_NS, TESTS_NS))
+                for lineno, element in enumerate(inputs):
+                    comments.append((element.text, tests_file, lineno + 1))
+    return comments
+
+
+class CorpusGenerator(object):
+    '''Generates GTK-Doc comment blocks looking like the ones of a large library.'''
+
+    def __init__(self, seed):
+        self._random = random.Random(seed)
+
+    def _words(self, n):
+        return ' '.join(self._random.choice(WORDS) for i in range(n))
+
+    def _annotations(self, n_max):
+        n = self._random.randint(0, n_max)
+        return ' '.join(self._random.sample(ANNOTATIONS, n))
+
+    def _paragraphs(self, n_max):
+        lines = []
+        for i in range(self._random.randint(1, n_max)):
+            if lines:
+                lines.append(' *')
+            for j in range(self._random.randint(1, 6)):
+                lines.append(' * %s' % (self._words(self._random.randint(6, 12)), ))
+        return lines
+
+    def _field(self, prefix, n_annotations):
+        annotations = self._annotations(n_annotations)
+        if annotations:
+            return '%s: %s: %s' % (prefix, annotations, self._words(8))
+        return '%s: %s' % (prefix, self._words(8))
+
+    def _function(self, index):
+        lines = [' * gtk_widget_%s_%d:' % (self._random.choice(WORDS), index)]
+        lines.append(' * ' + self._field('@widget', 0))
+        for i in range(self._random.randint(0, 5)):
+            lines.append(' * ' + self._field('@param%d' % (i, ), 2))
+        lines.append(' *')
+        lines.extend(self._paragraphs(4))
+        lines.append(' *')
+        lines.append(' * ' + self._field('Returns', 2))
+        if self._random.random() < 0.3:
+            lines.append(' *')
+            lines.append(' * Deprecated: 3.%d: Use gtk_widget_%s() instead' %
+                         (self._random.randint(0, 24), self._random.choice(WORDS)))
+        lines.append(' *')
+        lines.append(' * Since: 3.%d' % (self._random.randint(0, 24), ))
+        return lines
+
+    def _property(self, index):
+        lines = [' * GtkWidget:prop-%d:' % (index, )]
+        lines.extend(self._paragraphs(2))
+        lines.append(' *')
+        lines.append(' * Since: 3.%d' % (self._random.randint(0, 24), ))
+        return lines
+
+    def _signal(self, index):
+        lines = [' * GtkWidget::signal-%d:' % (index, )]
+        lines.append(' * ' + self._field('@widget', 0))
+        for i in range(self._random.randint(0, 3)):
+            lines.append(' * ' + self._field('@arg%d' % (i, ), 1))
+        lines.append(' *')
+        lines.extend(self._paragraphs(3))
+        return lines
+
+    def _struct(self, index):
+        lines = [' * GtkStruct%d:' % (index, )]
+        for i in range(self._random.randint(1, 8)):
+            lines.append(' * ' + self._field('@member%d' % (i, ), 1))
+        lines.append(' *')
+        lines.extend(self._paragraphs(2))
+        return lines
+
+    def _section(self, index):
+        lines = [' * SECTION:section%d' % (index, ),
+                 ' * @Short_description: %s' % (self._words(6), ),
+                 ' * @Title: Section%d' % (index, ),
+                 ' * @See_also: #GtkWidget',
+                 ' *']
+        lines.extend(self._paragraphs(8))
+        return lines
+
+    def generate(self, n_blocks):
+        kinds = ([self._function] * 70 + [self._property] * 10 + [self._signal] * 5 +
+                 [self._struct] * 10 + [self._section] * 5)
+        comments = []
+        lineno = 1
+        for index in range(n_blocks):
+            lines = ['/**'] + self._random.choice(kinds)(index) + [' */']
+            comments.append(('\n'.join(lines), 'gtkgenerated.c', lineno))
+            lineno += len(lines) + 4
+        return comments
+
+
+class TimedPattern(object):
+    '''Stands in for a compiled pattern of the parser, timing its calls.'''
+
+    def __init__(self, pattern, stats):
+        self._pattern = pattern
+        self._stats = stats
+
+    def _timed(self, method, *args):
+        start = time.time()
+        try:
+            return getattr(self._pattern, method)(*args)
+        finally:
+            self._stats[0] += 1
+            self._stats[1] += time.time() - start
+
+    def match(self, *args):
+        return self._timed('match', *args)
+
+    def search(self, *args):
+        return self._timed('search', *args)
+
+    def __getattr__(self, name):
+        return getattr(self._pattern, name)
+
+
+def best_of(repeat, func):
+    best = None
+    for i in range(repeat):
+        gc.collect()
+        start = time.time()
+        result = func()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def measure_peak_memory(func):
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_regex_hot_spots(func):
+    # LINE_BREAK_RE is passed to re.sub(), which only accepts real patterns
+    stats = {}
+    originals = {}
+    for name in dir(annotationparser):
+        value = getattr(annotationparser, name)
+        if name.endswith('_RE') and name != 'LINE_BREAK_RE' and hasattr(value, 'match'):
+            stats[name] = [0, 0.0]
+            originals[name] = value
+            setattr(annotationparser, name, TimedPattern(value, stats[name]))
+    try:
+        func()
+    finally:
+        for name, value in originals.items():
+            setattr(annotationparser, name, value)
+
+    return dict((name, {'calls': calls, 'seconds': seconds})
+                for name, (calls, seconds) in stats.items() if calls)
+
+
+def run_benchmark(name, comments, repeat):
+    parser = GtkDocCommentBlockParser()
+    writer = GtkDocCommentBlockWriter(indent=False)
+
+    def parse():
+        return parser.parse_comment_blocks(comments)
+
+    parse_seconds, blocks = best_of(repeat, parse)
+
+    def write():
+        for block in blocks.values():
+            writer.write(block)
+
+    write_seconds, unused = best_of(repeat, write)
+
+    return {'name': name,
+            'comments': len(comments),
+            'blocks': len(blocks),
+            'parse_seconds': parse_seconds,
+            'parse_blocks_per_second': len(comments) / parse_seconds,
+            'write_seconds': write_seconds,
+            'write_blocks_per_second': len(blocks) / write_seconds,
+            'peak_memory_bytes': measure_peak_memory(parse),
+            'regex': measure_regex_hot_spots(parse)}
+
+
+def get_revision():
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)),
+                                         stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+
+def print_results(results, previous):
+    previous_corpora = {}
+    if previous:
+        previous_corpora = dict((corpus['name'], corpus) for corpus in previous['corpora'])
+
+    for corpus in results['corpora']:
+        before = previous_corpora.get(corpus['name'])
+        print('%s: %d comment blocks' % (corpus['name'], corpus['comments']))
+        for key, label in [('parse_blocks_per_second', 'parse blocks/s'),
+                           ('write_blocks_per_second', 'write blocks/s'),
+                           ('peak_memory_bytes', 'peak memory (bytes)')]:
+            if corpus[key] is None:
+                continue
+            line = '  %-22s %14.1f' % (label, corpus[key])
+            if before and before.get(key):
+                line += '  (%+.1f%%)' % ((corpus[key] / before[key] - 1) * 100, )
+            print(line)
+
+        print('  regex hot spots:')
+        hot_spots = sorted(corpus['regex'].items(), key=lambda item: -item[1]['seconds'])
+        for name, stats in hot_spots:
+            print('    %-24s %9d calls %9.3fs' % (name, stats['calls'], stats['seconds']))
+
+
+def main(args):
+    parser = optparse.OptionParser('%prog [options]')
+    parser.add_option('-n', '--blocks',
+                      action='store', dest='blocks', type='int', default=20000,
+                      help='number of generated comment blocks')
+    parser.add_option('-r', '--repeat',
+                      action='store', dest='repeat', type='int', default=3,
+                      help='number of timed runs, the best one is reported')
+    parser.add_option('-s', '--seed',
+                      action='store', dest='seed', type='int', default=0,
+                      help='seed of the comment block generator')
+    parser.add_option('-o', '--output',
+                      action='store', dest='output', default=None,
+                      help='write the results as JSON to this file')
+    parser.add_option('-c', '--compare',
+                      action='store', dest='compare', default=None,
+                      help='JSON results of an earlier run to compare with')
+    options, args = parser.parse_args(args)
+
+    # Messages are counted, but none are written out
+    MessageLogger.get(namespace=None)
+
+    corpora = [('test-suite', load_test_comments()),
+               ('generated', CorpusGenerator(options.seed).generate(options.blocks))]
+
+    results = {'revision': get_revision(),
+               'python': platform.python_version(),
+               'blocks': options.blocks,
+               'seed': options.seed,
+               'corpora': [run_benchmark(name, comments, options.repeat)
+                           for name, comments in corpora]}
+
+    previous = None
+    if options.compare:
+        with open(options.compare, 'r') as f:
+            previous = json.load(f)
+
+    print_results(results, previous)
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
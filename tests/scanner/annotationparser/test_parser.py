@@ -32,13 +32,17 @@ from __future__ import unicode_literals
 
 import difflib
 import os
+import shutil
 import sys
 import subprocess
+import tempfile
 import unittest
 import xml.etree.ElementTree as etree
 
+from giscanner import annotationparser
 from giscanner.annotationparser import GtkDocCommentBlockParser, GtkDocCommentBlockWriter
 from giscanner.ast import Namespace
+from giscanner.cachestore import CacheStore
 from giscanner.message import MessageLogger, WARNING, ERROR, FATAL
 
 if sys.version_info.major < 3:
@@ -438,6 +442,121 @@ def create_test_cases():
     return test_cases
 
 
+def load_comments():
+    comments = []
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    for dirpath, dirnames, filenames in os.walk(tests_dir):
+        for filename in sorted(filenames):
+            if filename.endswith('.xml'):
+                tests_file = os.path.join(dirpath, filename)
+                tests_tree = etree.parse(tests_file).getroot()
+                for lineno, element in enumerate(tests_tree.findall(ns('{}test/{}input'))):
+                    comments.append((element.text, tests_file, lineno + 1))
+    return comments
+
+
+def parse_comments(parser, comments, jobs=1):
+    logger = MessageLogger.get()
+    output = ChunkedIO()
+    logger._output = output
+    blocks = parser.parse_comment_blocks(iter(comments), jobs)
+    writer = GtkDocCommentBlockWriter(indent=False)
+    return (output.getvalue(),
+            sorted((name, writer.write(block)) for name, block in blocks.items()))
+
+
+class TestParallelParse(unittest.TestCase):
+    def setUp(self):
+        self.comments = load_comments()
+        self.threshold = annotationparser.PARALLEL_PARSE_THRESHOLD
+        annotationparser.PARALLEL_PARSE_THRESHOLD = 0
+
+    def tearDown(self):
+        annotationparser.PARALLEL_PARSE_THRESHOLD = self.threshold
+
+    def test_parallel_matches_serial(self):
+        parser = GtkDocCommentBlockParser()
+        serial_messages, serial_blocks = parse_comments(parser, self.comments)
+        parallel_messages, parallel_blocks = parse_comments(parser, self.comments, 3)
+        self.assertTrue(serial_messages)
+        self.assertEqual(serial_messages, parallel_messages)
+        self.assertEqual(serial_blocks, parallel_blocks)
+
+
+class TestCachedParse(unittest.TestCase):
+    def setUp(self):
+        self.comments = load_comments()
+        self.cache_dir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ['XDG_CACHE_HOME'] = self.cache_dir
+        os.environ.pop('GI_SCANNER_DISABLE_CACHE', None)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.cache_dir)
+
+    def test_cached_matches_uncached(self):
+        expected = parse_comments(GtkDocCommentBlockParser(), self.comments)
+        parser = GtkDocCommentBlockParser(CacheStore())
+        self.assertEqual(parse_comments(parser, self.comments), expected)
+
+        # The second run replays the cached blocks and messages
+        parse_comment_block = GtkDocCommentBlockParser.parse_comment_block
+        GtkDocCommentBlockParser.parse_comment_block = None
+        try:
+            parser = GtkDocCommentBlockParser(CacheStore())
+            self.assertEqual(parse_comments(parser, self.comments), expected)
+        finally:
+            GtkDocCommentBlockParser.parse_comment_block = parse_comment_block
+
+
+class TestLazyParse(unittest.TestCase):
+    def setUp(self):
+        self.comments = load_comments()
+
+    def test_lazy_matches_eager(self):
+        parser = GtkDocCommentBlockParser()
+        writer = GtkDocCommentBlockWriter(indent=False)
+        eager = parser.parse_comment_blocks(iter(self.comments))
+        lazy = parser.parse_comment_blocks(iter(self.comments), lazy=True)
+        for name, block in eager.items():
+            self.assertEqual(writer.write(lazy[name]), writer.write(block))
+        self.assertEqual(sorted(lazy.keys()), sorted(eager.keys()))
+
+    def test_lazy_parses_on_demand(self):
+        logger = MessageLogger.get()
+        output = ChunkedIO()
+        logger._output = output
+        comment = '/**\n * test_lazy:\n * @unknown: (foo): A parameter\n */'
+        lazy = GtkDocCommentBlockParser().parse_comment_blocks([(comment, 'test.c', 1)],
+                                                               lazy=True)
+        self.assertEqual(output.getvalue(), [])
+        self.assertEqual(lazy.get('test_lazy').name, 'test_lazy')
+        self.assertNotEqual(output.getvalue(), [])
+        self.assertEqual(lazy.get('test_other'), None)
+
+    def test_lazy_keeps_previous_block(self):
+        logger = MessageLogger.get()
+        logger._output = ChunkedIO()
+        first = '/**\n * test_lazy:\n * @first: A parameter\n */'
+        second = '/**\n * test_lazy:\n * @second: A parameter\n */'
+        comments = [(first, 'test.c', 1), (second, 'test.c', 10)]
+        parser = GtkDocCommentBlockParser()
+        parse_comment_block = parser.parse_comment_block
+
+        def failing_parse_comment_block(comment, filename, lineno):
+            if comment == second:
+                raise ValueError('unparsable')
+            return parse_comment_block(comment, filename, lineno)
+
+        parser.parse_comment_block = failing_parse_comment_block
+        eager = parser.parse_comment_blocks(comments)
+        lazy = parser.parse_comment_blocks(comments, lazy=True)
+        self.assertEqual(list(eager['test_lazy'].params.keys()), ['first'])
+        self.assertEqual(list(lazy['test_lazy'].params.keys()), ['first'])
+
+
 # We currently need to push all the new test cases into the modules globals
 # in order for parameterized tests to work. Ideally all that should be needed
 # is the "load_tests" hook, but this does not work in the case were the tests
@@ -0,0 +1,62 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+from giscanner import ast
+
+
+def create_function(name):
+    return ast.Function(name, ast.Return(ast.TYPE_NONE), [], False, 'test_' + name)
+
+
+class TestNamespaceIndexes(unittest.TestCase):
+    def setUp(self):
+        self.namespace = ast.Namespace('Test', '1.0')
+        self.obj = ast.Class('Object', None, gtype_name='TestObject',
+                             get_type='test_object_get_type', ctype='TestObject')
+        self.record = ast.Record('Struct', 'TestStruct')
+        self.func = create_function('func')
+        self.enum = ast.Enum('Enum', 'TestEnum', gtype_name='TestEnum',
+                             get_type='test_enum_get_type', members=[])
+        for node in (self.func, self.obj, self.record, self.enum):
+            self.namespace.append(node)
+
+    def tearDown(self):
+        self.namespace.check_indexes()
+
+    def test_get_nodes_of_kind(self):
+        self.assertEqual(self.namespace.get_nodes_of_kind(ast.Class), [self.obj])
+        self.assertEqual(self.namespace.get_nodes_of_kind(ast.Interface), [])
+        self.assertEqual(self.namespace.get_nodes_of_kind(ast.Record, ast.Function, ast.Class),
+                         [self.func, self.obj, self.record])
+        self.assertEqual(self.namespace.get_registered_types(), [self.obj, self.enum])
+
+    def test_subclasses(self):
+        quark = ast.ErrorQuarkFunction('quark', ast.Return(ast.TYPE_UINT32), [], False,
+                                       'test_error_quark', 'test-error')
+        self.namespace.append(quark)
+        self.assertEqual(self.namespace.get_nodes_of_kind(ast.Function), [self.func, quark])
+
+    def test_replace(self):
+        func = create_function('func')
+        self.namespace.append(func, replace=True)
+        self.assertIs(self.namespace.get_nodes_of_kind(ast.Function)[0], func)
+        self.assertEqual(self.namespace.get_nodes_of_kind(ast.Function, ast.Enum),
+                         [self.enum, func])
+
+    def test_remove(self):
+        self.namespace.remove(self.obj)
+        self.assertEqual(self.namespace.get_nodes_of_kind(ast.Class), [])
+        self.assertEqual(self.namespace.get_registered_types(), [self.enum])
+
+    def test_float(self):
+        self.namespace.float(self.func)
+        self.assertEqual(self.namespace.get_nodes_of_kind(ast.Function), [])
+        self.assertIs(self.namespace.get_by_symbol('test_func'), self.func)
+
+
+if __name__ == '__main__':
+    unittest.main()
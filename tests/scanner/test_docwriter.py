@@ -0,0 +1,175 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+if sys.version_info.major < 3:
+    import __builtin__ as builtins
+else:
+    import builtins
+
+
+path = os.getenv('UNINSTALLED_INTROSPECTION_SRCDIR', None)
+assert path is not None
+sys.path.insert(0, path)
+
+# Not correct, but enough to get the tests going uninstalled
+builtins.__dict__['DATADIR'] = path
+
+from giscanner import ast
+from giscanner import docwriter
+from giscanner.docmain import doc_main
+from giscanner.docwriter import DocWriter
+from giscanner.girwriter import GIRWriter
+from giscanner.transformer import Transformer
+
+
+def create_namespace():
+    namespace = ast.Namespace('Test', '1.0', identifier_prefixes=['Test'],
+                              symbol_prefixes=['test'])
+    for i in range(4):
+        retval = ast.Return(ast.TYPE_STRING)
+        func = ast.Function('func%d' % (i, ), retval, [], False, 'test_func%d' % (i, ))
+        func.doc = 'Function number %d.' % (i, )
+        namespace.append(func)
+    return namespace
+
+
+def read_pages(output):
+    pages = {}
+    for filename in os.listdir(output):
+        if filename.endswith('.page'):
+            with open(os.path.join(output, filename), 'rb') as fp:
+                pages[filename] = fp.read()
+    return pages
+
+
+class TestDocWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ['XDG_CACHE_HOME'] = os.path.join(self.tmpdir, 'cache')
+        os.environ.pop('GI_SCANNER_DISABLE_CACHE', None)
+        self.girfile = os.path.join(self.tmpdir, 'Test-1.0.gir')
+        self.output = os.path.join(self.tmpdir, 'output')
+
+        self.rendered = []
+        render_node = DocWriter._render_node
+
+        def counting_render_node(writer, node, output, old_hash=None):
+            self.rendered.append(node.name)
+            return render_node(writer, node, output, old_hash)
+
+        self.render_node = render_node
+        DocWriter._render_node = counting_render_node
+
+    def tearDown(self):
+        DocWriter._render_node = self.render_node
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.tmpdir)
+
+    def write_gir(self, namespace):
+        with open(self.girfile, 'wb') as fp:
+            fp.write(GIRWriter(namespace).get_encoded_xml())
+
+    def write_docs(self, output=None, jobs=1):
+        del self.rendered[:]
+        transformer = Transformer.parse_from_gir(self.girfile)
+        DocWriter(transformer, 'c').write(output or self.output, jobs)
+        return sorted(self.rendered)
+
+    def test_rerun(self):
+        self.write_gir(create_namespace())
+        self.assertEqual(self.write_docs(), ['Test', 'func0', 'func1', 'func2', 'func3'])
+        expected = read_pages(self.output)
+        self.assertEqual(sorted(expected),
+                         ['Test.func0.page', 'Test.func1.page', 'Test.func2.page',
+                          'Test.func3.page', 'index.page'])
+
+        # Nothing changed, nothing is rendered
+        self.assertEqual(self.write_docs(), [])
+        self.assertEqual(read_pages(self.output), expected)
+
+    def test_edit(self):
+        namespace = create_namespace()
+        self.write_gir(namespace)
+        self.write_docs()
+        namespace.get('func1').doc = 'Changed.'
+        self.write_gir(namespace)
+        self.assertEqual(self.write_docs(), ['func1'])
+
+        fresh = os.path.join(self.tmpdir, 'fresh')
+        self.write_docs(fresh)
+        self.assertEqual(read_pages(self.output), read_pages(fresh))
+
+    def test_remove(self):
+        namespace = create_namespace()
+        self.write_gir(namespace)
+        self.write_docs()
+        namespace.remove(namespace.get('func2'))
+        self.write_gir(namespace)
+        self.write_docs()
+        self.assertFalse(os.path.exists(os.path.join(self.output, 'Test.func2.page')))
+
+        fresh = os.path.join(self.tmpdir, 'fresh')
+        self.write_docs(fresh)
+        self.assertEqual(read_pages(self.output), read_pages(fresh))
+
+    def test_unchanged_contents_not_rewritten(self):
+        self.write_gir(create_namespace())
+        self.write_docs()
+        manifest_filename = os.path.join(self.output, docwriter.MANIFEST_FILENAME)
+        with open(manifest_filename) as fp:
+            manifest = json.load(fp)
+        manifest['pages']['Test.func0']['fingerprint'] = 'outdated'
+        with open(manifest_filename, 'w') as fp:
+            json.dump(manifest, fp)
+        page = os.path.join(self.output, 'Test.func0.page')
+        os.utime(page, (0, 0))
+
+        # The page is rendered again, but not written as it didn't change
+        self.assertEqual(self.write_docs(), ['func0'])
+        self.assertEqual(os.stat(page).st_mtime, 0)
+
+    def test_manifest_version(self):
+        self.write_gir(create_namespace())
+        self.write_docs()
+        manifest_filename = os.path.join(self.output, docwriter.MANIFEST_FILENAME)
+        with open(manifest_filename) as fp:
+            manifest = json.load(fp)
+        manifest['version'] = docwriter.MANIFEST_VERSION + 1
+        with open(manifest_filename, 'w') as fp:
+            json.dump(manifest, fp)
+        self.assertEqual(len(self.write_docs()), 5)
+
+    def test_parallel(self):
+        self.write_gir(create_namespace())
+        self.write_docs()
+        parallel = os.path.join(self.tmpdir, 'parallel')
+        self.write_docs(parallel, jobs=3)
+        self.assertEqual(read_pages(parallel), read_pages(self.output))
+
+    def test_languages(self):
+        self.write_gir(create_namespace())
+        for language in ('c', 'python', 'gjs'):
+            output = os.path.join(self.tmpdir, language)
+            doc_main(['g-ir-doc-tool', '-l', language, '-o', output, self.girfile])
+        output = os.path.join(self.tmpdir, 'all')
+        doc_main(['g-ir-doc-tool', '-l', 'c,python,gjs', '-o', output, self.girfile])
+        for language, subdir in (('c', 'C'), ('python', 'Python'), ('gjs', 'Gjs')):
+            pages = read_pages(os.path.join(output, subdir))
+            self.assertIn('index.page', pages)
+            self.assertEqual(pages, read_pages(os.path.join(self.tmpdir, language)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+if sys.version_info.major < 3:
+    import __builtin__ as builtins
+else:
+    import builtins
+
+
+os.environ['GI_SCANNER_DISABLE_CACHE'] = '1'
+path = os.getenv('UNINSTALLED_INTROSPECTION_SRCDIR', None)
+assert path is not None
+sys.path.insert(0, path)
+
+# Not correct, but enough to get the tests going uninstalled
+builtins.__dict__['DATADIR'] = path
+
+from giscanner import ast
+from giscanner.gdumpparser import GDumpParser, parse_compact_dump
+from giscanner.girwriter import GIRWriter
+from giscanner.transformer import Transformer
+
+
+XML_DUMP = '''<?xml version="1.0"?>
+<dump>
+  <class name="TestObj" get-type="test_obj_get_type" parents="GObject" abstract="1">
+    <property name="count" type="gint" flags="3"/>
+    <signal name="changed" return="void" when="last" detailed="1">
+      <param type="TestObj"/>
+      <param type="gint"/>
+    </signal>
+    <signal name="reset" return="gboolean">
+      <param type="TestObj"/>
+    </signal>
+  </class>
+  <enum name="TestColor" get-type="test_color_get_type">
+    <member name="TEST_COLOR_RED" nick="red" value="0"/>
+    <member name="TEST_COLOR_DARK_BLUE" nick="dark-blue" value="1"/>
+  </enum>
+  <flags name="TestFlags" get-type="test_flags_get_type">
+    <member name="TEST_FLAGS_A" nick="a" value="1"/>
+    <member name="TEST_FLAGS_B" nick="b" value="2"/>
+  </flags>
+  <fundamental name="TestFund" get-type="test_fund_get_type" instantiatable="1"/>
+</dump>
+'''
+
+COMPACT_DUMP = '''gdump-compact\t1
+class\tTestObj\ttest_obj_get_type\tGObject\t1
+property\tcount\tgint\t3
+signal\tchanged\tvoid\tlast\t0\t1\t0\t0
+param\tTestObj
+param\tgint
+signal\treset\tgboolean\t\t0\t0\t0\t0
+param\tTestObj
+enum\tTestColor\ttest_color_get_type
+member\tTEST_COLOR_RED\tred\t0
+member\tTEST_COLOR_DARK_BLUE\tdark-blue\t1
+flags\tTestFlags\ttest_flags_get_type
+member\tTEST_FLAGS_A\ta\t1
+member\tTEST_FLAGS_B\tb\t2
+fundamental\tTestFund\ttest_fund_get_type\t\t0\t1
+'''
+
+
+class TestCompactDump(unittest.TestCase):
+    def test_escapes(self):
+        roots = parse_compact_dump(['enum\tTestEnum\ttest_enum_get_type\n',
+                                    'member\tTEST_ENUM_A\ttab\\there\\nnewline\\303\\251\t1\n'])
+        member = roots[0].findall('member')[0]
+        self.assertEqual(member.attrib['nick'], 'tab\there\nnewline\u00e9')
+        self.assertEqual(member.attrib['value'], '1')
+
+    def test_optional_fields(self):
+        roots = parse_compact_dump(['class\tTestA\ttest_a_get_type\t\t0\n',
+                                    'class\tTestB\ttest_b_get_type\tGObject\t1\n',
+                                    'signal\tfoo\tvoid\t\t0\t0\t0\t0\n'])
+        self.assertEqual(roots[0].attrib, {'name': 'TestA', 'get-type': 'test_a_get_type'})
+        self.assertEqual(roots[1].attrib['parents'], 'GObject')
+        self.assertEqual(roots[1].attrib['abstract'], '1')
+        signal = roots[1].findall('signal')[0]
+        self.assertNotIn('when', signal.attrib)
+        self.assertEqual(signal.attrib['no-recurse'], '0')
+
+    def test_nesting(self):
+        roots = parse_compact_dump(COMPACT_DUMP.splitlines(True))
+        self.assertEqual([root.tag for root in roots],
+                         ['class', 'enum', 'flags', 'fundamental'])
+        self.assertEqual([child.tag for child in roots[0]],
+                         ['property', 'signal', 'signal'])
+        changed, reset = roots[0].findall('signal')
+        self.assertEqual([param.attrib['type'] for param in changed.findall('param')],
+                         ['TestObj', 'gint'])
+        self.assertEqual([param.attrib['type'] for param in reset.findall('param')],
+                         ['TestObj'])
+        self.assertEqual(len(roots[1].findall('member')), 2)
+        self.assertEqual(roots[3].children, [])
+
+    def test_unknown_record(self):
+        self.assertRaises(ValueError, parse_compact_dump,
+                          ['gdump-compact\t1\n', 'unknown\tfoo\n'])
+
+
+class TestGDumpParser(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def introspect(self, dump):
+        filename = os.path.join(self.tmpdir, 'dump.txt')
+        with open(filename, 'w') as f:
+            f.write(dump)
+        namespace = ast.Namespace('Test', '1.0', identifier_prefixes=['Test'],
+                                  symbol_prefixes=['test'])
+        parser = GDumpParser(Transformer(namespace))
+        for child in parser._parse_dump(filename):
+            parser._introspect_type(child)
+        return GIRWriter(namespace).get_encoded_xml()
+
+    def test_xml_matches_compact(self):
+        self.assertEqual(self.introspect(COMPACT_DUMP), self.introspect(XML_DUMP))
+
+
+if __name__ == '__main__':
+    unittest.main()
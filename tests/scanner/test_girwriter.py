@@ -0,0 +1,91 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from giscanner import ast
+from giscanner import girwriter
+from giscanner.cachestore import CacheStore
+from giscanner.girwriter import GIRWriter
+
+
+def create_namespace():
+    namespace = ast.Namespace('Test', '1.0')
+    namespace.append(ast.Alias('Handle', ast.TYPE_INT, ctype='TestHandle'))
+    for i in range(20):
+        retval = ast.Return(ast.TYPE_STRING)
+        func = ast.Function('func%d' % (i, ), retval, [], False, 'test_func%d' % (i, ))
+        func.doc = 'Function <%d> & more' % (i, )
+        namespace.append(func)
+        namespace.append(ast.Constant('CONST%d' % (i, ), ast.TYPE_INT, str(i),
+                                      'TEST_CONST%d' % (i, )))
+    return namespace
+
+
+class TestGIRWriterFragments(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.environ = dict(os.environ)
+        os.environ['XDG_CACHE_HOME'] = self.cache_dir
+        os.environ.pop('GI_SCANNER_DISABLE_CACHE', None)
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree(self.cache_dir)
+
+    def test_parallel(self):
+        namespace = create_namespace()
+        expected = GIRWriter(namespace).get_encoded_xml()
+        old_threshold = girwriter.PARALLEL_WRITE_THRESHOLD
+        girwriter.PARALLEL_WRITE_THRESHOLD = 1
+        try:
+            self.assertEqual(GIRWriter(namespace, jobs=2).get_encoded_xml(), expected)
+        finally:
+            girwriter.PARALLEL_WRITE_THRESHOLD = old_threshold
+
+    def test_cache(self):
+        namespace = create_namespace()
+        expected = GIRWriter(namespace).get_encoded_xml()
+        self.assertEqual(GIRWriter(namespace, cachestore=CacheStore()).get_encoded_xml(),
+                         expected)
+
+        written = []
+        write_fragment = girwriter._write_fragment
+
+        def counting_write_fragment(namespace, node, indent):
+            written.append(node.name)
+            return write_fragment(namespace, node, indent)
+
+        girwriter._write_fragment = counting_write_fragment
+        try:
+            xml = GIRWriter(namespace, cachestore=CacheStore()).get_encoded_xml()
+            self.assertEqual(xml, expected)
+            self.assertEqual(written, [])
+
+            namespace.get('func3').doc = 'Changed'
+            xml = GIRWriter(namespace, cachestore=CacheStore()).get_encoded_xml()
+            self.assertEqual(written, ['func3'])
+            self.assertEqual(xml, GIRWriter(namespace).get_encoded_xml())
+        finally:
+            girwriter._write_fragment = write_fragment
+
+    def test_structure_hash_ignores_string_sharing(self):
+        # Parsed trees, cached trees and interned strings share equal
+        # strings differently, that must not change the hash
+        namespace = ast.Namespace('Test', '1.0')
+        name = 'TestHandle'
+        shared = ast.Alias(name, ast.TYPE_INT, ctype=name)
+        copied = ast.Alias(name, ast.TYPE_INT, ctype=name[:4] + name[4:])
+        self.assertEqual(girwriter.node_structure_hash(namespace, shared, 2),
+                         girwriter.node_structure_hash(namespace, copied, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import unittest
+
+from giscanner.message import MessageLogger, Position, WARNING, ERROR, FATAL
+
+
+class ChunkedIO(object):
+    def __init__(self):
+        self.buffer = []
+
+    def write(self, s):
+        self.buffer.append(s)
+
+    def getvalue(self):
+        return self.buffer
+
+
+class TestMessageLogger(unittest.TestCase):
+    def setUp(self):
+        self.output = ChunkedIO()
+        self.logger = MessageLogger(output=self.output)
+        self.logger.enable_warnings((WARNING, ERROR, FATAL))
+        self.position = Position('test.c', 10, 2)
+
+    def test_counts_disabled_warnings(self):
+        self.logger.enable_warnings(())
+        self.logger.log(WARNING, 'one', self.position)
+        self.logger.log(ERROR, 'two', self.position)
+        self.assertEqual(self.output.getvalue(), [])
+        self.assertEqual(self.logger.get_counts(),
+                         {'warning': 1, 'error': 1, 'fatal': 0, 'duplicate': 0})
+
+    def test_deduplication(self):
+        self.logger.enable_deduplication()
+        self.logger.log(WARNING, 'one', self.position)
+        self.logger.log(WARNING, 'one', self.position)
+        self.logger.log(WARNING, 'one', Position('test.c', 11))
+        self.assertEqual(self.output.getvalue(), ['test.c:10:2: Warning: one\n',
+                                                  'test.c:11: Warning: one\n'])
+        self.assertEqual(self.logger.get_counts()['duplicate'], 1)
+
+    def test_buffering(self):
+        self.logger.enable_buffering(3)
+        self.logger.log(WARNING, 'one', self.position)
+        self.logger.log(WARNING, 'two', self.position)
+        self.assertEqual(self.output.getvalue(), [])
+        self.logger.log(WARNING, 'three', self.position)
+        self.assertEqual(len(self.output.getvalue()), 1)
+        self.logger.log(WARNING, 'four', self.position)
+        self.assertRaises(SystemExit, self.logger.log, FATAL, 'five', self.position)
+        self.assertEqual(self.output.getvalue()[1:], ['test.c:10:2: Warning: four\n'
+                                                      'test.c:10:2: Fatal: five\n'])
+
+    def test_json(self):
+        self.logger.set_diagnostics_format('json')
+        self.logger.log(WARNING, 'one', [Position('other.c', 1), self.position], prefix='sym')
+        record = json.loads(''.join(self.output.getvalue()))
+        self.assertEqual(record['type'], 'warning')
+        self.assertEqual(record['text'], 'one')
+        self.assertEqual(record['prefix'], 'sym')
+        self.assertEqual(record['positions'],
+                         [{'filename': 'other.c', 'line': 1, 'column': None},
+                          {'filename': 'test.c', 'line': 10, 'column': 2}])
+        # The text format is not built for JSON output
+        self.assertEqual(self.logger._formatted_positions, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
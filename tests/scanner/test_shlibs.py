@@ -0,0 +1,65 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+import tempfile
+import os
+import shlex
+import shutil
+import subprocess
+
+from giscanner.shlibs import ELFError, read_elf_dependencies, _resolve_from_elf, _ldd_library_pattern
+
+
+class Binary(object):
+    def __init__(self, args):
+        self.args = args
+
+
+program_source = """
+#include <math.h>
+
+int
+main (int argc, char **argv)
+{
+  return (int) sqrt ((double) argc);
+}
+"""
+
+
+class TestELFReader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        source = os.path.join(self.tmpdir, 'program.c')
+        with open(source, 'w') as f:
+            f.write(program_source)
+        self.program = os.path.join(self.tmpdir, 'program')
+        args = shlex.split(os.environ.get('CC', 'cc'))
+        args.extend(['-o', self.program, source, '-Wl,--no-as-needed', '-lm'])
+        subprocess.check_call(args)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_needed(self):
+        soname, needed = read_elf_dependencies(self.program)
+        self.assertEqual(soname, None)
+        self.assertTrue(any(name.startswith('libm.') for name in needed))
+
+    def test_not_elf(self):
+        source = os.path.join(self.tmpdir, 'program.c')
+        self.assertRaises(ELFError, read_elf_dependencies, source)
+
+    def test_resolve(self):
+        binary = Binary([self.program])
+        patterns = {'m': _ldd_library_pattern('m')}
+        shlibs = _resolve_from_elf(binary, patterns)
+        self.assertEqual(patterns, {})
+        self.assertEqual(len(shlibs), 1)
+        self.assertTrue(shlibs[0].startswith('libm.'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,10 +37,26 @@ class Test(unittest.TestCase):
         self.assertEqual(len(list(self.ss.get_symbols())), 2)
         self.assertEqual(len(list(self.ss.get_symbols())), 2)
 
+    def test_get_symbols_records(self):
+        symbols = sorted(self.ss.get_symbols(), key=lambda s: s.ident)
+        self.assertEqual([s.ident for s in symbols], ['Eggs', 'Spam'])
+        self.assertEqual(symbols[0].base_type.name, '_eggs')
+        self.assertEqual(symbols[0].base_type.child_list, [])
+        self.assertEqual(symbols[0].position.line, 10)
+
     def test_get_comments_length_consistency(self):
         self.assertEqual(len(list(self.ss.get_comments())), 2)
         self.assertEqual(len(list(self.ss.get_comments())), 2)
 
+    def test_iter_comments(self):
+        self.assertEqual(list(self.ss.iter_comments()), self.ss.get_comments())
+
+    def test_iter_comments_deduplicates(self):
+        comments = self.ss.get_comments()
+        self.ss._scanner.add_comments(comments)
+        self.assertEqual(len(self.ss.get_comments()), 4)
+        self.assertEqual(list(self.ss.iter_comments()), comments)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,70 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+from giscanner.xmlwriter import XMLWriter, build_xml_tag
+
+
+class TestXMLWriter(unittest.TestCase):
+
+    def test_write_tag_matches_build_xml_tag(self):
+        tags = [('type', [('name', 'utf8'), ('c:type', 'const gchar*')], None),
+                ('doc', [('xml:space', 'preserve')], 'a < b && "c" > \'d\''),
+                ('doc', [('xml:space', 'preserve')], b'bytes data'),
+                ('member', [('name', 'west'), ('value', '7'), ('optional', None),
+                            ('c:identifier', 'GTK_ANCHOR_WEST'), ('glib:nick', 'west')],
+                 None),
+                ('doc', [('xml:space', 'preserve'), ('filename', 'a/b.c')],
+                 'é' * 20),
+                ('varargs', None, None)]
+
+        w = XMLWriter()
+        w.push_tag('repository')
+        for tag_name, attributes, data in tags:
+            w.write_tag(tag_name, attributes, data)
+        w.pop_tag()
+
+        expected = ['<?xml version="1.0"?>', '<repository>']
+        for tag_name, attributes, data in tags:
+            expected.append('  ' + build_xml_tag(tag_name, attributes, data, 2))
+        expected.extend(['</repository>', ''])
+        self.assertEqual(w.get_xml(), '\n'.join(expected))
+        self.assertEqual(w.get_encoded_xml(), '\n'.join(expected).encode('utf-8'))
+
+    def test_push_tag_wraps_long_attributes(self):
+        w = XMLWriter()
+        w.push_tag('repository')
+        w.push_tag('enumeration',
+                   [('name', 'AnchorType'),
+                    ('c:type', 'GtkAnchorType'),
+                    ('glib:type-name', 'GtkAnchorType')])
+        w.pop_tag()
+        w.pop_tag()
+        self.assertEqual(w.get_xml().split('\n')[2:5],
+                         ['  <enumeration name="AnchorType"',
+                          '               c:type="GtkAnchorType"',
+                          '               glib:type-name="GtkAnchorType">'])
+
+    def test_disable_whitespace(self):
+        w = XMLWriter()
+        w.disable_whitespace()
+        with w.tagcontext('repository', [('version', '1.2')]):
+            w.write_tag('include', [('name', 'GLib'), ('version', '2.0')])
+        self.assertEqual(w.get_xml(),
+                         '<?xml version="1.0"?>\n'
+                         '<repository version="1.2">'
+                         '<include name="GLib" version="2.0"/>'
+                         '</repository>')
+
+    def test_invalid_attributes(self):
+        w = XMLWriter()
+        self.assertRaises(TypeError, w.write_tag, 'type', [('name', 1)])
+        self.assertRaises(IndexError, w.write_tag, 'type', [('name', 'a', 'b')])
+        self.assertEqual(w.get_xml(), '<?xml version="1.0"?>\n')
+
+
+if __name__ == '__main__':
+    unittest.main()